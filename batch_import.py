@@ -0,0 +1,157 @@
+# batch_import.py
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from database import DatabaseHandler
+from nickname_index import get_resolver
+from ocr_cache import OCRCache
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def collect_images(source: str) -> List[str]:
+    """Список изображений по каталогу или glob-шаблону"""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+
+
+def resolve_db_path(target: str) -> str:
+    """Путь к базе внутри каталога data/"""
+    if not target.endswith(".db"):
+        target += ".db"
+    if os.path.dirname(target) == "":
+        target = os.path.join("data", target)
+    return target
+
+
+def _recognize_file(path: str, rects: List[Tuple[int, int, int, int]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Задача процесса-исполнителя: загрузка, предобработка и OCR одного файла"""
+    # Импорт внутри задачи, чтобы родительский процесс не загружал стек OCR
+    import ocr_backends
+    from myOCR_test import ImageProcessor, OCRPipeline
+
+    # Параллелизм уже по файлам; строки внутри процесса распознаются последовательно,
+    # а пул процессов-движков в каждом исполнителе не нужен
+    OCRPipeline.ROW_WORKERS = 1
+    if ocr_backends.BACKEND_SETTINGS["backend"] == "auto":
+        ocr_backends.BACKEND_SETTINGS["backend"] = "tesserocr"
+    try:
+        image = ImageProcessor.load_image(path)
+        source_hash = OCRCache.hash_file(path)
+        if not rects:
+            _, data = OCRPipeline.recognize(image, source_hash, None)
+        else:
+            _, data = OCRPipeline.recognize_regions(image, source_hash, rects)
+    except Exception as e:
+        # Не все исключения (например, pytesseract) переживают передачу между процессами
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    return path, data
+
+
+def _regions_for(path: str, db: DatabaseHandler, cache: Dict[Tuple[int, int], List[tuple]]) -> List[tuple]:
+    """Области из шаблонов базы по разрешению изображения"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            size = img.size
+    except OSError:
+        return []  # Ошибка чтения проявится в процессе-исполнителе
+    if size not in cache:
+        cache[size] = [tuple(t[2:]) for t in db.get_crop_templates(*size)]
+    return cache[size]
+
+
+def run_batch(source: str, db_path: str, workers: Optional[int] = None,
+              rect: Optional[Tuple[int, int, int, int]] = None) -> int:
+    """Пакетный импорт скриншотов; возвращает число обработанных файлов.
+    Хэш файла сохраняется в журнале импортов той же транзакцией, что и его результаты,
+    поэтому прерванный запуск продолжается без повторной загрузки уже записанных файлов.
+    Чтобы загрузить файл заново, его импорт откатывается в истории."""
+    db_path = resolve_db_path(db_path)
+    db = DatabaseHandler(db_path)
+    done = db.imported_hashes()
+
+    files = collect_images(source)
+    pending: Dict[str, str] = {}
+    queued: Set[str] = set()
+    for path in files:
+        file_hash = OCRCache.hash_file(path)
+        if file_hash not in done and file_hash not in queued:
+            pending[path] = file_hash
+            queued.add(file_hash)
+
+    skipped = len(files) - len(pending)
+    print(f"Найдено файлов: {len(files)}, уже обработано: {skipped}, в очереди: {len(pending)}")
+    if not pending:
+        db.close()
+        return 0
+
+    resolver = get_resolver(db)
+    processed = failed = rows_total = 0
+    templates: Dict[Tuple[int, int], List[tuple]] = {}
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            executor.submit(_recognize_file, path, [rect] if rect else _regions_for(path, db, templates)): path
+            for path in pending
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                _, data = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Ошибка обработки {path}: {e}")
+                continue
+            inserted, updated = db.merge_players(resolver.resolve_players(data), path, pending[path])
+            rows = inserted + updated
+            processed += 1
+            rows_total += rows
+            print(f"[{processed + failed}/{len(pending)}] {path}: {rows} игроков")
+    except KeyboardInterrupt:
+        print("Прервано; повторный запуск продолжит с места остановки")
+    finally:
+        # Файлы из очереди не дожидаются обработки; записанные уже есть в журнале импортов
+        executor.shutdown(wait=False, cancel_futures=True)
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Готово: {processed} файлов, {rows_total} игроков, ошибок: {failed}")
+    print(f"Время: {elapsed:.2f} с, скорость: {rate:.2f} изобр./с")
+    return processed
+
+
+def _parse_rect(value: str) -> Tuple[int, int, int, int]:
+    try:
+        x1, y1, x2, y2 = (int(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Ожидается x1,y1,x2,y2")
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа пакетного импорта без GUI"""
+    parser = argparse.ArgumentParser(description="Пакетный OCR-импорт скриншотов в базу")
+    parser.add_argument("source", help="Каталог или glob-шаблон с изображениями")
+    parser.add_argument("database", help="Имя базы в data/ (например war.db)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Число процессов")
+    parser.add_argument("--rect", type=_parse_rect, default=None, help="Область x1,y1,x2,y2 (по умолчанию - шаблоны базы по разрешению)")
+    args = parser.parse_args(argv)
+
+    run_batch(args.source, args.database, args.workers, args.rect)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Замеры производительности: генераторы данных и запуск бенчмарков (python -m benchmarks.run)"""
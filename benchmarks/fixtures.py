@@ -0,0 +1,67 @@
+# benchmarks/fixtures.py
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from database import DatabaseHandler
+from benchmarks.scoreboard import random_nickname
+
+RANKS = ("новобранец", "-", "-", "боец", "офицер", "-", "глава")
+
+
+def player_names(count: int, seed: int = 0) -> List[str]:
+    """Уникальные ники; при исчерпании слогов добавляется номер"""
+    rng = random.Random(seed)
+    names, used = [], set()
+    while len(names) < count:
+        name = random_nickname(rng)
+        if name in used:
+            name = f"{name}{len(names)}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def build_database(path: str, players: int, imports: int = 0, rows_per_import: int = 30,
+                   seed: int = 0) -> Tuple[DatabaseHandler, List[str]]:
+    """База с players игроками и imports импортами в истории; возвращает (база, ники).
+    Состав загружается одним пакетом, история - через обычный merge_players."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    names = player_names(players, seed)
+    db = DatabaseHandler(path)
+    db.import_roster([
+        (name, rng.choice(RANKS), rng.randint(0, 5000), rng.randint(0, 5000)) for name in names
+    ])
+    for i in range(imports):
+        batch = rng.sample(names, min(rows_per_import, len(names)))
+        db.merge_players(
+            [{'name': name, 'kills': rng.randint(0, 60), 'deaths': rng.randint(0, 40)} for name in batch],
+            f"fixture_{i:05d}.png"
+        )
+    return db, names
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Генерация большой базы для замеров")
+    parser.add_argument("path", help="Файл базы (будет перезаписан)")
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--imports", type=int, default=100)
+    parser.add_argument("--rows-per-import", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    db, _ = build_database(args.path, args.players, args.imports, args.rows_per_import, args.seed)
+    db.close()
+    print(f"База {args.path}: {args.players} игроков, {args.imports} импортов "
+          f"за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
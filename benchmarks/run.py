@@ -0,0 +1,259 @@
+# benchmarks/run.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fixtures import build_database
+from benchmarks.scoreboard import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Размеры наборов: обычный и быстрый (--quick) прогон
+SIZES = {
+    "full": {"images": [(900, 20), (1920, 60)], "parse_rows": 300, "players": 100000,
+             "imports": 50, "merge_rows": 1000, "ocr_images": 3, "repeat": 5},
+    "quick": {"images": [(900, 20)], "parse_rows": 100, "players": 10000,
+              "imports": 5, "merge_rows": 200, "ocr_images": 1, "repeat": 3},
+}
+
+
+def measure(func: Callable[[], Any], repeat: int = 5) -> Dict[str, Any]:
+    """Время (мин./медиана, мс) и пик памяти Python за один отдельный запуск.
+    Память нативных библиотек (OpenCV, SQLite) tracemalloc не видит."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "peak_kb": round(peak / 1024, 1),
+        "repeat": repeat,
+    }
+
+
+def ocr_accuracy(truth: List[Dict[str, Any]], data: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Доля найденных ников и доля строк, где совпали все числа"""
+    found = {row['name']: row for row in data}
+    matched = [(row, found[row['name']]) for row in truth if row['name'] in found]
+    exact = sum(
+        1 for expected, actual in matched
+        if all(expected[key] == actual.get(key) for key in ('kills', 'deaths', 'treasury'))
+    )
+    total = max(1, len(truth))
+    return {
+        "rows_expected": len(truth),
+        "rows_parsed": len(data),
+        "name_recall": round(len(matched) / total, 4),
+        "row_accuracy": round(exact / total, 4),
+    }
+
+
+def bench_preprocess(sizes: Dict[str, Any]) -> Dict[str, Any]:
+    from myOCR_test import ImageProcessor
+
+    results = {}
+    for width, rows in sizes["images"]:
+        image, _, _ = generate(rows, width)
+        array = np.asarray(image)
+        results[f"{width}x{array.shape[0]}"] = measure(
+            lambda: ImageProcessor.preprocess_image(array), sizes["repeat"]
+        )
+    return results
+
+
+def bench_parse(sizes: Dict[str, Any]) -> Dict[str, Any]:
+    from myOCR_test import OCRDataHandler
+    from table_layout import TableLayoutParser
+
+    _, truth, words = generate(sizes["parse_rows"])
+    lines = [f"{i}. {row['name']} {row['kills']} {row['deaths']} {row['treasury']}"
+             for i, row in enumerate(truth, 1)]
+    return {
+        "layout": measure(lambda: TableLayoutParser.parse(words), sizes["repeat"]),
+        "layout_accuracy": ocr_accuracy(truth, TableLayoutParser.parse(words)[1]),
+        "regex_lines": measure(lambda: [OCRDataHandler.parse_line(line) for line in lines], sizes["repeat"]),
+    }
+
+
+def bench_ocr(sizes: Dict[str, Any]) -> Dict[str, Any]:
+    from myOCR_test import OCRPipeline
+    import ocr_backends
+
+    try:
+        backend = ocr_backends.get_backend()
+    except Exception as e:
+        return {"skipped": str(e)}
+
+    results: Dict[str, Any] = {"backend": backend.name}
+    for width, rows in sizes["images"]:
+        timings, accuracy = [], []
+        for seed in range(sizes["ocr_images"]):
+            image, truth, _ = generate(rows, width, seed=seed)
+            array = np.asarray(image)
+            started = time.perf_counter()
+            try:
+                _, data = OCRPipeline.recognize(array)
+            except Exception as e:
+                return dict(results, skipped=f"{type(e).__name__}: {e}")
+            timings.append((time.perf_counter() - started) * 1000)
+            accuracy.append(ocr_accuracy(truth, data))
+        results[f"{width}x{rows}"] = {
+            "median_ms": round(statistics.median(timings), 1),
+            "name_recall": round(statistics.mean(a["name_recall"] for a in accuracy), 4),
+            "row_accuracy": round(statistics.mean(a["row_accuracy"] for a in accuracy), 4),
+        }
+    return results
+
+
+def bench_database(sizes: Dict[str, Any], workdir: str) -> Dict[str, Any]:
+    from gui import TableModel
+    from nickname_index import NicknameResolver
+
+    results: Dict[str, Any] = {}
+    started = time.perf_counter()
+    db, names = build_database(os.path.join(workdir, "bench.db"), sizes["players"], sizes["imports"])
+    results["fixture_build_s"] = round(time.perf_counter() - started, 2)
+    try:
+        batch = [{'name': name, 'kills': 3, 'deaths': 2} for name in names[:sizes["merge_rows"]]]
+        results["merge_existing"] = measure(lambda: db.merge_players(batch, "bench"), sizes["repeat"])
+        screenshot = [{'name': name, 'kills': 3, 'deaths': 2} for name in names[-30:]]
+        results["merge_screenshot"] = measure(lambda: db.merge_players(screenshot, "bench"), sizes["repeat"])
+
+        def load_table() -> None:
+            model = TableModel()
+            model.load(db)
+            model.ensure_loaded(len(model) - 1)
+
+        def load_first_page() -> None:
+            TableModel().load(db)
+
+        results["table_first_page"] = measure(load_first_page, sizes["repeat"])
+        results["table_full_load"] = measure(load_table, max(1, sizes["repeat"] // 2))
+
+        resolver = NicknameResolver(db)
+        started = time.perf_counter()
+        resolver.refresh()
+        results["nickname_index_build_s"] = round(time.perf_counter() - started, 3)
+        noisy = [{'name': name.replace("o", "0").replace("i", "1") + "x", 'kills': 1, 'deaths': 1}
+                 for name in names[:30]]
+        with contextlib.redirect_stdout(io.StringIO()):  # Журнал сопоставлений не нужен
+            results["nickname_resolve_30"] = measure(lambda: resolver.resolve_players(noisy), sizes["repeat"])
+    finally:
+        db.close()
+    return results
+
+
+BENCHMARKS = {
+    "preprocess": lambda sizes, workdir: bench_preprocess(sizes),
+    "parse": lambda sizes, workdir: bench_parse(sizes),
+    "ocr": lambda sizes, workdir: bench_ocr(sizes),
+    "database": bench_database,
+}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(names: List[str], quick: bool = False) -> Dict[str, Any]:
+    sizes = SIZES["quick" if quick else "full"]
+    report: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mode": "quick" if quick else "full",
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            print(f"== {name}")
+            started = time.perf_counter()
+            report["results"][name] = BENCHMARKS[name](sizes, workdir)
+            print(json.dumps(report["results"][name], ensure_ascii=False, indent=1))
+            print(f"   ({time.perf_counter() - started:.1f} с)")
+    return report
+
+
+def _flatten(prefix: str, value: Any, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Изменения метрик между двумя прогонами (время - в разах)"""
+    old_flat: Dict[str, float] = {}
+    new_flat: Dict[str, float] = {}
+    _flatten("", old.get("results", {}), old_flat)
+    _flatten("", new.get("results", {}), new_flat)
+    lines = []
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        if before == after:
+            continue
+        ratio = f"x{after / before:.2f}" if before else "new"
+        lines.append(f"{key}: {before} -> {after} ({ratio})")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры производительности конвейера")
+    parser.add_argument("benchmarks", nargs="*", default=[],
+                        help=f"Какие замеры выполнить: {', '.join(BENCHMARKS)} (по умолчанию все)")
+    parser.add_argument("--quick", action="store_true", help="Уменьшенные наборы данных")
+    parser.add_argument("-o", "--output", default=None, help="JSON с результатами")
+    parser.add_argument("--compare", default=None, help="Сравнить с предыдущим JSON")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(unknown)}")
+
+    report = run(args.benchmarks or list(BENCHMARKS), args.quick)
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"Результаты: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            for line in compare(json.load(f), report):
+                print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# benchmarks/scoreboard.py
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Шрифты с кириллицей (Windows, Linux, macOS); первый найденный используется
+FONT_CANDIDATES = (
+    "arial.ttf",
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+)
+
+LATIN_SYLLABLES = ("vi", "per", "dar", "ko", "shadow", "wolf", "neo", "rex", "max", "ka", "zer", "ion")
+CYRILLIC_SYLLABLES = ("вол", "ков", "сна", "лис", "тень", "мак", "сим", "рус", "бой", "дед", "ёж", "ша")
+
+# Колонки таблицы: заголовок и левая граница в долях ширины
+COLUMNS = (("#", 0.02), ("Игрок", 0.08), ("У", 0.52), ("С", 0.64), ("Казна", 0.78))
+
+BACKGROUND = (24, 20, 32)
+ROW_BACKGROUND = (34, 28, 44)
+TEXT_COLOR = (235, 235, 235)
+
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    # Встроенный шрифт без кириллицы - только для проверки на латинице
+    return ImageFont.load_default(size)
+
+
+def random_nickname(rng: random.Random) -> str:
+    """Ник из слогов одного алфавита, иногда с цифрами, подчеркиванием или вторым словом"""
+    syllables = CYRILLIC_SYLLABLES if rng.random() < 0.4 else LATIN_SYLLABLES
+    name = "".join(rng.choice(syllables) for _ in range(rng.randint(1, 3)))
+    if rng.random() < 0.5:
+        name = name.capitalize()
+    roll = rng.random()
+    if roll < 0.2:
+        name += str(rng.randint(1, 99))
+    elif roll < 0.3:
+        name += "_" + rng.choice(syllables)
+    elif roll < 0.35:
+        name += " " + rng.choice(syllables).capitalize()
+    return name
+
+
+def random_rows(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Эталонные строки таблицы с уникальными никами"""
+    rng = random.Random(seed)
+    rows, used = [], set()
+    while len(rows) < count:
+        name = random_nickname(rng)
+        if name in used:
+            continue
+        used.add(name)
+        rows.append({
+            'name': name,
+            'kills': rng.randint(0, 60),
+            'deaths': rng.randint(0, 40),
+            'treasury': rng.choice((0, rng.randint(1, 99) * 100, rng.randint(1, 50) * 1000)),
+        })
+    return rows
+
+
+def render_scoreboard(rows: List[Dict[str, Any]], width: int = 900, row_height: int = 28,
+                      seed: int = 0, noise: bool = True) -> Tuple[Image.Image, List[tuple]]:
+    """Изображение таблицы результатов и рамки слов (текст, left, top, right, bottom, 100)"""
+    rng = random.Random(seed)
+    font = load_font(int(row_height * 0.6))
+    height = row_height * (len(rows) + 1) + row_height // 2
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    words: List[tuple] = []
+
+    def put(text: str, x: int, y: int) -> None:
+        # Слова рисуются по отдельности, чтобы знать их рамки
+        for word in text.split(" "):
+            left, top, right, bottom = draw.textbbox((x, y), word, font=font)
+            draw.text((x, y), word, font=font, fill=TEXT_COLOR)
+            words.append((word, left, top, right, bottom, 100.0))
+            x = right + font.size // 3
+
+    for title, offset in COLUMNS:
+        put(title, int(width * offset), row_height // 4)
+    for index, row in enumerate(rows, 1):
+        y = index * row_height + row_height // 4
+        if index % 2 == 0:
+            draw.rectangle((0, index * row_height, width, (index + 1) * row_height - 1), fill=ROW_BACKGROUND)
+        cells = (str(index), row['name'], str(row['kills']), str(row['deaths']),
+                 f"{row['treasury']:,}".replace(",", " ") if row['treasury'] else "")
+        for (_, offset), cell in zip(COLUMNS, cells):
+            if cell:
+                put(cell, int(width * offset) + rng.randint(-1, 1), y)
+
+    if noise:
+        image = image.filter(ImageFilter.GaussianBlur(0.6))
+    return image, words
+
+
+def generate(count: int, width: int = 900, row_height: int = 28, seed: int = 0
+             ) -> Tuple[Image.Image, List[Dict[str, Any]], List[tuple]]:
+    """Таблица из count игроков: (изображение, эталонные строки, рамки слов)"""
+    rows = random_rows(count, seed)
+    image, words = render_scoreboard(rows, width, row_height, seed)
+    return image, rows, words
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Сохранение набора изображений с эталонными данными (<name>.png + <name>.json)"""
+    parser = argparse.ArgumentParser(description="Генерация синтетических таблиц результатов")
+    parser.add_argument("output", help="Каталог для изображений")
+    parser.add_argument("-n", "--count", type=int, default=5, help="Число изображений")
+    parser.add_argument("--rows", type=int, default=20, help="Игроков на изображении")
+    parser.add_argument("--width", type=int, default=900)
+    parser.add_argument("--row-height", type=int, default=28)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    for i in range(args.count):
+        image, rows, _ = generate(args.rows, args.width, args.row_height, args.seed + i)
+        stem = os.path.join(args.output, f"scoreboard_{i:03d}")
+        image.save(stem + ".png")
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+    print(f"Сохранено изображений: {args.count} в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,14 @@
 import sqlite3
 import random
-from typing import List, Tuple, Optional
+import threading
+import time
+from typing import List, Tuple, Optional, Dict, Any, Iterator, Callable, Set, TypeVar
 import os
 
+import metrics
+
+T = TypeVar("T")
+
 class DatabaseHandler:
     """Обработчик работы с базой данных SQLite"""
 
@@ -19,35 +25,299 @@ class DatabaseHandler:
         )
     """
 
+    CREATE_TEMPLATES_SQL = """
+        CREATE TABLE IF NOT EXISTS CropTemplates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            x1 INTEGER NOT NULL,
+            y1 INTEGER NOT NULL,
+            x2 INTEGER NOT NULL,
+            y2 INTEGER NOT NULL
+        )
+    """
+
     INSERT_USER_SQL = """
         INSERT INTO Users 
         (username, urank, kills, deads, kills_deads, to_main)
         VALUES(?, ?, ?, ?, ?, ?)
     """
 
-    def __init__(self, db_name: str = 'my_database.db') -> None:
-        
-        os.makedirs(os.path.dirname(db_name), exist_ok=True)
-        self.connection = sqlite3.connect(db_name)
+    CREATE_IMPORT_BATCH_SQL = """
+        CREATE TEMP TABLE IF NOT EXISTS ImportBatch (
+            name TEXT PRIMARY KEY,
+            kills INTEGER NOT NULL,
+            deaths INTEGER NOT NULL,
+            user_id INTEGER,
+            created INTEGER NOT NULL DEFAULT 0,
+            fuzzy INTEGER NOT NULL DEFAULT 0
+        )
+    """
+
+    CREATE_ROSTER_BATCH_SQL = """
+        CREATE TEMP TABLE IF NOT EXISTS RosterBatch (
+            name TEXT PRIMARY KEY,
+            urank TEXT NOT NULL,
+            kills INTEGER NOT NULL,
+            deaths INTEGER NOT NULL,
+            user_id INTEGER,
+            old_kills INTEGER NOT NULL DEFAULT 0,
+            old_deaths INTEGER NOT NULL DEFAULT 0,
+            created INTEGER NOT NULL DEFAULT 0
+        )
+    """
+
+    # Первая неоткаченная загрузка состава после импорта ?, затронувшая его игроков
+    LATER_ROSTER_SQL = """
+        SELECT MIN(i.id) FROM Imports i
+        JOIN MatchResults r ON r.import_id = i.id
+        WHERE i.id > ?1 AND i.kind = 'roster' AND i.rolled_back = 0
+          AND r.user_id IN (SELECT user_id FROM MatchResults WHERE import_id = ?1)
+        HAVING MIN(i.id) IS NOT NULL
+    """
+
+    # Порог K/D для перевода в основной состав
+    TO_MAIN_KD = 0.75
+
+    # Параллельный доступ: сколько ждать блокировку другой записи и сколько раз повторять
+    BUSY_TIMEOUT = 10.0
+    BUSY_RETRIES = 3
+    RETRY_DELAY = 0.2
+
+    # Миграции схемы (версия, SQL); номер примененной хранится в PRAGMA user_version.
+    # Существующие миграции не меняются - новые добавляются в конец списка.
+    MIGRATIONS: List[Tuple[int, List[str]]] = [
+        (1, [CREATE_TABLE_SQL, CREATE_TEMPLATES_SQL]),
+        (2, [
+            # Индекс для поиска по OCR-никнейму; существующие значения не изменяются
+            "CREATE INDEX IF NOT EXISTS idx_users_ocr_nickname "
+            "ON Users(ocr_nickname) WHERE ocr_nickname IS NOT NULL",
+            # Имена могут повторяться (например, "Новый"), поэтому индекс не уникальный
+            "CREATE INDEX IF NOT EXISTS idx_users_username ON Users(username, id)",
+            "CREATE INDEX IF NOT EXISTS idx_templates_size ON CropTemplates(width, height)",
+        ]),
+        (3, ["ANALYZE"]),
+        (4, [
+            # Журнал импортов и неизменяемая история результатов по скриншотам
+            """
+            CREATE TABLE IF NOT EXISTS Imports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                rows INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                rolled_back INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS MatchResults (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                import_id INTEGER NOT NULL REFERENCES Imports(id),
+                user_id INTEGER NOT NULL,
+                ocr_name TEXT,
+                kills INTEGER NOT NULL,
+                deaths INTEGER NOT NULL,
+                created INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_results_import ON MatchResults(import_id, user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_results_user ON MatchResults(user_id, import_id)",
+            "CREATE INDEX IF NOT EXISTS idx_imports_created ON Imports(created_at)",
+        ]),
+        (5, [
+            # Счетчик версии данных: каждая вставка/правка/удаление игрока получает новый номер,
+            # чтобы интерфейс перечитывал только изменившиеся строки
+            """
+            CREATE TABLE IF NOT EXISTS DataVersion (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                rev INTEGER NOT NULL
+            )
+            """,
+            "INSERT OR IGNORE INTO DataVersion (id, rev) VALUES (1, 0)",
+            "ALTER TABLE Users ADD COLUMN rev INTEGER NOT NULL DEFAULT 0",
+            "CREATE INDEX IF NOT EXISTS idx_users_rev ON Users(rev)",
+            """
+            CREATE TABLE IF NOT EXISTS DeletedUsers (
+                id INTEGER PRIMARY KEY,
+                rev INTEGER NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_deleted_rev ON DeletedUsers(rev)",
+            """
+            CREATE TRIGGER IF NOT EXISTS users_rev_insert AFTER INSERT ON Users
+            BEGIN
+                UPDATE DataVersion SET rev = rev + 1 WHERE id = 1;
+                UPDATE Users SET rev = (SELECT rev FROM DataVersion WHERE id = 1) WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_rev_update
+            AFTER UPDATE OF username, urank, kills, deads, kills_deads, to_main, ocr_nickname ON Users
+            BEGIN
+                UPDATE DataVersion SET rev = rev + 1 WHERE id = 1;
+                UPDATE Users SET rev = (SELECT rev FROM DataVersion WHERE id = 1) WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_rev_delete AFTER DELETE ON Users
+            BEGIN
+                UPDATE DataVersion SET rev = rev + 1 WHERE id = 1;
+                INSERT OR REPLACE INTO DeletedUsers (id, rev)
+                VALUES (OLD.id, (SELECT rev FROM DataVersion WHERE id = 1));
+            END
+            """,
+        ]),
+        (6, [
+            # Индексы для постраничной сортировки по (колонка, id)
+            "CREATE INDEX IF NOT EXISTS idx_users_kills ON Users(kills, id)",
+            "CREATE INDEX IF NOT EXISTS idx_users_kd ON Users(kills_deads, id)",
+            "CREATE INDEX IF NOT EXISTS idx_users_rank ON Users(urank, id)",
+        ]),
+        (7, [
+            # Варианты написания ника из OCR, сопоставленные игроку нечетким поиском
+            """
+            CREATE TABLE IF NOT EXISTS NicknameAliases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                alias TEXT NOT NULL UNIQUE,
+                user_id INTEGER NOT NULL,
+                import_id INTEGER
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_aliases_user ON NicknameAliases(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_aliases_import ON NicknameAliases(import_id)",
+            """
+            CREATE TRIGGER IF NOT EXISTS users_aliases_delete AFTER DELETE ON Users
+            BEGIN
+                DELETE FROM NicknameAliases WHERE user_id = OLD.id;
+            END
+            """,
+        ]),
+        (8, [
+            # Вид импорта: 'match' - результаты скриншотов, 'roster' - загрузка состава,
+            # в MatchResults которой хранится разница с прежними итогами
+            "ALTER TABLE Imports ADD COLUMN kind TEXT NOT NULL DEFAULT 'match'",
+        ]),
+        (9, [
+            # Хэш исходного файла пишется в той же транзакции, что и результаты:
+            # продолжение пакетного импорта сверяется с базой, а не с отдельным журналом
+            "ALTER TABLE Imports ADD COLUMN source_hash TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_imports_hash ON Imports(source_hash) "
+            "WHERE source_hash IS NOT NULL",
+        ]),
+    ]
+
+    def __init__(self, db_name: str = 'my_database.db', busy_timeout: Optional[float] = None,
+                 wal: bool = True) -> None:
+        """Одно соединение-писатель (под блокировкой, доступно из любого потока)
+        и отдельные соединения для чтения в каждом потоке.
+        В режиме WAL чтение не ждет записи, а другие процессы могут работать с тем же файлом."""
+        if os.path.dirname(db_name):
+            os.makedirs(os.path.dirname(db_name), exist_ok=True)
+        self.db_name = db_name
+        self.busy_timeout = self.BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        # IMMEDIATE: блокировка записи берется в начале транзакции, поэтому ожидание
+        # по busy_timeout работает и не бывает взаимоблокировки при повышении чтения до записи
+        self.connection = self._connect(isolation_level="IMMEDIATE")
         self.cursor = self.connection.cursor()
+        self._closed = False
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        # База в памяти видна только своему соединению
+        self._shared_reads = db_name == ":memory:" or db_name.startswith("file::memory:")
+        self.last_import_id: Optional[int] = None
+        if wal and not self._shared_reads:
+            self.journal_mode = self.connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if self.journal_mode == "wal":
+                self.connection.execute("PRAGMA synchronous=NORMAL")
+        else:
+            self.journal_mode = self.connection.execute("PRAGMA journal_mode").fetchone()[0]
         self._initialize_database()
 
+    def _connect(self, isolation_level: Optional[str] = "") -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.db_name,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            isolation_level=isolation_level,
+            factory=metrics.TracedConnection
+        )
+        metrics.register_connection(connection)
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """Соединение только для чтения текущего потока"""
+        if self._shared_reads:
+            return self.connection
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = self._local.reader = self._connect(isolation_level=None)
+            reader.execute("PRAGMA query_only = ON")
+            with self._readers_lock:
+                self._readers.append(reader)
+        return reader
+
+    @staticmethod
+    def _is_busy(error: sqlite3.Error) -> bool:
+        message = str(error).lower()
+        return "locked" in message or "busy" in message
+
+    def _write(self, work: Callable[[], T]) -> T:
+        """Выполнение записи одной транзакцией с повтором, если база занята другим процессом"""
+        with self._write_lock:
+            for attempt in range(self.BUSY_RETRIES + 1):
+                try:
+                    result = work()
+                    self.connection.commit()
+                    return result
+                except sqlite3.OperationalError as e:
+                    self.connection.rollback()
+                    if not self._is_busy(e) or attempt == self.BUSY_RETRIES:
+                        raise
+                    metrics.count("db.busy_retries")
+                    time.sleep(self.RETRY_DELAY * (attempt + 1))
+                except sqlite3.Error:
+                    self.connection.rollback()
+                    raise
+
+    @classmethod
+    def latest_schema_version(cls) -> int:
+        return cls.MIGRATIONS[-1][0]
+
+    def schema_version(self) -> int:
+        """Текущая версия схемы файла базы"""
+        return self.cursor.execute("PRAGMA user_version").fetchone()[0]
+
     def _initialize_database(self) -> None:
-        """Инициализация структуры базы данных"""
-        try:
-            self.cursor.execute(self.CREATE_TABLE_SQL)
-            self.connection.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при создании таблицы: {e}")
+        """Инициализация структуры базы данных и применение миграций"""
+        current = self.schema_version()
+        for version, statements in self.MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                # Каждая миграция атомарна вместе с номером версии
+                self.cursor.execute("BEGIN IMMEDIATE")
+                if self.schema_version() >= version:
+                    # Другой процесс успел применить миграцию, пока мы ждали блокировку
+                    self.connection.rollback()
+                    continue
+                for sql in statements:
+                    self.cursor.execute(sql)
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+                self.connection.commit()
+            except sqlite3.Error as e:
+                self.connection.rollback()
+                print(f"Ошибка миграции схемы до версии {version}: {e}")
+                # С частично обновленной схемой база не открывается
+                raise
 
     #region CRUD Operations
     def create_new_user(self) -> int:
         """Создает нового пользователя с дефолтными значениями"""
         default_data = ("Новый", "-", 0, 0, 0.0, False)
         try:
-            self.cursor.execute(self.INSERT_USER_SQL, default_data)
-            self.connection.commit()
-            return self.cursor.lastrowid
+            return self._write(lambda: self.cursor.execute(self.INSERT_USER_SQL, default_data).lastrowid)
         except sqlite3.Error as e:
             print(f"Ошибка при создании пользователя: {e}")
             return -1
@@ -55,7 +325,7 @@ class DatabaseHandler:
     def fetch_all_users(self) -> List[Tuple]:
         """Возвращает всех пользователей из базы"""
         try:
-            return self.cursor.execute('''
+            return self._reader().execute('''
                 SELECT id, username, urank, kills, deads, kills_deads, to_main 
                 FROM Users
             ''').fetchall()
@@ -63,23 +333,147 @@ class DatabaseHandler:
             print(f"Ошибка при получении данных: {e}")
             return []
 
+    #region Paged Queries
+    USER_COLUMNS = "id, username, urank, kills, deads, kills_deads, to_main"
+    SORT_COLUMNS = ("id", "username", "urank", "kills", "deads", "kills_deads", "to_main")
+    DEFAULT_PAGE_SIZE = 500
+
+    @staticmethod
+    def _filter_sql(filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """WHERE по фильтрам: rank, min_kills, to_main, name_prefix"""
+        clauses, params = [], []
+        filters = filters or {}
+        if filters.get("rank"):
+            clauses.append("urank = ?")
+            params.append(filters["rank"])
+        if filters.get("min_kills") is not None:
+            clauses.append("kills >= ?")
+            params.append(int(filters["min_kills"]))
+        if filters.get("to_main") is not None:
+            clauses.append("to_main = ?")
+            params.append(1 if filters["to_main"] else 0)
+        if filters.get("name_prefix"):
+            # Диапазон вместо LIKE, чтобы использовался индекс по username
+            clauses.append("username >= ? AND username < ?")
+            params.extend([filters["name_prefix"], filters["name_prefix"] + "\U0010ffff"])
+        return " AND ".join(clauses) or "1", params
+
+    def count_users(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Число игроков, подходящих под фильтр"""
+        where, params = self._filter_sql(filters)
+        try:
+            return self._reader().execute(
+                f"SELECT COUNT(*) FROM Users WHERE {where}", params
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете пользователей: {e}")
+            return 0
+
+    def query_users(self, filters: Optional[Dict[str, Any]] = None, sort: str = "id",
+                    descending: bool = False, page_size: int = DEFAULT_PAGE_SIZE,
+                    after: Optional[Tuple[Any, int]] = None) -> Tuple[List[Tuple], Optional[Tuple[Any, int]]]:
+        """Одна страница игроков и курсор следующей (значение сортировки, id) или None"""
+        if sort not in self.SORT_COLUMNS:
+            raise ValueError(f"Недопустимая колонка сортировки: {sort}")
+        where, params = self._filter_sql(filters)
+        order = "DESC" if descending else "ASC"
+        if after is not None:
+            # Keyset: продолжение строго после последней строки прошлой страницы
+            where += f" AND ({sort}, id) {'<' if descending else '>'} (?, ?)"
+            params.extend(after)
+        sort_index = self.SORT_COLUMNS.index(sort)  # Порядок совпадает с USER_COLUMNS
+        try:
+            rows = self._reader().execute(f'''
+                SELECT {self.USER_COLUMNS} FROM Users
+                WHERE {where}
+                ORDER BY {sort} {order}, id {order}
+                LIMIT ?
+            ''', (*params, page_size)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении страницы: {e}")
+            return [], None
+        if len(rows) < page_size:
+            return rows, None
+        return rows, (rows[-1][sort_index], rows[-1][0])
+
+    def iter_user_pages(self, filters: Optional[Dict[str, Any]] = None, sort: str = "id",
+                        descending: bool = False,
+                        page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Tuple]]:
+        """Ленивый обход игроков страницами"""
+        cursor = None
+        while True:
+            rows, cursor = self.query_users(filters, sort, descending, page_size, cursor)
+            if rows:
+                yield rows
+            if cursor is None:
+                return
+    #endregion
+
+    def max_user_id(self) -> int:
+        """Наибольший id игрока (0 для пустой таблицы)"""
+        try:
+            return self._reader().execute("SELECT COALESCE(MAX(id), 0) FROM Users").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Ошибка при чтении id: {e}")
+            return 0
+
+    def data_version(self) -> int:
+        """Текущий номер версии данных игроков"""
+        try:
+            return self._reader().execute("SELECT rev FROM DataVersion WHERE id = 1").fetchone()[0]
+        except (sqlite3.Error, TypeError) as e:
+            print(f"Ошибка при чтении версии данных: {e}")
+            return 0
+
+    def fetch_changes(self, since: int) -> Tuple[List[Tuple], List[int], int]:
+        """Изменения после версии since: (новые/измененные строки, удаленные id, новая версия)"""
+        try:
+            reader = self._reader()
+            version = self.data_version()
+            changed = reader.execute('''
+                SELECT id, username, urank, kills, deads, kills_deads, to_main
+                FROM Users WHERE rev > ? ORDER BY id
+            ''', (since,)).fetchall()
+            deleted = [row[0] for row in reader.execute(
+                "SELECT id FROM DeletedUsers WHERE rev > ?", (since,)
+            )]
+            return changed, deleted, version
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении изменений: {e}")
+            return [], [], since
+
     def update_user(self, user_data: Tuple) -> None:
         """Обновляет данные пользователя"""
         try:
-            self.cursor.execute('''
+            self._write(lambda: self.cursor.execute('''
                 UPDATE Users 
                 SET username=?, urank=?, kills=?, deads=?, kills_deads=?, to_main=?
                 WHERE id=?
-            ''', user_data)
-            self.connection.commit()
+            ''', user_data))
         except sqlite3.Error as e:
             print(f"Ошибка при обновлении пользователя: {e}")
 
+    def update_users(self, users_data: List[Tuple]) -> bool:
+        """Пакетное обновление пользователей одной транзакцией"""
+        try:
+            self._write(lambda: self.cursor.executemany('''
+                UPDATE Users
+                SET username=?, urank=?, kills=?, deads=?, kills_deads=?, to_main=?
+                WHERE id=?
+            ''', users_data))
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при пакетном обновлении пользователей: {e}")
+            return False
+
     def delete_user(self, user_id: int) -> None:
         """Удаляет пользователя по ID"""
-        try:
+        def work() -> None:
             self.cursor.execute('DELETE FROM Users WHERE id=?', (user_id,))
-            self.connection.commit()
+            self.cursor.execute('DELETE FROM MatchResults WHERE user_id=?', (user_id,))
+
+        try:
+            self._write(work)
         except sqlite3.Error as e:
             print(f"Ошибка при удалении пользователя: {e}")
     #endregion
@@ -88,31 +482,23 @@ class DatabaseHandler:
     def insert_example_data(self, count: int = 1) -> None:
         """Генерация тестовых данных"""
         example_ranks = ["новобранец", "-", "-", "боец", "офицер", "-", "глава"]
-        
+        rows = []
         for _ in range(count):
             example_k = random.randint(1, 1000)
             example_d = random.randint(1, 1000)
             kd = float(example_k) / float(example_d)
             to_main = bool(kd > 0.75)
-            
-            try:
-                self.cursor.execute(self.INSERT_USER_SQL, (
-                    'example',
-                    random.choice(example_ranks),
-                    example_k,
-                    example_d,
-                    kd,
-                    to_main
-                ))
-            except sqlite3.Error as e:
-                print(f"Ошибка при вставке тестовых данных: {e}")
-        
-        self.connection.commit()
+            rows.append(('example', random.choice(example_ranks), example_k, example_d, kd, to_main))
+
+        try:
+            self._write(lambda: self.cursor.executemany(self.INSERT_USER_SQL, rows))
+        except sqlite3.Error as e:
+            print(f"Ошибка при вставке тестовых данных: {e}")
 
     def find_user_by_name_or_ocr(self, name: str) -> Optional[Tuple]:
         """Поиск пользователя по имени или OCR-никнейму"""
         try:
-            return self.cursor.execute('''
+            return self._reader().execute('''
                 SELECT * FROM Users 
                 WHERE username = ? OR ocr_nickname = ?
             ''', (name, name)).fetchone()
@@ -120,9 +506,34 @@ class DatabaseHandler:
             print(f"Ошибка при поиске пользователя: {e}")
             return None
 
+    def fetch_nicknames(self, since_rev: int = 0, since_alias: int = 0
+                        ) -> Tuple[List[Tuple[int, str]], List[int], int, int]:
+        """Имена для индекса ников после (since_rev, since_alias):
+        (пары (user_id, имя), id игроков для переиндексации, новая версия данных, последний id псевдонима).
+        Для измененных игроков возвращаются все их имена, включая псевдонимы."""
+        try:
+            reader = self._reader()
+            version = self.data_version()
+            users = reader.execute(
+                "SELECT id, username, ocr_nickname FROM Users WHERE rev > ?", (since_rev,)
+            ).fetchall()
+            names = [(user_id, name) for user_id, *user_names in users for name in user_names if name]
+            names += reader.execute('''
+                SELECT user_id, alias FROM NicknameAliases
+                WHERE id > ? OR user_id IN (SELECT id FROM Users WHERE rev > ?)
+            ''', (since_alias, since_rev)).fetchall()
+            stale = [row[0] for row in users] + [row[0] for row in reader.execute(
+                "SELECT id FROM DeletedUsers WHERE rev > ?", (since_rev,)
+            )]
+            last_alias = reader.execute("SELECT COALESCE(MAX(id), 0) FROM NicknameAliases").fetchone()[0]
+            return names, stale, version, last_alias
+        except sqlite3.Error as e:
+            print(f"Ошибка при чтении ников: {e}")
+            return [], [], since_rev, since_alias
+
     def update_user_stats(self, user_id: int, kills: int, deaths: int) -> None:
         """Обновление статистики пользователя с пересчетом K/D"""
-        try:
+        def work() -> None:
             # Получаем текущие значения
             current = self.cursor.execute(
                 "SELECT kills, deads FROM Users WHERE id=?", (user_id,)
@@ -139,15 +550,369 @@ class DatabaseHandler:
                     kills_deads = ?
                 WHERE id = ?
             ''', (new_kills, new_deaths, new_kd, user_id))
-            
-            self.connection.commit()
+
+        try:
+            self._write(work)
         except sqlite3.Error as e:
             print(f"Ошибка при обновлении статистики: {e}")
 
+    def merge_players(self, players: List[Dict[str, Any]], source: Optional[str] = None,
+                      source_hash: Optional[str] = None) -> Tuple[int, int]:
+        """Пакетное слияние игроков одной транзакцией, возвращает (добавлено, обновлено).
+        Каждый вызов записывается как отдельный импорт в историю MatchResults.
+        С source_hash файл, уже импортированный и не откаченный, повторно не применяется;
+        импорт записывается в журнал даже без строк, чтобы файл считался обработанным."""
+        rows = []
+        for player in players:
+            # Проверка обязательных полей
+            if 'name' not in player or 'kills' not in player or 'deaths' not in player:
+                print(f"Invalid player data: {player}")
+                continue
+            # user_id задается заранее, если ник сопоставлен нечетким поиском
+            user_id = player.get('user_id')
+            rows.append((player['name'], int(player['kills']), int(player['deaths']),
+                         user_id, int(user_id is not None)))
+        if not rows and source_hash is None:
+            return 0, 0
+
+        with metrics.span("db.merge", rows=len(rows)) as span:
+            try:
+                inserted, updated = self._write(lambda: self._merge_batch(rows, source, source_hash))
+            except sqlite3.Error as e:
+                print(f"Ошибка при пакетном обновлении: {e}")
+                return 0, 0
+            # Добавленные - ники, не найденные в базе ни точно, ни через псевдонимы
+            span.set(inserted=inserted, updated=updated)
+            metrics.count("db.unmatched", inserted)
+            return inserted, updated
+
+    def _merge_batch(self, rows: List[tuple], source: Optional[str],
+                     source_hash: Optional[str]) -> Tuple[int, int]:
+        """Тело транзакции merge_players; выполняется под блокировкой писателя"""
+        if source_hash is not None and self.cursor.execute(
+                "SELECT 1 FROM Imports WHERE source_hash = ? AND rolled_back = 0", (source_hash,)
+        ).fetchone():
+            print(f"Файл уже импортирован: {source}")
+            return 0, 0
+        self.cursor.execute(self.CREATE_IMPORT_BATCH_SQL)
+        self.cursor.execute("DELETE FROM temp.ImportBatch")
+        # Повторы одного игрока в пакете суммируются
+        self.cursor.executemany('''
+            INSERT INTO temp.ImportBatch (name, kills, deaths, user_id, fuzzy) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                kills = kills + excluded.kills,
+                deaths = deaths + excluded.deaths
+        ''', rows)
+        # Сопоставление с удаленным за это время игроком не действует
+        self.cursor.execute('''
+            UPDATE temp.ImportBatch SET user_id = NULL, fuzzy = 0
+            WHERE user_id IS NOT NULL AND user_id NOT IN (SELECT id FROM Users)
+        ''')
+        self.cursor.execute('''
+            UPDATE temp.ImportBatch SET user_id = COALESCE(
+                (SELECT id FROM Users
+                 WHERE username = ImportBatch.name OR ocr_nickname = ImportBatch.name
+                 ORDER BY id LIMIT 1),
+                (SELECT user_id FROM NicknameAliases WHERE alias = ImportBatch.name)
+            ) WHERE user_id IS NULL
+        ''')
+        updated = self._apply_totals_delta('''
+            SELECT user_id, SUM(kills) AS kills, SUM(deaths) AS deaths
+            FROM temp.ImportBatch WHERE user_id IS NOT NULL GROUP BY user_id
+        ''', (), sign=1)
+        self.cursor.execute(f'''
+            INSERT INTO Users (username, urank, kills, deads, kills_deads, to_main)
+            SELECT name, '-', kills, deaths,
+                   {self._kd_sql("kills", "deaths")},
+                   {self._kd_sql("kills", "deaths")} >= ?
+            FROM temp.ImportBatch WHERE user_id IS NULL
+        ''', (self.TO_MAIN_KD,))
+        inserted = self.cursor.rowcount
+        # Новые игроки получают только что выданные id (последние с таким именем)
+        self.cursor.execute('''
+            UPDATE temp.ImportBatch SET created = 1, user_id = (
+                SELECT MAX(id) FROM Users WHERE username = ImportBatch.name
+            ) WHERE user_id IS NULL
+        ''')
+
+        # История: одна запись на игрока в этом импорте
+        self.cursor.execute(
+            "INSERT INTO Imports (source, rows, source_hash) VALUES (?, ?, ?)",
+            (source, len(rows), source_hash)
+        )
+        self.last_import_id = self.cursor.lastrowid
+        self.cursor.execute('''
+            INSERT INTO MatchResults (import_id, user_id, ocr_name, kills, deaths, created)
+            SELECT ?, user_id, name, kills, deaths, created FROM temp.ImportBatch
+        ''', (self.last_import_id,))
+        # Нечеткие сопоставления запоминаются: в следующий раз ник найдется точно
+        self.cursor.execute('''
+            INSERT OR IGNORE INTO NicknameAliases (alias, user_id, import_id)
+            SELECT name, user_id, ? FROM temp.ImportBatch WHERE fuzzy = 1
+        ''', (self.last_import_id,))
+        return inserted, updated
+
+    def _apply_totals_delta(self, delta_sql: str, params: tuple, sign: int) -> int:
+        """Инкрементальное изменение итогов Users по выборке (user_id, kills, deaths)"""
+        kills = f"Users.kills + {sign} * d.kills"
+        deaths = f"Users.deads + {sign} * d.deaths"
+        self.cursor.execute(f'''
+            UPDATE Users SET
+                kills = {kills},
+                deads = {deaths},
+                kills_deads = {self._kd_sql(kills, deaths)},
+                to_main = {self._kd_sql(kills, deaths)} >= ?
+            FROM ({delta_sql}) AS d
+            WHERE Users.id = d.user_id
+        ''', (self.TO_MAIN_KD, *params))
+        return self.cursor.rowcount
+
+    @staticmethod
+    def _kd_sql(kills: str, deaths: str) -> str:
+        """SQL-выражение K/D с защитой от деления на ноль"""
+        return f"(CASE WHEN ({deaths}) != 0 THEN CAST({kills} AS REAL) / ({deaths}) ELSE 0.0 END)"
+
+    def import_roster(self, rows: List[Tuple[str, str, int, int]],
+                      update_existing: bool = True, source: Optional[str] = None) -> Tuple[int, int]:
+        """Загрузка состава (username, urank, kills, deads) одной транзакцией, возвращает
+        (добавлено, обновлено). Существующим игрокам значения заменяются, а не суммируются.
+        Загрузка записывается в журнал как импорт вида 'roster': в истории хранится разница
+        с прежними итогами, поэтому ее можно откатить (звание не восстанавливается)."""
+        if not rows:
+            return 0, 0
+        try:
+            return self._write(lambda: self._roster_batch(rows, update_existing, source))
+        except sqlite3.Error as e:
+            print(f"Ошибка при загрузке состава: {e}")
+            return 0, 0
+
+    def _roster_batch(self, rows: List[Tuple[str, str, int, int]],
+                      update_existing: bool, source: Optional[str]) -> Tuple[int, int]:
+        """Тело транзакции import_roster"""
+        self.cursor.execute(self.CREATE_ROSTER_BATCH_SQL)
+        self.cursor.execute("DELETE FROM temp.RosterBatch")
+        # Повтор игрока в файле: действует последняя строка
+        self.cursor.executemany('''
+            INSERT INTO temp.RosterBatch (name, urank, kills, deaths) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                urank = excluded.urank, kills = excluded.kills, deaths = excluded.deaths
+        ''', rows)
+        self.cursor.execute('''
+            UPDATE temp.RosterBatch SET user_id = (
+                SELECT id FROM Users
+                WHERE username = RosterBatch.name OR ocr_nickname = RosterBatch.name
+                ORDER BY id LIMIT 1
+            )
+        ''')
+        # Прежние итоги нужны для записи разницы в историю
+        self.cursor.execute('''
+            UPDATE temp.RosterBatch SET old_kills = u.kills, old_deaths = u.deads
+            FROM Users AS u WHERE u.id = RosterBatch.user_id
+        ''')
+        updated = 0
+        if update_existing:
+            self.cursor.execute(f'''
+                UPDATE Users SET
+                    urank = r.urank,
+                    kills = r.kills,
+                    deads = r.deaths,
+                    kills_deads = {self._kd_sql("r.kills", "r.deaths")},
+                    to_main = {self._kd_sql("r.kills", "r.deaths")} >= ?
+                FROM temp.RosterBatch AS r
+                WHERE Users.id = r.user_id
+            ''', (self.TO_MAIN_KD,))
+            updated = self.cursor.rowcount
+        self.cursor.execute(f'''
+            INSERT INTO Users (username, urank, kills, deads, kills_deads, to_main)
+            SELECT name, urank, kills, deaths,
+                   {self._kd_sql("kills", "deaths")},
+                   {self._kd_sql("kills", "deaths")} >= ?
+            FROM temp.RosterBatch WHERE user_id IS NULL
+        ''', (self.TO_MAIN_KD,))
+        inserted = self.cursor.rowcount
+        self.cursor.execute('''
+            UPDATE temp.RosterBatch SET created = 1, user_id = (
+                SELECT MAX(id) FROM Users WHERE username = RosterBatch.name
+            ) WHERE user_id IS NULL
+        ''')
+
+        self.cursor.execute(
+            "INSERT INTO Imports (source, rows, kind) VALUES (?, ?, 'roster')", (source, len(rows))
+        )
+        self.last_import_id = self.cursor.lastrowid
+        # Одна запись на игрока: разница между новыми и прежними итогами.
+        # Несколько строк файла, сопоставленных одному игроку, сворачиваются
+        self.cursor.execute('''
+            INSERT INTO MatchResults (import_id, user_id, ocr_name, kills, deaths, created)
+            SELECT ?, r.user_id, MIN(r.name), u.kills - MAX(r.old_kills),
+                   u.deads - MAX(r.old_deaths), MAX(r.created)
+            FROM temp.RosterBatch r JOIN Users u ON u.id = r.user_id
+            WHERE r.created = 1 OR ?
+            GROUP BY r.user_id
+        ''', (self.last_import_id, update_existing))
+        return inserted, updated
+
+    #region Match History
+    def fetch_imports(self) -> List[Tuple]:
+        """Журнал импортов (id, source, rows, created_at, rolled_back), новые первыми"""
+        try:
+            return self._reader().execute('''
+                SELECT id, source, rows, created_at, rolled_back FROM Imports
+                ORDER BY id DESC
+            ''').fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении импортов: {e}")
+            return []
+
+    def imported_hashes(self) -> Set[str]:
+        """Хэши файлов из неоткаченных импортов"""
+        try:
+            return {row[0] for row in self._reader().execute(
+                "SELECT source_hash FROM Imports WHERE source_hash IS NOT NULL AND rolled_back = 0"
+            )}
+        except sqlite3.Error as e:
+            print(f"Ошибка при чтении журнала импортов: {e}")
+            return set()
+
+    def later_roster_import(self, import_id: int) -> Optional[int]:
+        """Неоткаченная загрузка состава после импорта import_id, затронувшая его игроков.
+        Состав заменил итоги этих игроков, поэтому вычесть вклад импорта уже нельзя."""
+        try:
+            row = self._reader().execute(self.LATER_ROSTER_SQL, (import_id,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Ошибка при проверке импорта: {e}")
+            return None
+        return row[0] if row else None
+
+    def rollback_import(self, import_id: int) -> int:
+        """Откат одного импорта вычитанием его вклада, возвращает число затронутых игроков.
+        Импорт, после которого загружен состав с теми же игроками, не откатывается."""
+        try:
+            return self._write(lambda: self._rollback_batch(import_id))
+        except sqlite3.Error as e:
+            print(f"Ошибка при откате импорта: {e}")
+            return 0
+
+    def _rollback_batch(self, import_id: int) -> int:
+        """Тело транзакции rollback_import"""
+        row = self.cursor.execute(
+            "SELECT rolled_back FROM Imports WHERE id = ?", (import_id,)
+        ).fetchone()
+        if row is None or row[0]:
+            return 0
+        roster_id = self.cursor.execute(self.LATER_ROSTER_SQL, (import_id,)).fetchone()
+        if roster_id:
+            print(f"Импорт {import_id} не откачен: после него загружен состав (импорт {roster_id[0]})")
+            return 0
+
+        affected = self._apply_totals_delta('''
+            SELECT user_id, SUM(kills) AS kills, SUM(deaths) AS deaths
+            FROM MatchResults WHERE import_id = ? GROUP BY user_id
+        ''', (import_id,), sign=-1)
+        # Игроки, созданные этим импортом и не встречающиеся в других, удаляются
+        self.cursor.execute('''
+            DELETE FROM Users WHERE id IN (
+                SELECT m.user_id FROM MatchResults m
+                WHERE m.import_id = ? AND m.created = 1 AND NOT EXISTS (
+                    SELECT 1 FROM MatchResults o JOIN Imports i ON i.id = o.import_id
+                    WHERE o.user_id = m.user_id AND o.import_id != m.import_id
+                      AND i.rolled_back = 0
+                )
+            )
+        ''', (import_id,))
+        self.cursor.execute("DELETE FROM NicknameAliases WHERE import_id = ?", (import_id,))
+        self.cursor.execute("UPDATE Imports SET rolled_back = 1 WHERE id = ?", (import_id,))
+        return affected
+
+    def iter_match_history(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Tuple]]:
+        """История результатов страницами по id: (id, import_id, created_at, source,
+        rolled_back, user_id, ocr_name, kills, deaths, created)"""
+        last_id = 0
+        while True:
+            try:
+                rows = self._reader().execute('''
+                    SELECT m.id, m.import_id, i.created_at, i.source, i.rolled_back,
+                           m.user_id, m.ocr_name, m.kills, m.deaths, m.created
+                    FROM MatchResults m JOIN Imports i ON i.id = m.import_id
+                    WHERE m.id > ?
+                    ORDER BY m.id
+                    LIMIT ?
+                ''', (last_id, page_size)).fetchall()
+            except sqlite3.Error as e:
+                print(f"Ошибка при чтении истории: {e}")
+                return
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][0]
+
+    def fetch_period_totals(self, start: str, end: str) -> List[Tuple]:
+        """Итоги (user_id, username, kills, deaths) по импортам за период [start, end)"""
+        try:
+            return self._reader().execute('''
+                SELECT m.user_id, u.username, SUM(m.kills), SUM(m.deaths)
+                FROM MatchResults m
+                JOIN Imports i ON i.id = m.import_id
+                JOIN Users u ON u.id = m.user_id
+                WHERE i.rolled_back = 0 AND i.kind = 'match'
+                  AND i.created_at >= ? AND i.created_at < ?
+                GROUP BY m.user_id
+                ORDER BY SUM(m.kills) DESC
+            ''', (start, end)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете итогов: {e}")
+            return []
+    #endregion
+
+    #region Crop Templates
+    def save_crop_template(self, name: str, width: int, height: int,
+                           rect: Tuple[int, int, int, int]) -> int:
+        """Сохраняет область обрезки для скриншотов заданного разрешения"""
+        try:
+            return self._write(lambda: self.cursor.execute('''
+                INSERT INTO CropTemplates (name, width, height, x1, y1, x2, y2)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, width, height, *rect)).lastrowid)
+        except sqlite3.Error as e:
+            print(f"Ошибка при сохранении шаблона: {e}")
+            return -1
+
+    def get_crop_templates(self, width: int, height: int) -> List[Tuple]:
+        """Шаблоны (id, name, x1, y1, x2, y2) для разрешения изображения"""
+        try:
+            return self._reader().execute('''
+                SELECT id, name, x1, y1, x2, y2 FROM CropTemplates
+                WHERE width = ? AND height = ?
+                ORDER BY y1, x1
+            ''', (width, height)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении шаблонов: {e}")
+            return []
+
+    def delete_crop_template(self, template_id: int) -> None:
+        """Удаляет шаблон области"""
+        try:
+            self._write(lambda: self.cursor.execute('DELETE FROM CropTemplates WHERE id=?', (template_id,)))
+        except sqlite3.Error as e:
+            print(f"Ошибка при удалении шаблона: {e}")
+    #endregion
+
     def close(self):
         """Закрытие соединения с базой"""
+        if getattr(self, "_closed", True):
+            return
         try:
+            self._closed = True
+            with self._readers_lock:
+                for reader in self._readers:
+                    metrics.unregister_connection(reader)
+                    reader.close()
+                self._readers.clear()
+            # Обновление статистики планировщика, если она устарела
+            self.connection.execute("PRAGMA optimize")
             self.cursor.close()
+            metrics.unregister_connection(self.connection)
             self.connection.close()
         except Exception as e:
             print(f"Ошибка закрытия соединения: {str(e)}")
@@ -0,0 +1,135 @@
+# db_catalog.py
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+
+@dataclass
+class CatalogEntry:
+    """Сводка по файлу базы; stamp - (mtime_ns, размер) базы и ее WAL-журнала"""
+    path: str
+    stamp: Tuple[int, int, int, int]
+    players: Optional[int] = None
+    kills: Optional[int] = None
+    last_import: Optional[str] = None
+    schema_version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class DatabaseCatalog:
+    """Кэш сводок по базам каталога data/ в JSON-файле рядом с кэшем OCR.
+    Перечитываются только базы, у которых изменились время или размер."""
+
+    CACHE_VERSION = 1
+
+    def __init__(self, directory: str = "data",
+                 cache_path: str = os.path.join("cache", "catalog.json")) -> None:
+        self.directory = directory
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, CatalogEntry] = self._load()
+
+    def _load(self) -> Dict[str, CatalogEntry]:
+        """Чтение кэша; поврежденный или старый файл просто игнорируется"""
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                raw = json.load(f)
+            if raw.get("version") != self.CACHE_VERSION:
+                return {}
+            return {
+                item["path"]: CatalogEntry(**dict(item, stamp=tuple(item["stamp"])))
+                for item in raw.get("entries", [])
+            }
+        except (OSError, ValueError, TypeError, KeyError):
+            return {}
+
+    def _save(self, entries: Dict[str, CatalogEntry]) -> None:
+        """Атомарная запись кэша: временный файл и замена"""
+        if os.path.dirname(self.cache_path):
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.CACHE_VERSION,
+                       "entries": [asdict(entry) for entry in entries.values()]},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def list_paths(self) -> List[str]:
+        """Файлы .db каталога по имени"""
+        if not os.path.isdir(self.directory):
+            return []
+        return [os.path.join(self.directory, name)
+                for name in sorted(os.listdir(self.directory)) if name.endswith(".db")]
+
+    @staticmethod
+    def file_stamp(path: str) -> Tuple[int, int, int, int]:
+        """Время и размер базы и WAL: в режиме WAL изменения долго не доходят до .db"""
+        stat = os.stat(path)
+        try:
+            wal = os.stat(path + "-wal")
+            wal_stamp = (wal.st_mtime_ns, wal.st_size)
+        except OSError:
+            wal_stamp = (0, 0)
+        return (stat.st_mtime_ns, stat.st_size) + wal_stamp
+
+    def cached(self) -> List[CatalogEntry]:
+        """Известные сводки для текущего списка файлов, без чтения баз.
+        Для новых файлов возвращается пустая запись."""
+        with self._lock:
+            entries = dict(self.entries)
+        return [entries.get(path) or CatalogEntry(path, (0, 0, 0, 0)) for path in self.list_paths()]
+
+    @staticmethod
+    def read_summary(path: str, stamp: Tuple[int, int, int, int]) -> CatalogEntry:
+        """Сводка по базе через соединение только для чтения (без миграций)"""
+        entry = CatalogEntry(path, stamp)
+        try:
+            uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, timeout=1.0)
+            try:
+                entry.schema_version = connection.execute("PRAGMA user_version").fetchone()[0]
+                entry.players, entry.kills = connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(kills), 0) FROM Users"
+                ).fetchone()
+                tables = {row[0] for row in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'")}
+                if "Imports" in tables:
+                    entry.last_import = connection.execute(
+                        "SELECT MAX(created_at) FROM Imports WHERE rolled_back = 0"
+                    ).fetchone()[0]
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            entry.error = str(e)
+        return entry
+
+    def refresh(self) -> List[CatalogEntry]:
+        """Перечитывание измененных баз и запись кэша; вызывается в фоновом потоке"""
+        with self._lock:
+            known = dict(self.entries)
+        entries: Dict[str, CatalogEntry] = {}
+        changed = False
+        for path in self.list_paths():
+            try:
+                stamp = self.file_stamp(path)
+            except OSError:
+                continue  # Файл удален во время обхода
+            entry = known.get(path)
+            if entry is None or entry.stamp != stamp or entry.error:
+                entry = self.read_summary(path, stamp)
+                changed = True
+            entries[path] = entry
+        changed = changed or entries.keys() != known.keys()
+
+        with self._lock:
+            self.entries = entries
+        if changed:
+            try:
+                self._save(entries)
+            except OSError as e:
+                print(f"Не удалось сохранить каталог баз: {e}")
+        return list(entries.values())
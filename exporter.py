@@ -0,0 +1,244 @@
+# exporter.py
+import argparse
+import csv
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from database import DatabaseHandler
+
+EXPORT_FORMATS = (".xlsx", ".csv")
+CHUNK_SIZE = 2000  # Строк на один запрос к базе
+
+ProgressCallback = Callable[[int], None]
+
+# Первые символы, с которых Excel начинает формулу при открытии CSV
+FORMULA_PREFIXES = ("=", "+", "-", "@")
+
+
+@dataclass
+class ExportColumn:
+    """Колонка выгрузки: заголовок, ширина в символах и числовой формат Excel"""
+    title: str
+    width: int
+    number_format: Optional[str] = None
+
+
+@dataclass
+class ExportSheet:
+    """Лист выгрузки и источник его строк (база или сводный запрос multi_db)"""
+    name: str
+    columns: List[ExportColumn]
+    rows: Callable[[Any], Iterator[List[Tuple]]]
+    convert: Callable[[Tuple], Sequence[Any]] = tuple
+
+
+def _user_rows(db: DatabaseHandler) -> Iterator[List[Tuple]]:
+    return db.iter_user_pages(page_size=CHUNK_SIZE)
+
+
+def _user_values(row: Tuple) -> Sequence[Any]:
+    user_id, username, rank, kills, deaths, kd, to_main = row
+    return user_id, username, rank, kills, deaths, kd, "+" if to_main else "-"
+
+
+def _history_rows(db: DatabaseHandler) -> Iterator[List[Tuple]]:
+    return db.iter_match_history(page_size=CHUNK_SIZE)
+
+
+def _history_values(row: Tuple) -> Sequence[Any]:
+    _, import_id, created_at, source, rolled_back, user_id, ocr_name, kills, deaths, created = row
+    return (import_id, created_at, source, user_id, ocr_name, kills, deaths,
+            "да" if created else "", "откачен" if rolled_back else "")
+
+
+USERS_SHEET = ExportSheet(
+    "Игроки",
+    [
+        ExportColumn("ID", 8, "0"),
+        ExportColumn("Username", 28),
+        ExportColumn("Rank", 14),
+        ExportColumn("Kills", 10, "#,##0"),
+        ExportColumn("Deads", 10, "#,##0"),
+        ExportColumn("K/D", 8, "0.00"),
+        ExportColumn("To Main", 9),
+    ],
+    _user_rows,
+    _user_values,
+)
+
+HISTORY_SHEET = ExportSheet(
+    "История",
+    [
+        ExportColumn("Импорт", 8, "0"),
+        ExportColumn("Дата", 20),
+        ExportColumn("Источник", 40),
+        ExportColumn("ID игрока", 10, "0"),
+        ExportColumn("Ник OCR", 28),
+        ExportColumn("Kills", 10, "#,##0"),
+        ExportColumn("Deads", 10, "#,##0"),
+        ExportColumn("Новый", 7),
+        ExportColumn("Статус", 10),
+    ],
+    _history_rows,
+    _history_values,
+)
+
+
+LEADERBOARD_SHEET = ExportSheet(
+    "Рейтинг",
+    [
+        ExportColumn("Место", 8, "0"),
+        ExportColumn("Username", 28),
+        ExportColumn("Kills", 10, "#,##0"),
+        ExportColumn("Deads", 10, "#,##0"),
+        ExportColumn("K/D", 8, "0.00"),
+        ExportColumn("Баз", 6, "0"),
+    ],
+    lambda query: query.iter_leaderboard(page_size=CHUNK_SIZE),
+)
+
+
+def _write_xlsx(db: Any, path: str, sheets: List[ExportSheet],
+                progress: Optional[ProgressCallback]) -> int:
+    """Выгрузка в .xlsx в режиме write-only: строки пишутся в файл сразу, память не растет.
+    Без lxml openpyxl сериализует ячейки медленно (около 20 с на 100 тыс. строк);
+    для больших выгрузок быстрее CSV."""
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        from openpyxl.utils import get_column_letter
+    except ImportError as e:
+        raise RuntimeError("Для выгрузки в Excel нужен пакет openpyxl (pip install openpyxl)") from e
+
+    workbook = Workbook(write_only=True)
+    written = 0
+    for sheet in sheets:
+        ws = workbook.create_sheet(sheet.name)
+        # Ширины задаются до первой строки: в write-only режиме они пишутся в заголовок листа
+        for index, column in enumerate(sheet.columns, 1):
+            ws.column_dimensions[get_column_letter(index)].width = column.width
+        ws.freeze_panes = "A2"
+
+        header_font = Font(bold=True)
+        header = []
+        for column in sheet.columns:
+            cell = WriteOnlyCell(ws, value=column.title)
+            cell.font = header_font
+            header.append(cell)
+        ws.append(header)
+
+        # Ячейки с форматом создаются один раз на колонку: строка сериализуется при append
+        formatted = {}
+        for index, column in enumerate(sheet.columns):
+            if column.number_format:
+                cell = WriteOnlyCell(ws)
+                cell.number_format = column.number_format
+                formatted[index] = cell
+        for page in sheet.rows(db):
+            for row in page:
+                values = list(sheet.convert(row))
+                for index, cell in formatted.items():
+                    cell.value = values[index]
+                    values[index] = cell
+                for index, value in enumerate(values):
+                    # Ник из OCR вида "=SUM(1)" openpyxl записал бы формулой
+                    if isinstance(value, str) and value.startswith("="):
+                        cell = WriteOnlyCell(ws, value=value)
+                        cell.data_type = "s"
+                        values[index] = cell
+                ws.append(values)
+            written += len(page)
+            if progress:
+                progress(written)
+    workbook.save(path)
+    return written
+
+
+def _csv_value(value: Any) -> Any:
+    """Текст, который Excel принял бы за формулу, экранируется апострофом.
+    Одиночные "+" и "-" (отметка основы, пустое звание) формулой не считаются."""
+    if isinstance(value, str) and len(value) > 1 and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _write_csv(db: Any, path: str, sheets: List[ExportSheet],
+               progress: Optional[ProgressCallback]) -> int:
+    """Выгрузка в CSV: первый лист - в path, остальные - в файлы с суффиксом имени листа"""
+    stem, ext = os.path.splitext(path)
+    written = 0
+    for index, sheet in enumerate(sheets):
+        sheet_path = path if index == 0 else f"{stem}_{sheet.name}{ext}"
+        # utf-8-sig и ';' - чтобы Excel с русской локалью открыл файл без мастера импорта
+        with open(sheet_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow([column.title for column in sheet.columns])
+            for page in sheet.rows(db):
+                writer.writerows([_csv_value(value) for value in sheet.convert(row)] for row in page)
+                written += len(page)
+                if progress:
+                    progress(written)
+    return written
+
+
+def export_database(db: DatabaseHandler, path: str, include_history: bool = True,
+                    progress: Optional[ProgressCallback] = None) -> int:
+    """Выгрузка игроков (и истории импортов) в .xlsx или .csv по расширению; возвращает число строк"""
+    sheets = [USERS_SHEET, HISTORY_SHEET] if include_history else [USERS_SHEET]
+    return export_sheets(db, path, sheets, progress)
+
+
+def export_leaderboard(query: Any, path: str, order: str = "kills",
+                       progress: Optional[ProgressCallback] = None) -> int:
+    """Выгрузка сводного рейтинга MultiDatabaseQuery (после build_leaderboard)"""
+    sheet = ExportSheet(LEADERBOARD_SHEET.name, LEADERBOARD_SHEET.columns,
+                        lambda source: source.iter_leaderboard(page_size=CHUNK_SIZE, order=order))
+    return export_sheets(query, path, [sheet], progress)
+
+
+def export_sheets(source: Any, path: str, sheets: List[ExportSheet],
+                  progress: Optional[ProgressCallback] = None) -> int:
+    """Запись листов в .xlsx или .csv по расширению; возвращает число строк"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат: {ext or path}")
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if ext == ".xlsx":
+        return _write_xlsx(source, path, sheets, progress)
+    return _write_csv(source, path, sheets, progress)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Выгрузка базы из командной строки"""
+    from batch_import import resolve_db_path
+
+    parser = argparse.ArgumentParser(description="Выгрузка базы игроков в Excel или CSV")
+    parser.add_argument("database", help="Имя базы в data/ (например war.db)")
+    parser.add_argument("output", help="Файл .xlsx или .csv")
+    parser.add_argument("--no-history", action="store_true", help="Без листа истории импортов")
+    args = parser.parse_args(argv)
+
+    db_path = resolve_db_path(args.database)
+    if not os.path.exists(db_path):
+        print(f"База не найдена: {db_path}")
+        return 1
+    db = DatabaseHandler(db_path)
+    started = time.perf_counter()
+    try:
+        rows = export_database(db, args.output, not args.no_history)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"Ошибка выгрузки: {e}")
+        return 1
+    finally:
+        db.close()
+    print(f"Выгружено строк: {rows} в {args.output} за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
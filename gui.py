@@ -1,9 +1,16 @@
 # gui.py
+import os
 import tkinter as tk
-from tkinter import messagebox, filedialog
-from typing import Dict, List, Tuple, Any
-from myOCR_test import OCRApp, CropWindow
+from tkinter import messagebox, filedialog, ttk
+from typing import Dict, List, Tuple, Any, Optional, Set, Iterator
+from ocr_cache import OCRCache
+from ocr_worker import get_default_worker
+from nickname_index import get_resolver
+from exporter import export_database, export_leaderboard
+from multi_db import LEADERBOARD_ORDER, MultiDatabaseQuery
+from roster_import import import_roster_file
 from database import DatabaseHandler
+import metrics
 
 class ThemeManager:
     """Управление стилями интерфейса"""
@@ -54,42 +61,242 @@ class ThemeManager:
                 disabledbackground=cls.DARK_THEME["entry_bg"]
             )
 
+class TableModel:
+    """Модель строк таблицы: прямой доступ к ячейкам и учет измененных строк"""
+
+    def __init__(self) -> None:
+        self.rows: List[List[str]] = []     # Загруженные (отображаемые) значения строк
+        self.id_index: Dict[str, int] = {}  # ID -> индекс строки в rows
+        # ID -> строка, измененная пользователем; правки переживают перезагрузку выборки
+        self.dirty: Dict[str, List[str]] = {}
+        # Измененные пользователем строки, которые после правки изменились и в БД
+        self.conflicts: Set[str] = set()
+        self.max_id = 0  # Наибольший id на момент загрузки: id больше него - новые строки
+        self.data_version: Optional[int] = None  # Версия данных БД, отраженная в модели
+        # Параметры выборки; строки подгружаются страницами по мере прокрутки
+        self.filters: Dict[str, Any] = {}
+        self.sort = "id"
+        self.descending = False
+        self.total = 0
+        self._pages: Optional[Iterator[List[Tuple]]] = None
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def is_default_view(self) -> bool:
+        """Без фильтров и в порядке id: новые строки всегда в конце"""
+        return not self.filters and self.sort == "id" and not self.descending
+
+    @staticmethod
+    def format_value(col: int, value: Any) -> str:
+        """Форматирование значений для отображения"""
+        if col == 5:  # K/D
+            return f"{float(value):.2f}"
+        if col == 6:  # To Main
+            return "+" if value else "-"
+        return str(value)
+
+    @classmethod
+    def format_row(cls, user: Tuple) -> List[str]:
+        return [cls.format_value(col, value) for col, value in enumerate(user[:7])]
+
+    @staticmethod
+    def row_to_db(data: List[str]) -> Tuple:
+        """Конвертация отображаемых значений в порядок, ожидаемый update_user"""
+        return (
+            data[1],  # username
+            data[2],  # urank
+            int(data[3]),  # kills
+            int(data[4]),  # deads
+            float(data[5]),  # kills_deads
+            data[6] == "+",  # to_main
+            int(data[0])  # id (должен быть последним для WHERE)
+        )
+
+    def get(self, row_idx: int, col: int) -> str:
+        return self.rows[row_idx][col]
+
+    def row_id(self, row_idx: int) -> int:
+        return int(self.rows[row_idx][0])
+
+    def set_cell(self, row_idx: int, col: int, value: str) -> List[int]:
+        """Правка ячейки; возвращает колонки, значения которых изменились"""
+        row = self.rows[row_idx]
+        if row[col] == value:
+            return []
+        row[col] = value
+        self.dirty[row[0]] = row
+        changed = [col]
+        if col in (3, 4) and self._update_kd(row):  # Поля, от которых зависит K/D
+            changed.append(5)
+        return changed
+
+    @staticmethod
+    def _update_kd(row: List[str]) -> bool:
+        """Пересчет K/D строки"""
+        try:
+            kills = int(row[3])
+            deads = int(row[4])
+        except ValueError:
+            return False
+        kd = f"{(kills / deads if deads != 0 else 0.0):.2f}"
+        if row[5] == kd:
+            return False
+        row[5] = kd
+        return True
+
+    def set_query(self, filters: Dict[str, Any], sort: str, descending: bool) -> None:
+        self.filters = {k: v for k, v in filters.items() if v not in (None, "")}
+        self.sort = sort
+        self.descending = descending
+        self.data_version = None  # Следующее обновление - полная перезагрузка
+        # Смена выборки подтверждена пользователем - несохраненные правки отбрасываются
+        self.dirty.clear()
+        self.conflicts.clear()
+
+    def load(self, db: DatabaseHandler) -> None:
+        """Перезагрузка: подсчет строк и первая страница, остальные - по требованию.
+        Несохраненные правки сохраняются: строка из БД заменяется измененной пользователем."""
+        # Версия читается до строк: изменения, попавшие между запросами, просто применятся повторно
+        self.data_version = db.data_version()
+        self.max_id = db.max_user_id()
+        self.total = db.count_users(self.filters)
+        self.rows = []
+        self.id_index = {}
+        self._pages = db.iter_user_pages(self.filters, self.sort, self.descending)
+        self.ensure_loaded(0)
+
+    def ensure_loaded(self, row_idx: int) -> None:
+        """Подгрузка страниц, пока строка row_idx не окажется в памяти"""
+        while self._pages is not None and len(self.rows) <= row_idx:
+            page = next(self._pages, None)
+            if page is None:
+                self._pages = None
+                self.total = len(self.rows)  # Точное число после полного обхода
+                break
+            for user in page:
+                user_id = str(user[0])
+                self.id_index[user_id] = len(self.rows)
+                self.rows.append(self.dirty.get(user_id) or self.format_row(user))
+
+    @property
+    def fully_loaded(self) -> bool:
+        return self._pages is None
+
+    def apply_changes(self, db: DatabaseHandler) -> None:
+        """Инкрементальное обновление: затрагиваются только измененные в БД id.
+        Несохраненные правки не перезаписываются - такие строки попадают в conflicts."""
+        if not self.is_default_view:
+            # Изменения могут сдвинуть строки в сортировке или фильтре - перечитываем выборку
+            if db.data_version() != self.data_version:
+                changed, deleted, _ = db.fetch_changes(self.data_version)
+                self._drop_deleted_edits(deleted)
+                self.conflicts.update(str(user[0]) for user in changed if str(user[0]) in self.dirty)
+                self.load(db)
+            return
+        changed, deleted, version = db.fetch_changes(self.data_version)
+        self.data_version = version
+        if deleted:
+            deleted_ids = self._drop_deleted_edits(deleted)
+            before = len(self.rows)
+            self.rows = [row for row in self.rows if row[0] not in deleted_ids]
+            self._reindex()
+            # Удаленные из еще не загруженной части уменьшат total при дозагрузке
+            self.total -= before - len(self.rows)
+        for user in changed:
+            values = self.format_row(user)
+            user_id = int(values[0])
+            row_idx = self.id_index.get(values[0])
+            if values[0] in self.dirty:
+                # Правка пользователя не теряется; при сохранении будет предупреждение
+                self.conflicts.add(values[0])
+            elif row_idx is not None:
+                self.rows[row_idx] = values
+            elif user_id > self.max_id:
+                # Новые id больше существующих: строка в конце выборки
+                if self.fully_loaded:
+                    self.id_index[values[0]] = len(self.rows)
+                    self.rows.append(values)
+                # Иначе строка придет с одной из следующих страниц
+                self.total += 1
+            self.max_id = max(self.max_id, user_id)
+
+    def _drop_deleted_edits(self, deleted: List[int]) -> Set[str]:
+        """Правки удаленных из БД строк отбрасываются"""
+        deleted_ids = {str(user_id) for user_id in deleted}
+        for user_id in deleted_ids:
+            self.dirty.pop(user_id, None)
+        self.conflicts -= deleted_ids
+        return deleted_ids
+
+    def _reindex(self) -> None:
+        self.id_index = {row[0]: idx for idx, row in enumerate(self.rows)}
+
+    def save(self, db: DatabaseHandler) -> Tuple[int, List[str]]:
+        """Запись только измененных строк одной транзакцией; возвращает (сохранено, ошибки)"""
+        batch, errors, saved_ids = [], [], []
+        for user_id in sorted(self.dirty, key=int):
+            try:
+                batch.append(self.row_to_db(self.dirty[user_id]))
+                saved_ids.append(user_id)
+            except (ValueError, IndexError) as e:
+                errors.append(f"ID {user_id}: {str(e)}")
+        if batch and db.update_users(batch):
+            for user_id in saved_ids:
+                del self.dirty[user_id]
+                self.conflicts.discard(user_id)
+            return len(batch), errors
+        return 0, errors
+
+
 class TableWidget(tk.Frame):
-    """Кастомизированный виджет таблицы"""
+    """Кастомизированный виджет таблицы с виртуализацией строк.
+
+    Виджеты создаются только для видимой области (пул строк) и при прокрутке
+    перепривязываются к данным; значения ячеек хранятся в модели TableModel."""
     
+    EDITABLE_COLUMNS = (1, 2, 3, 4)
+    READONLY_COLUMNS = (0, 5, 6)  # ID, K/D и To Main (только для чтения)
+
     def __init__(self, master, db_handler: DatabaseHandler):
         super().__init__(master)
         self.db = db_handler
         self.columns = ('ID', 'Username', 'Rank', 'Kills', 'Deads', 'K/D', 'To Main', 'Actions')  # Добавлено явное определение
         self.column_widths = [50, 150, 100, 80, 80, 80, 80, 80]
+        self.model = TableModel()
+        self.top_row = 0                   # Индекс первой видимой строки
+        self.pool: List[Tuple[List[tk.Entry], tk.Button]] = []
+        self.row_height = 0
         self._setup_table()
 
     def _setup_table(self) -> None:
         """Инициализация компонентов таблицы"""
-        self.canvas = tk.Canvas(self, bg=ThemeManager.DARK_THEME["bg"])
+        self.canvas = tk.Canvas(self, bg=ThemeManager.DARK_THEME["bg"], highlightthickness=0)
         scroll_x = tk.Scrollbar(self, orient="horizontal", command=self.canvas.xview)
-        scroll_y = tk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        # Вертикальная прокрутка виртуальная: сдвигает окно данных, а не виджеты
+        self.scroll_y = tk.Scrollbar(self, orient="vertical", command=self._on_yscroll)
         
-        self.table_frame = tk.Frame(self.canvas)
+        self.table_frame = tk.Frame(self.canvas, bg=ThemeManager.DARK_THEME["bg"])
         self.canvas.create_window((0, 0), window=self.table_frame, anchor="nw")
         
         # Конфигурация прокрутки
-        self.canvas.configure(
-            xscrollcommand=scroll_x.set,
-            yscrollcommand=scroll_y.set
-        )
+        self.canvas.configure(xscrollcommand=scroll_x.set)
         
         # Упаковка элементов
         scroll_x.pack(side="bottom", fill="x")
-        scroll_y.pack(side="right", fill="y")
+        self.scroll_y.pack(side="right", fill="y")
         self.canvas.pack(side="left", fill="both", expand=True)
         
         self.table_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.canvas.bind("<Configure>", lambda e: self._resize_pool())
+        self._bind_wheel(self.canvas)
         self._create_headers()
         self.refresh()
 
     def _create_headers(self) -> None:
         """Создание заголовков с правильными стилями"""
+        self.headers: List[tk.Entry] = []
         for col, (name, width) in enumerate(zip(self.columns, self.column_widths)):
             header = tk.Entry(
                 self.table_frame,
@@ -97,121 +304,195 @@ class TableWidget(tk.Frame):
                 relief="groove",
                 font=('Arial', 10, 'bold')
             )
+            header.insert("end", name)
             header.config(
                 bg=ThemeManager.DARK_THEME["header_bg"],
                 fg=ThemeManager.DARK_THEME["header_fg"],
                 state="readonly"
             )
             header.grid(row=0, column=col, sticky="nsew", pady=1)
-            header.insert("end", name)
+            self._bind_wheel(header)
+            if col < len(DatabaseHandler.SORT_COLUMNS):
+                header.bind("<Button-1>", lambda e, c=col: self._on_header_click(c))
+            self.headers.append(header)
+        self.update_idletasks()
+        self.row_height = header.winfo_reqheight() + 2  # pady=1 сверху и снизу
 
+    #region Virtualization
+    def _bind_wheel(self, widget: tk.Widget) -> None:
+        """Прокрутка колесом мыши (Windows/macOS и X11)"""
+        widget.bind("<MouseWheel>", lambda e: self._scroll_rows(-1 if e.delta > 0 else 1) or "break")
+        widget.bind("<Button-4>", lambda e: self._scroll_rows(-1) or "break")
+        widget.bind("<Button-5>", lambda e: self._scroll_rows(1) or "break")
 
-    def refresh(self) -> None:
-        """Пересоздание таблицы с очисткой виджетов"""
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()  # Полная очистка перед обновлением
-        self._create_headers()
-        self._load_data()
+    def _visible_count(self) -> int:
+        """Сколько строк помещается в видимую область"""
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            height = int(self.canvas.cget("height"))
+        return max(1, height // max(1, self.row_height) - 1)
+
+    def _resize_pool(self) -> None:
+        """Пул виджетов по размеру видимой области, а не по числу строк"""
+        needed = self._visible_count()
+        while len(self.pool) < needed:
+            self._create_pool_row(len(self.pool))
+        while len(self.pool) > needed:
+            entries, button = self.pool.pop()
+            for widget in (*entries, button):
+                widget.destroy()
+        self._render()
 
-    def _create_row(self, row_idx: int, user_data: Tuple, user_idx: int) -> None:
+    def _create_pool_row(self, slot: int) -> None:
+        """Создание строки виджетов для слота пула"""
+        grid_row = slot + 1
         entries = []
-        user_id = user_data[0]  # Реальный ID из базы данных
-        self._add_delete_button(row_idx, user_id)
-        # Сохраняем оригинальный ID вместо индекса строки
-        user_data = list(user_data)
-        
         for col in range(7):
             entry = tk.Entry(self.table_frame, width=self.column_widths[col]//10)
             ThemeManager.apply_theme(entry, "entry")
-            entry.grid(row=row_idx, column=col, sticky="nsew", padx=1, pady=1)
-            
-            value = self._format_value(col, user_data[col])
-            entry.insert("end", value)
-            
-            # Привязка к обновлению данных
-            if col in (3, 4):  # Поля, которые можно редактировать
-                entry.bind("<KeyRelease>", lambda e, r=row_idx: self._update_kd(r))
-                
-            if col in (5, 6):  # Поля K/D и To Main (только для чтения)
-                entry.config(state="readonly", fg="#103ae3")
-                
-            
-                
-                
-        # Добавляем скрытый ID в последнюю колонку
-        #tk.Label(self.table_frame, text=str(user_id)).grid(row=row_idx, column=8)
-        
-    
-    def _save_row_changes(self, row_idx: int) -> None:
-        """Сохраняет изменения строки в БД"""
-        try:
-            # Получаем ID из скрытой колонки
-            user_id = int(self.table_frame.grid_slaves(row=row_idx, column=8)[0].cget("text"))
-            
-            # Собираем данные из полей ввода
-            data = [
-                self.table_frame.grid_slaves(row=row_idx, column=col)[0].get()
-                for col in range(7)
-            ]
-            
-            # Конвертация и валидация
-            db_data = (
-                data[1],  # username
-                data[2],  # urank
-                int(data[3]),  # kills
-                int(data[4]),  # deads
-                float(data[5]),  # kills_deads
-                data[6] == "+",  # to_main
-                user_id  # id
-            )
-            
-            self.db.update_user(db_data)
-            
-        except Exception as e:
-            print(f"Ошибка сохранения строки {row_idx}: {str(e)}")
-        
-    
-    def _update_kd(self, row_idx: int) -> None:
-        """Исправленный расчет K/D"""
-        try:
-            # Получаем элементы через grid_slaves
-            kills_entry = self.table_frame.grid_slaves(row=row_idx, column=3)[0]
-            deads_entry = self.table_frame.grid_slaves(row=row_idx, column=4)[0]
-            
-            kills = int(kills_entry.get())
-            deads = int(deads_entry.get())
-            
-            kd = kills / deads if deads != 0 else 0.0
-            kd_entry = self.table_frame.grid_slaves(row=row_idx, column=5)[0]
-            
-            kd_entry.config(state="normal")
-            kd_entry.delete(0, "end")
-            kd_entry.insert(0, f"{kd:.2f}")
-            kd_entry.config(
-                state="readonly",
-                fg=ThemeManager.DARK_THEME["readonly_fg"]  # Явное указание цвета
-            )
-        except (IndexError, ValueError, ZeroDivisionError):
-            pass
-
-    def _format_value(self, col: int, value: Any) -> str:
-        """Форматирование значений для отображения"""
-        if col == 5:  # K/D
-            return f"{float(value):.2f}"
-        if col == 6:  # To Main
-            return "+" if value else "-"
-        return str(value)
+            entry.grid(row=grid_row, column=col, sticky="nsew", padx=1, pady=1)
+            if col in self.EDITABLE_COLUMNS:
+                entry.bind("<KeyRelease>", lambda e, s=slot, c=col: self._on_edit(s, c))
+                entry.bind("<FocusOut>", lambda e, s=slot, c=col: self._on_edit(s, c))
+            self._bind_wheel(entry)
+            entries.append(entry)
 
-    def _add_delete_button(self, row: int, user_id: int) -> None:
-        """Исправленная кнопка удаления с фиксацией ID"""
         btn = tk.Button(
             self.table_frame,
             text="-",
             font=('Arial', 12, 'bold'),
-            command=lambda uid=user_id: self._delete_user(uid)  # Фиксация ID в лямбде
+            command=lambda s=slot: self._on_delete_slot(s)
         )
         ThemeManager.apply_theme(btn, "button")
-        btn.grid(row=row, column=7, sticky="nsew", padx=2, pady=1)
+        btn.grid(row=grid_row, column=7, sticky="nsew", padx=2, pady=1)
+        self._bind_wheel(btn)
+        self.pool.append((entries, btn))
+
+    def _render(self) -> None:
+        """Привязка слотов пула к строкам данных начиная с top_row"""
+        self.model.ensure_loaded(self.top_row + len(self.pool))
+        max_top = max(0, len(self.model) - len(self.pool))
+        self.top_row = min(max(0, self.top_row), max_top)
+        for slot, (entries, button) in enumerate(self.pool):
+            row_idx = self.top_row + slot
+            if row_idx >= len(self.model):
+                for widget in (*entries, button):
+                    widget.grid_remove()
+                continue
+            values = self.model.rows[row_idx]
+            for col, entry in enumerate(entries):
+                self._set_entry(entry, col, values[col])
+                entry.grid()
+            button.grid()
+        self._update_scrollbar()
+
+    def _set_entry(self, entry: tk.Entry, col: int, value: str) -> None:
+        """Запись значения в ячейку без генерации правок"""
+        if entry.get() == value:
+            return
+        entry.config(state="normal")
+        entry.delete(0, "end")
+        entry.insert(0, value)
+        if col in self.READONLY_COLUMNS:
+            entry.config(state="readonly", fg=ThemeManager.DARK_THEME["readonly_fg"] if col == 0 else "#103ae3")
+
+    def _update_scrollbar(self) -> None:
+        total = len(self.model)
+        if total == 0:
+            self.scroll_y.set(0.0, 1.0)
+            return
+        first = self.top_row / total
+        last = min(1.0, (self.top_row + len(self.pool)) / total)
+        self.scroll_y.set(first, last)
+
+    def _on_yscroll(self, action: str, amount: str, unit: str = "units") -> None:
+        """Обработчик вертикального скроллбара"""
+        if action == "moveto":
+            self.top_row = int(float(amount) * len(self.model))
+            self._render()
+        elif action == "scroll":
+            step = int(amount) * (len(self.pool) if unit == "pages" else 1)
+            self._scroll_rows(step)
+
+    def _scroll_rows(self, step: int) -> None:
+        self.top_row += step
+        self._render()
+
+    def _slot_row(self, slot: int) -> Optional[int]:
+        """Индекс строки данных для слота пула"""
+        row_idx = self.top_row + slot
+        return row_idx if row_idx < len(self.model) else None
+    #endregion
+
+    def refresh(self) -> None:
+        """Применение изменений базы с прошлого обновления и перерисовка видимых строк"""
+        if self.model.data_version is None:
+            self.model.load(self.db)
+        else:
+            self.model.apply_changes(self.db)
+        self._resize_pool()
+
+    def scroll_to_id(self, user_id: int) -> None:
+        """Прокрутка к строке игрока, если она не видна"""
+        row_idx = self.model.id_index.get(str(user_id))
+        if row_idx is None and self.model.is_default_view:
+            # Новая строка в конце еще не загруженной части
+            self.model.ensure_loaded(len(self.model) - 1)
+            row_idx = self.model.id_index.get(str(user_id))
+        if row_idx is None:
+            return
+        if not self.top_row <= row_idx < self.top_row + len(self.pool):
+            self.top_row = row_idx - len(self.pool) + 1
+            self._render()
+
+    def _on_edit(self, slot: int, col: int) -> None:
+        """Перенос правки из ячейки в модель строк"""
+        row_idx = self._slot_row(slot)
+        if row_idx is None:
+            return
+        entries = self.pool[slot][0]
+        for changed_col in self.model.set_cell(row_idx, col, entries[col].get()):
+            if changed_col != col:  # Зависимые ячейки (K/D)
+                self._set_entry(entries[changed_col], changed_col, self.model.get(row_idx, changed_col))
+
+    def save(self) -> Tuple[int, List[str]]:
+        """Сохранение измененных пользователем строк"""
+        return self.model.save(self.db)
+
+    #region Query
+    def set_query(self, filters: Dict[str, Any], sort: str, descending: bool) -> bool:
+        """Новая выборка с первой страницы; False, если пользователь отказался терять правки"""
+        if self.model.dirty and not messagebox.askyesno(
+                "Подтверждение", "Несохраненные изменения будут потеряны. Продолжить?", parent=self):
+            return False
+        self.model.set_query(filters, sort, descending)
+        self.top_row = 0
+        self.refresh()
+        self._update_headers()
+        return True
+
+    def _on_header_click(self, col: int) -> None:
+        """Сортировка по колонке; повторный щелчок меняет направление"""
+        sort = DatabaseHandler.SORT_COLUMNS[col]
+        descending = not self.model.descending if sort == self.model.sort else False
+        self.set_query(self.model.filters, sort, descending)
+
+    def _update_headers(self) -> None:
+        """Стрелка направления у колонки сортировки"""
+        for col, header in enumerate(self.headers):
+            name = self.columns[col]
+            if col < len(DatabaseHandler.SORT_COLUMNS) and DatabaseHandler.SORT_COLUMNS[col] == self.model.sort:
+                name += " ▼" if self.model.descending else " ▲"
+            header.config(state="normal")
+            header.delete(0, "end")
+            header.insert("end", name)
+            header.config(state="readonly")
+    #endregion
+
+    def _on_delete_slot(self, slot: int) -> None:
+        row_idx = self._slot_row(slot)
+        if row_idx is not None:
+            self._delete_user(self.model.row_id(row_idx))
 
     def _delete_user(self, user_id: int) -> None:
         """Удаление с подтверждением и принудительным обновлением"""
@@ -222,35 +503,61 @@ class TableWidget(tk.Frame):
                 print(f"Удален пользователь с ID: {user_id}")  # Отладочный вывод
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить: {str(e)}")
-                
-    def _load_data(self) -> None:
-        """Загрузка данных из БД"""
-        data = self.db.fetch_all_users()
-        for row_idx, user in enumerate(data, start=1):
-            user_list = list(user)
-            user_idx = row_idx
-            self._create_row(row_idx, tuple(user_list), user_idx)
 
 class OCRDialogHandler:
     """Обработчик диалогов OCR"""
     
     @staticmethod
-    @staticmethod
-    def process_ocr_image(parent: tk.Tk, db_handler: DatabaseHandler) -> None:
-        file_path = filedialog.askopenfilename(filetypes=[("Изображения", "*.png *.jpg *.jpeg")])
-        if not file_path:
+    def process_ocr_image(parent: tk.Tk, db_handler: DatabaseHandler, auto_confirm: bool = False) -> None:
+        file_paths = filedialog.askopenfilenames(filetypes=[("Изображения", "*.png *.jpg *.jpeg")])
+        if not file_paths:
             return
+        # OCR-стек (cv2, numpy, PIL) загружается при первом распознавании, а не при запуске
+        from myOCR_test import CropWindow, ImageProcessor
             
-        try:
-            crop_win = CropWindow(parent, file_path)
-            parent.wait_window(crop_win)
-            
-            if crop_win.ocr_data:
-                OCRDialogHandler._update_database(db_handler, crop_win.ocr_data)
+        def make_on_confirm(source: str):
+            def on_confirm(data: List[Dict]) -> None:
+                OCRDialogHandler._update_database(db_handler, data, source)
                 db_handler._gui_table.refresh()
+            return on_confirm
 
-        except Exception as e:
-            messagebox.showerror("Ошибка OCR", str(e))
+        def on_save_template(name: str, width: int, height: int, rect: tuple) -> None:
+            db_handler.save_crop_template(name, width, height, rect)
+
+        for file_path in file_paths:
+            # Окно не блокирует главный цикл: можно открыть несколько распознаваний
+            try:
+                width, height = ImageProcessor.image_size(file_path)
+                regions = [tuple(t[2:]) for t in db_handler.get_crop_templates(width, height)]
+                on_confirm = make_on_confirm(file_path)
+                if regions and auto_confirm:
+                    OCRDialogHandler._recognize_unattended(parent, file_path, regions, on_confirm)
+                else:
+                    CropWindow(parent, file_path, on_confirm=on_confirm,
+                               regions=regions, on_save_template=on_save_template)
+            except Exception as e:
+                messagebox.showerror("Ошибка OCR", f"{file_path}: {str(e)}")
+
+    @staticmethod
+    def _recognize_unattended(parent: tk.Tk, file_path: str, regions: List[tuple], on_confirm) -> None:
+        """Распознавание по шаблону в фоне без окна обрезки"""
+        from myOCR_test import ImageProcessor, OCRPipeline
+
+        def run() -> tuple:
+            image = ImageProcessor.load_image(file_path)
+            return OCRPipeline.recognize_regions(image, OCRCache.hash_file(file_path), regions)
+
+        def on_done(result: tuple) -> None:
+            _, data = result
+            if data:
+                on_confirm(data)
+            else:
+                print(f"Не удалось распознать данные: {file_path}")
+
+        get_default_worker().submit(
+            parent, run, on_done=on_done,
+            on_error=lambda e: messagebox.showerror("Ошибка OCR", f"{file_path}: {str(e)}")
+        )
             
     @staticmethod
     def _process_and_show_results(parent: tk.Tk, db: DatabaseHandler, path: str) -> None:
@@ -265,44 +572,295 @@ class OCRDialogHandler:
     @staticmethod
     def _finalize_processing(win: tk.Toplevel, db: DatabaseHandler, path: str) -> None:
         """Финализация обработки OCR"""
+        from myOCR_test import OCRApp
         try:
             ocr_app = OCRApp(win, path)
             if ocr_app.processed_data:
-                OCRDialogHandler._update_database(db, ocr_app.processed_data)
+                OCRDialogHandler._update_database(db, ocr_app.processed_data, path)
         finally:
             win.destroy()
 
     @staticmethod
-    def _update_database(db: DatabaseHandler, data: List[Dict]) -> None:
+    def _update_database(db: DatabaseHandler, data: List[Dict], source: str = None) -> None:
         """Обновление базы данных с проверкой структуры"""
         if not data:
             messagebox.showwarning("Пустые данные", "Нет данных для сохранения")
             return
 
-        for player in data:
-            # Проверка обязательных полей
-            if 'name' not in player or 'kills' not in player or 'deaths' not in player:
-                print(f"Invalid player data: {player}")
-                continue
-                
-            # Остальная логика обновления
-            existing = db.find_user_by_name_or_ocr(player['name'])
-            if existing:
-                db.update_user_stats(existing[0], player['kills'], player['deaths'])
-            else:
-                kills = player.get('kills', 0)
-                deaths = player.get('deaths', 0)
-                kills_deads = kills / deaths if deaths != 0 else 0.0
-                if kills_deads >= 0.75:
-                    to_main = 1
-                else:
-                    to_main = 0
+        # Ошибки OCR в никах не должны порождать дубликаты игроков
+        data = get_resolver(db).resolve_players(data)
+        inserted, updated = db.merge_players(data, source)
+        print(f"OCR импорт: добавлено {inserted}, обновлено {updated}")
+
+class ImportsDialog(tk.Toplevel):
+    """Журнал импортов с откатом выбранного"""
+
+    def __init__(self, parent: tk.Misc, db_handler: DatabaseHandler, on_change=None):
+        super().__init__(parent)
+        self.db = db_handler
+        self.on_change = on_change
+        self.title("История импортов")
+        self.geometry("640x320")
+        self.configure(bg=ThemeManager.DARK_THEME["bg"])
+        self._setup_ui()
+        self.refresh()
+
+    def _setup_ui(self) -> None:
+        columns = ("id", "date", "source", "rows", "status")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        for col, text, width in zip(columns,
+                                    ("№", "Дата", "Источник", "Строк", "Статус"),
+                                    (40, 140, 300, 60, 90)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width)
+        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        btn = tk.Button(self, text="Откатить импорт", command=self._rollback_selected)
+        ThemeManager.apply_theme(btn, "button")
+        btn.pack(pady=5)
+
+    def refresh(self) -> None:
+        self.tree.delete(*self.tree.get_children())
+        for import_id, source, rows, created_at, rolled_back in self.db.fetch_imports():
+            self.tree.insert("", "end", iid=str(import_id), values=(
+                import_id, created_at, source or "-", rows, "откачен" if rolled_back else "применен"
+            ))
+
+    def _rollback_selected(self) -> None:
+        selected = self.tree.selection()
+        if not selected:
+            return
+        import_id = int(selected[0])
+        roster_id = self.db.later_roster_import(import_id)
+        if roster_id is not None:
+            messagebox.showwarning(
+                "Откат невозможен",
+                f"После импорта №{import_id} загружен состав (импорт №{roster_id}), заменивший "
+                "итоги тех же игроков. Сначала откатите загрузку состава.", parent=self)
+            return
+        if not messagebox.askyesno("Подтверждение", f"Откатить импорт №{import_id}?", parent=self):
+            return
+        affected = self.db.rollback_import(import_id)
+        print(f"Откат импорта {import_id}: затронуто игроков {affected}")
+        self.refresh()
+        if self.on_change:
+            self.on_change()
+
+class MetricsDialog(tk.Toplevel):
+    """p50/p95 по этапам OCR и базы за текущую сессию"""
+
+    REFRESH_MS = 1000
+
+    def __init__(self, parent: tk.Misc):
+        super().__init__(parent)
+        self.title("Метрики")
+        self.geometry("560x420")
+        self.configure(bg=ThemeManager.DARK_THEME["bg"])
+        self.enabled = tk.BooleanVar(value=metrics.is_enabled())
+        self._after_id: Optional[str] = None
+        self._setup_ui()
+        self.bind("<Destroy>", self._on_destroy)
+        self.refresh()
+
+    def _setup_ui(self) -> None:
+        tk.Checkbutton(
+            self, text="Собирать метрики", variable=self.enabled, command=self._toggle,
+            bg="#120f17", fg="#ffffff", selectcolor="#3e3e3e", activebackground="#120f17"
+        ).pack(anchor="w", padx=5, pady=5)
+
+        columns = ("stage", "count", "p50", "p95", "total")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=10)
+        for col, text, width in zip(columns,
+                                    ("Этап", "Замеров", "p50, мс", "p95, мс", "Всего, мс"),
+                                    (170, 70, 80, 80, 100)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor="w" if col == "stage" else "e")
+        self.tree.pack(fill="both", expand=True, padx=5)
+
+        self.counters = ttk.Treeview(self, columns=("name", "value"), show="headings", height=6)
+        for col, text, width in (("name", "Счетчик", 250), ("value", "Значение", 100)):
+            self.counters.heading(col, text=text)
+            self.counters.column(col, width=width)
+        self.counters.pack(fill="x", padx=5, pady=5)
+
+        btn = tk.Button(self, text="Сбросить", command=self._reset)
+        ThemeManager.apply_theme(btn, "button")
+        btn.pack(pady=5)
+
+    def refresh(self) -> None:
+        """Перерисовка таблиц; повторяется, пока окно открыто"""
+        self._after_id = None
+        self.tree.delete(*self.tree.get_children())
+        for stage in metrics.summary():
+            self.tree.insert("", "end", values=(
+                stage["stage"], stage["count"], f"{stage['p50_ms']:.1f}",
+                f"{stage['p95_ms']:.1f}", f"{stage['total_ms']:.0f}"
+            ))
+        self.counters.delete(*self.counters.get_children())
+        for name, value in sorted(metrics.counters().items()):
+            self.counters.insert("", "end", values=(name, value))
+        self._after_id = self.after(self.REFRESH_MS, self.refresh)
+
+    def _on_destroy(self, event: tk.Event) -> None:
+        # Привязка окна срабатывает и для дочерних виджетов
+        if event.widget is self and self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _toggle(self) -> None:
+        if self.enabled.get():
+            metrics.enable()
+        else:
+            metrics.disable()
+
+    def _reset(self) -> None:
+        metrics.reset()
+        self.tree.delete(*self.tree.get_children())
+        self.counters.delete(*self.counters.get_children())
+
+class LeaderboardDialog(tk.Toplevel):
+    """Сводный рейтинг по выбранным базам одним проходом через ATTACH"""
+
+    DISPLAY_LIMIT = 5000  # Строк в окне; полный рейтинг - через экспорт
+    PAGE_SIZE = 500
+
+    def __init__(self, parent: tk.Misc, paths: List[str]):
+        super().__init__(parent)
+        self.paths = paths
+        self.query: Optional[MultiDatabaseQuery] = None
+        self.busy = False
+        self.title("Общий рейтинг")
+        self.geometry("760x520")
+        self.configure(bg=ThemeManager.DARK_THEME["bg"])
+        self.order = tk.StringVar(value="kills")
+        self.since = tk.StringVar()
+        self.until = tk.StringVar()
+        self.status = tk.StringVar(value="Выберите базы и нажмите «Построить»")
+        self._setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self._close)
+
+    def _setup_ui(self) -> None:
+        bg, fg = ThemeManager.DARK_THEME["bg"], ThemeManager.DARK_THEME["fg"]
+        left = tk.Frame(self, bg=bg)
+        left.pack(side="left", fill="y", padx=5, pady=5)
+        tk.Label(left, text="Базы:", bg=bg, fg=fg).pack(anchor="w")
+        self.db_list = tk.Listbox(left, selectmode=tk.EXTENDED, exportselection=False, width=24,
+                                  bg=ThemeManager.DARK_THEME["entry_bg"], fg=fg)
+        for path in self.paths:
+            self.db_list.insert("end", os.path.basename(path))
+        self.db_list.select_set(0, "end")
+        self.db_list.pack(fill="y", expand=True)
+
+        right = tk.Frame(self, bg=bg)
+        right.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        controls = tk.Frame(right, bg=bg)
+        controls.pack(fill="x")
+        tk.Label(controls, text="Порядок:", bg=bg, fg=fg).pack(side="left")
+        ttk.Combobox(controls, textvariable=self.order, values=list(LEADERBOARD_ORDER),
+                     state="readonly", width=7).pack(side="left", padx=5)
+        for label, variable in (("С (ГГГГ-ММ-ДД):", self.since), ("по:", self.until)):
+            tk.Label(controls, text=label, bg=bg, fg=fg).pack(side="left")
+            entry = tk.Entry(controls, textvariable=variable, width=11)
+            ThemeManager.apply_theme(entry, "entry")
+            entry.pack(side="left", padx=5)
+        self.buttons = []
+        for text, command in (("Построить", self._build), ("Экспорт", self._export)):
+            btn = tk.Button(controls, text=text, command=command)
+            ThemeManager.apply_theme(btn, "button")
+            btn.pack(side="left", padx=5)
+            self.buttons.append(btn)
+
+        columns = ("place", "name", "kills", "deaths", "kd", "dbs")
+        self.tree = ttk.Treeview(right, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("№", "Игрок", "Убийства", "Смерти", "K/D", "Баз"),
+                                    (50, 220, 90, 90, 60, 50)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor="w" if col == "name" else "e")
+        self.tree.pack(fill="both", expand=True, pady=5)
+        tk.Label(right, textvariable=self.status, bg=bg, fg=fg, anchor="w").pack(fill="x")
+
+    def _set_busy(self, busy: bool) -> None:
+        self.busy = busy
+        for btn in self.buttons:
+            btn.configure(state="disabled" if busy else "normal")
+
+    def _build(self) -> None:
+        paths = [self.paths[index] for index in self.db_list.curselection()]
+        if not paths:
+            messagebox.showwarning("Рейтинг", "Не выбрано ни одной базы", parent=self)
+            return
+        if self.query is not None:
+            self.query.close()
+        self.query = MultiDatabaseQuery(paths)
+        self.tree.delete(*self.tree.get_children())
+        self.status.set(f"Подсчет по {len(paths)} базам...")
+        self._set_busy(True)
+        get_default_worker().submit(
+            self, self.query.build_leaderboard, self.since.get().strip() or None,
+            self.until.get().strip() or None,
+            on_done=self._on_built, on_error=self._on_error
+        )
+
+    def _on_built(self, players: int) -> None:
+        if not self.winfo_exists():
+            self.query.close()
+            return
+        skipped = f", пропущено баз: {len(self.query.skipped)}" if self.query.skipped else ""
+        for path, reason in self.query.skipped:
+            print(f"Рейтинг: пропущена {path}: {reason}")
+        self.status.set(f"Игроков: {players}{skipped}")
+        pages = self.query.iter_leaderboard(self.PAGE_SIZE, self.order.get(), self.DISPLAY_LIMIT)
+        self._stream(pages)
+
+    def _stream(self, pages: Iterator[List[Tuple]]) -> None:
+        """Вставка рейтинга страницами между событиями окна"""
+        if not self.winfo_exists():
+            pages.close()
+            self.query.close()
+            return
+        page = next(pages, None)
+        if page is None:
+            self._set_busy(False)
+            return
+        for row in page:
+            self.tree.insert("", "end", values=row)
+        self.after(1, lambda: self._stream(pages))
 
-                db.cursor.execute(
-                    'INSERT INTO Users (username, urank, kills, deads, kills_deads, to_main) VALUES (?, ?, ?, ?, ?, ?)',
-                    (player['name'], '-', kills, deaths, kills_deads, to_main)
-                )
-        db.connection.commit()
+    def _export(self) -> None:
+        if self.query is None:
+            messagebox.showinfo("Экспорт", "Сначала постройте рейтинг", parent=self)
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".xlsx", filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        self._set_busy(True)
+
+        def on_done(rows: int) -> None:
+            if not self.winfo_exists():
+                self.query.close()
+                return
+            self._set_busy(False)
+            messagebox.showinfo("Экспорт", f"Выгружено строк: {rows}\n{path}", parent=self)
+
+        get_default_worker().submit(
+            self, export_leaderboard, self.query, path, self.order.get(),
+            on_done=on_done, on_error=self._on_error
+        )
+
+    def _on_error(self, error: Exception) -> None:
+        if not self.winfo_exists():
+            self.query.close()
+            return
+        self._set_busy(False)
+        messagebox.showerror("Ошибка рейтинга", str(error), parent=self)
+
+    def _close(self) -> None:
+        # Запрос в фоне закроет соединение сам, когда увидит закрытое окно
+        if self.query is not None and not self.busy:
+            self.query.close()
+        self.destroy()
 
 class ApplicationGUI:
     """Главное окно приложения"""
@@ -322,6 +880,7 @@ class ApplicationGUI:
     def on_close(self):
         """Обработчик закрытия окна"""
         self.db.close()
+        metrics.disable()  # Запись счетчиков сессии в файл метрик
         self.root.destroy()
 
     def _setup_window(self) -> None:
@@ -333,6 +892,7 @@ class ApplicationGUI:
     def _create_widgets(self) -> None:
         """Создание интерфейса"""
         self._create_control_panel()
+        self._create_filter_panel()
         self.table = TableWidget(self.root, self.db)
         self.table.pack(fill="both", expand=True)
 
@@ -342,10 +902,18 @@ class ApplicationGUI:
         ThemeManager.apply_theme(control_frame, "frame")
         control_frame.pack(fill="x", pady=5)
         
+        # Импорт по сохраненным шаблонам без окна подтверждения
+        self.auto_confirm = tk.BooleanVar(value=False)
+
         buttons = [
             ("+ Добавить", "#2e5e2e", self._add_user),
-            ("OCR Загрузка", "#5e2e2e", lambda: OCRDialogHandler.process_ocr_image(self.root, self.db)),
-            ("Сохранить", "#5e2e2e", self._commit_changes)
+            ("OCR Загрузка", "#5e2e2e", lambda: OCRDialogHandler.process_ocr_image(
+                self.root, self.db, self.auto_confirm.get())),
+            ("Сохранить", "#5e2e2e", self._commit_changes),
+            ("Импорты", "#3e3e3e", lambda: ImportsDialog(self.root, self.db, self.table.refresh)),
+            ("Экспорт", "#2e3e5e", self._export),
+            ("Импорт состава", "#2e3e5e", self._import_roster),
+            ("Метрики", "#3e3e3e", lambda: MetricsDialog(self.root))
         ]
         
         for text, color, command in buttons:
@@ -353,48 +921,120 @@ class ApplicationGUI:
             ThemeManager.apply_theme(btn, "button")
             btn.pack(side="left", padx=10)
 
+        tk.Checkbutton(
+            control_frame, text="Шаблоны без подтверждения", variable=self.auto_confirm,
+            bg="#120f17", fg="#ffffff", selectcolor="#3e3e3e", activebackground="#120f17"
+        ).pack(side="left", padx=10)
+
+    def _create_filter_panel(self) -> None:
+        """Фильтры таблицы; выборка выполняется в БД постранично"""
+        filter_frame = tk.Frame(self.root, bg="#120f17")
+        filter_frame.pack(fill="x", pady=5)
+
+        self.filter_name = tk.StringVar()
+        self.filter_rank = tk.StringVar()
+        self.filter_kills = tk.StringVar()
+        self.filter_to_main = tk.BooleanVar(value=False)
+
+        for label, var, width in (("Ник:", self.filter_name, 16),
+                                  ("Ранг:", self.filter_rank, 10),
+                                  ("Киллы от:", self.filter_kills, 6)):
+            tk.Label(filter_frame, text=label, bg="#120f17", fg="#ffffff").pack(side="left", padx=(10, 2))
+            entry = tk.Entry(filter_frame, textvariable=var, width=width)
+            entry.bind("<Return>", lambda e: self._apply_filters())
+            entry.pack(side="left")
+
+        tk.Checkbutton(
+            filter_frame, text="Только в основу", variable=self.filter_to_main,
+            bg="#120f17", fg="#ffffff", selectcolor="#3e3e3e", activebackground="#120f17"
+        ).pack(side="left", padx=10)
+
+        for text, command in (("Применить", self._apply_filters), ("Сбросить", self._reset_filters)):
+            btn = tk.Button(filter_frame, text=text, bg="#3e3e3e", command=command)
+            ThemeManager.apply_theme(btn, "button")
+            btn.pack(side="left", padx=5)
+
+    def _apply_filters(self) -> None:
+        kills = self.filter_kills.get().strip()
+        if kills and not kills.isdigit():
+            messagebox.showwarning("Фильтр", "Киллы должны быть целым числом")
+            return
+        filters = {
+            "name_prefix": self.filter_name.get().strip(),
+            "rank": self.filter_rank.get().strip(),
+            "min_kills": int(kills) if kills else None,
+            "to_main": True if self.filter_to_main.get() else None,
+        }
+        self.table.set_query(filters, self.table.model.sort, self.table.model.descending)
+
+    def _reset_filters(self) -> None:
+        if self.table.set_query({}, "id", False):
+            for var in (self.filter_name, self.filter_rank, self.filter_kills):
+                var.set("")
+            self.filter_to_main.set(False)
+
+    def _export(self) -> None:
+        """Выгрузка базы в Excel/CSV в фоне; несохраненные правки таблицы не попадают"""
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            defaultextension=".xlsx",
+            filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        if self.table.model.dirty and not messagebox.askyesno(
+                "Экспорт", "Есть несохраненные изменения, они не попадут в файл. Продолжить?"):
+            return
+        get_default_worker().submit(
+            self.root, export_database, self.db, path,
+            on_done=lambda rows: messagebox.showinfo("Экспорт", f"Выгружено строк: {rows}\n{path}"),
+            on_error=lambda e: messagebox.showerror("Ошибка экспорта", str(e))
+        )
+
+    def _import_roster(self) -> None:
+        """Загрузка состава из Excel/CSV в фоне с отчетом об ошибочных строках"""
+        path = filedialog.askopenfilename(
+            parent=self.root,
+            filetypes=[("Excel/CSV", "*.xlsx *.xlsm *.csv")]
+        )
+        if not path:
+            return
+
+        def on_done(report) -> None:
+            self.table.refresh()
+            show = messagebox.showwarning if report.error_count else messagebox.showinfo
+            show("Импорт состава", report.summary())
+
+        get_default_worker().submit(
+            self.root, import_roster_file, self.db, path,
+            on_done=on_done,
+            on_error=lambda e: messagebox.showerror("Ошибка импорта", str(e))
+        )
+
     def _add_user(self) -> None:
         """Добавление нового пользователя"""
-        self.db.create_new_user()
+        user_id = self.db.create_new_user()
         self.table.refresh()
+        self.table.scroll_to_id(user_id)
 
     def _commit_changes(self) -> None:
-        """Корректное сохранение данных с игнорированием кнопок"""
+        """Сохранение только измененных строк одной транзакцией"""
+        conflicts = self.table.model.conflicts & self.table.model.dirty.keys()
+        if conflicts and not messagebox.askyesno(
+                "Сохранение",
+                f"Строки изменены в базе после вашей правки (ID: {', '.join(sorted(conflicts, key=int)[:10])}). "
+                "Перезаписать их вашими значениями?"):
+            return
         try:
-            rows = self.table.table_frame.grid_size()[1]
+            saved, errors = self.table.save()
+            for error in errors:
+                print(f"Ошибка конвертации данных: {error}")
             
-            for row_idx in range(1, rows):
-                row_data = []
-                for col in range(len(self.table.columns) - 1):  # Исключаем столбец Actions
-                    widgets = self.table.table_frame.grid_slaves(row=row_idx, column=col)
-                    if widgets and isinstance(widgets[0], tk.Entry):
-                        value = widgets[0].get()
-                        row_data.append(value)
-                    else:
-                        row_data.append("0")  # Значение по умолчанию
-                
-                # Проверка наличия всех необходимых данных
-                if len(row_data) < 7:
-                    print(f"Ошибка: Недостаточно данных в строке {row_idx}")
-                    continue
-                
-                try:
-                    # Формирование данных в порядке, ожидаемом методом update_user
-                    db_data = (
-                        row_data[1],  # username
-                        row_data[2],  # urank
-                        int(row_data[3]),  # kills
-                        int(row_data[4]),  # deads
-                        float(row_data[5]),  # kills_deads
-                        row_data[6] == "+",  # to_main (преобразование в bool)
-                        int(row_data[0])      # id (должен быть последним для WHERE)
-                    )
-                    self.db.update_user(db_data)
-                except (ValueError, IndexError) as e:
-                    print(f"Ошибка конвертации данных в строке {row_idx}: {str(e)}")
-                    continue
-            
-            messagebox.showinfo("Успех", "Данные сохранены")
+            if errors:
+                messagebox.showwarning("Частично сохранено",
+                                       f"Сохранено строк: {saved}\nОшибки:\n" + "\n".join(errors[:10]))
+            else:
+                messagebox.showinfo("Успех", f"Данные сохранены (строк: {saved})")
             self.table.refresh()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка сохранения: {str(e)}")
\ No newline at end of file
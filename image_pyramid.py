@@ -0,0 +1,286 @@
+# image_pyramid.py
+import math
+import tkinter as tk
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class ImagePyramid:
+    """Изображение в нескольких разрешениях: уровень k уменьшен в 2**k раз.
+    Для просмотра сначала декодируется уменьшенная копия (у JPEG - сразу при
+    декодировании через draft); полное разрешение нужно только при сильном
+    увеличении и для выбранных областей."""
+
+    PREVIEW_SIZE = 1600   # Наибольшая сторона первого декодирования, px
+    MIN_LEVEL_SIZE = 64   # Самый грубый уровень не меньше этого, px
+    DRAFT_LEVELS = 3      # JPEG декодируется с уменьшением до 1/8
+
+    def __init__(self, path: str, preview_size: int = PREVIEW_SIZE) -> None:
+        self.path = path
+        self.levels: Dict[int, Image.Image] = {}
+        with Image.open(path) as img:
+            self.size: Tuple[int, int] = img.size
+            self.is_jpeg = img.format == "JPEG"
+            width, height = self.size
+            self.max_level = max(0, int(math.log2(max(1, max(width, height) // self.MIN_LEVEL_SIZE))))
+            if self.is_jpeg:
+                # Наибольшее уменьшение, при котором сторона не меньше preview_size
+                level = self._fit_level(preview_size, self.DRAFT_LEVELS)
+                self.levels[level] = self._decode_draft(img, level)
+            else:
+                self.levels[0] = img.convert("RGB")
+
+    def _fit_level(self, side: int, limit: int) -> int:
+        level = 0
+        while level < limit and max(self.size) / 2 ** (level + 1) >= side:
+            level += 1
+        return level
+
+    def _decode_draft(self, img: Image.Image, level: int) -> Image.Image:
+        """Декодирование JPEG сразу в 1/2**level разрешения"""
+        width, height = self.size
+        img.draft("RGB", (math.ceil(width / 2 ** level), math.ceil(height / 2 ** level)))
+        return img.convert("RGB")
+
+    def level_for_zoom(self, zoom: float) -> int:
+        """Самый грубый уровень, не уступающий по детализации масштабу отображения"""
+        if zoom >= 1:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1 / zoom))))
+
+    def level(self, level: int) -> Image.Image:
+        """Уровень пирамиды; строится из ближайшего более детального уровня"""
+        image = self.levels.get(level)
+        if image is not None:
+            return image
+        finer = [k for k in self.levels if k < level]
+        if finer:
+            source_level = max(finer)
+        elif self.is_jpeg and level <= self.DRAFT_LEVELS:
+            # Более детальный уровень JPEG декодируется заново с нужным уменьшением
+            with Image.open(self.path) as img:
+                image = self.levels[level] = self._decode_draft(img, level)
+            return image
+        else:
+            source_level = 0
+            self.level(0)
+        factor = 2 ** (level - source_level)
+        image = self.levels[level] = self.levels[source_level].reduce(factor)
+        return image
+
+    def regions(self, rects: List[tuple]) -> List[np.ndarray]:
+        """Области (left, top, right, bottom) в полном разрешении как RGB-массивы.
+        Если полный уровень не загружен, файл декодируется один раз на все
+        области и не сохраняется - в памяти остаются только вырезанные части."""
+        full = self.levels.get(0)
+        if full is not None:
+            return [np.array(full.crop(rect)) for rect in rects]
+        with Image.open(self.path) as img:
+            img = img.convert("RGB")
+            return [np.array(img.crop(rect)) for rect in rects]
+
+
+class TiledImageCanvas(tk.Frame):
+    """Холст с масштабированием колесом и перемещением правой кнопкой.
+    Видимая часть рисуется плитками с ближайшего уровня пирамиды; плитки
+    кэшируются, пока масштаб не меняется. Пометки хранятся в координатах
+    исходного изображения и перерисовываются при смене масштаба."""
+
+    TILE_SIZE = 256
+    TILE_CACHE = 96       # Плиток PhotoImage в кэше
+    ZOOM_STEP = 1.25
+    MAX_ZOOM = 8.0
+
+    def __init__(self, master: tk.Misc, pyramid: ImagePyramid, width: int, height: int) -> None:
+        super().__init__(master)
+        self.pyramid = pyramid
+        self.canvas = tk.Canvas(self, width=width, height=height, highlightthickness=0,
+                                bg="#202020", xscrollincrement=1, yscrollincrement=1)
+        xscroll = tk.Scrollbar(self, orient="horizontal", command=self._xview)
+        yscroll = tk.Scrollbar(self, orient="vertical", command=self._yview)
+        self.canvas.configure(xscrollcommand=xscroll.set, yscrollcommand=yscroll.set)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        yscroll.grid(row=0, column=1, sticky="ns")
+        xscroll.grid(row=1, column=0, sticky="ew")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        image_width, image_height = pyramid.size
+        self.min_zoom = min(1.0, width / image_width, height / image_height)
+        self.zoom = self.min_zoom
+        self._tiles: "OrderedDict[tuple, ImageTk.PhotoImage]" = OrderedDict()
+        self._items: Dict[tuple, int] = {}   # Плитка -> элемент холста
+        self._overlays: List[tuple] = []     # ("point", x, y) или ("rect", l, t, r, b)
+        self._render_pending = False
+        self._user_zoomed = False
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self._zoom_at(e, self.ZOOM_STEP))
+        self.canvas.bind("<Button-5>", lambda e: self._zoom_at(e, 1 / self.ZOOM_STEP))
+        for button in ("2", "3"):
+            self.canvas.bind(f"<ButtonPress-{button}>", lambda e: self.canvas.scan_mark(e.x, e.y))
+            self.canvas.bind(f"<B{button}-Motion>", self._on_drag)
+        self._update_scrollregion()
+
+    # region Координаты
+    def to_source(self, event: tk.Event) -> Tuple[int, int]:
+        """Точка события в пикселях исходного изображения (в пределах изображения)"""
+        width, height = self.pyramid.size
+        x = int(self.canvas.canvasx(event.x) / self.zoom)
+        y = int(self.canvas.canvasy(event.y) / self.zoom)
+        return min(max(x, 0), width), min(max(y, 0), height)
+
+    def _display_size(self) -> Tuple[int, int]:
+        width, height = self.pyramid.size
+        return max(1, round(width * self.zoom)), max(1, round(height * self.zoom))
+    # endregion
+
+    # region Масштаб и перемещение
+    def _on_configure(self, event: tk.Event) -> None:
+        if not self._user_zoomed:
+            # До первого масштабирования изображение вписывается в окно
+            width, height = self.pyramid.size
+            fit = min(1.0, event.width / width, event.height / height)
+            if abs(fit - self.zoom) > 1e-6:
+                self.min_zoom = fit
+                self._set_zoom(fit)
+                return
+        self.schedule_render()
+
+    def _on_wheel(self, event: tk.Event) -> None:
+        self._zoom_at(event, self.ZOOM_STEP if event.delta > 0 else 1 / self.ZOOM_STEP)
+
+    def _zoom_at(self, event: tk.Event, factor: float) -> None:
+        """Масштаб с сохранением точки под курсором"""
+        zoom = min(self.MAX_ZOOM, max(self.min_zoom, self.zoom * factor))
+        if abs(zoom - self.zoom) < 1e-9:
+            return
+        self._user_zoomed = True
+        source_x = self.canvas.canvasx(event.x) / self.zoom
+        source_y = self.canvas.canvasy(event.y) / self.zoom
+        self._set_zoom(zoom)
+        width, height = self._display_size()
+        self.canvas.xview_moveto(max(0.0, (source_x * zoom - event.x) / width))
+        self.canvas.yview_moveto(max(0.0, (source_y * zoom - event.y) / height))
+        self.schedule_render()
+
+    def _set_zoom(self, zoom: float) -> None:
+        self.zoom = zoom
+        # Плитки другого масштаба больше не понадобятся
+        self.canvas.delete("tile")
+        self._items.clear()
+        self._tiles.clear()
+        self._update_scrollregion()
+        self._draw_overlays()
+        self.schedule_render()
+
+    def _update_scrollregion(self) -> None:
+        width, height = self._display_size()
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def _on_drag(self, event: tk.Event) -> None:
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_render()
+
+    def _xview(self, *args) -> None:
+        self.canvas.xview(*args)
+        self.schedule_render()
+
+    def _yview(self, *args) -> None:
+        self.canvas.yview(*args)
+        self.schedule_render()
+    # endregion
+
+    # region Плитки
+    def schedule_render(self) -> None:
+        """Отрисовка после обработки текущих событий: серия прокруток - одна отрисовка"""
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _render(self) -> None:
+        self._render_pending = False
+        if not self.winfo_exists():
+            return
+        size = self.TILE_SIZE
+        width, height = self._display_size()
+        left, top = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        right = left + self.canvas.winfo_width()
+        bottom = top + self.canvas.winfo_height()
+        visible = {
+            (tx, ty)
+            for tx in range(max(0, int(left // size)), min(math.ceil(width / size), int(right // size) + 1))
+            for ty in range(max(0, int(top // size)), min(math.ceil(height / size), int(bottom // size) + 1))
+        }
+        for key in [key for key in self._items if key not in visible]:
+            self.canvas.delete(self._items.pop(key))
+        for key in visible - self._items.keys():
+            tx, ty = key
+            self._items[key] = self.canvas.create_image(
+                tx * size, ty * size, anchor=tk.NW, image=self._tile(tx, ty), tags="tile"
+            )
+        self.canvas.tag_lower("tile")
+
+    def _tile(self, tx: int, ty: int) -> ImageTk.PhotoImage:
+        """Плитка текущего масштаба из кэша или с уровня пирамиды"""
+        key = (tx, ty)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        size = self.TILE_SIZE
+        width, height = self._display_size()
+        box = (tx * size, ty * size, min((tx + 1) * size, width), min((ty + 1) * size, height))
+        level = self.pyramid.level_for_zoom(self.zoom)
+        image = self.pyramid.level(level)
+        # Плитка в координатах уровня: дробная рамка, без промежуточной обрезки
+        scale = self.pyramid.size[0] / image.width / self.zoom
+        source_box = tuple(min(edge * scale, limit) for edge, limit in
+                           zip(box, (image.width, image.height) * 2))
+        # При сильном увеличении видны отдельные пиксели - удобно для точного выбора
+        resample = Image.NEAREST if self.zoom >= 2 else Image.BILINEAR
+        tile = ImageTk.PhotoImage(image.resize((box[2] - box[0], box[3] - box[1]), resample, box=source_box))
+        self._tiles[key] = tile
+        if len(self._tiles) > self.TILE_CACHE:
+            # Вытесняются самые давние из невидимых плиток
+            hidden = [k for k in self._tiles if k not in self._items and k != key]
+            for evicted in hidden[:len(self._tiles) - self.TILE_CACHE]:
+                del self._tiles[evicted]
+        return tile
+    # endregion
+
+    # region Пометки
+    def add_point(self, x: int, y: int) -> None:
+        self._overlays.append(("point", x, y))
+        self._draw_overlays()
+
+    def add_rect(self, rect: tuple) -> None:
+        self._overlays.append(("rect", *rect))
+        self._draw_overlays()
+
+    def clear_overlays(self) -> None:
+        self._overlays.clear()
+        self._draw_overlays()
+
+    def _draw_overlays(self) -> None:
+        self.canvas.delete("marker")
+        radius = 5
+        for kind, *coords in self._overlays:
+            scaled = [coord * self.zoom for coord in coords]
+            if kind == "point":
+                x, y = scaled
+                self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                                        fill="red", tags="marker")
+            else:
+                self.canvas.create_rectangle(*scaled, outline="red", width=2, tags="marker")
+    # endregion
+
+    def release(self) -> None:
+        """Освобождение плиток и уровней при закрытии окна"""
+        self._tiles.clear()
+        self._items.clear()
+        self.pyramid.levels.clear()
@@ -1,14 +1,57 @@
 # main.py
+import time
+
+_STARTED = time.perf_counter()
+
+import os
+import threading
 from start_window import StartWindow
+import ocr_backends
+import ocr_cache
+
+# Отметки времени запуска в консоль (WODS_STARTUP_REPORT=1); разбор импортов - startup_report.py
+STARTUP_REPORT = os.environ.get("WODS_STARTUP_REPORT") == "1"
+# Задержка фоновой загрузки OCR после показа окна, мс
+PREWARM_DELAY_MS = 300
+
+
+def report_stage(stage: str) -> None:
+    """Время от старта процесса до этапа запуска"""
+    if STARTUP_REPORT:
+        print(f"[запуск] {stage}: {(time.perf_counter() - _STARTED) * 1000:.0f} мс")
+
+
+def prewarm_ocr() -> threading.Thread:
+    """Фоновая загрузка OCR-стека (cv2, numpy) и прогрев движка.
+    Если пользователь нажмет «OCR Загрузка» раньше, импорт просто дождется этого потока."""
+    def run() -> None:
+        try:
+            from myOCR_test import OCRProcessor
+            report_stage("OCR-модули загружены")
+            OCRProcessor.warm_up()
+        except Exception as e:
+            print(f"Не удалось загрузить OCR-модули: {e}")
+
+    thread = threading.Thread(target=run, name="ocr-prewarm", daemon=True)
+    thread.start()
+    return thread
+
 
 def main() -> None:
     """Точка входа в приложение"""
     try:
+        report_stage("модули интерфейса загружены")
         root = StartWindow()
+        root.after_idle(lambda: report_stage("окно показано"))
+        # OCR загружается после показа окна, чтобы выбор базы не ждал cv2
+        root.after(PREWARM_DELAY_MS, prewarm_ocr)
         root.mainloop()
-        
+
     except Exception as e:
         print(f"Critical error: {str(e)}")
+    finally:
+        ocr_backends.shutdown()
+        ocr_cache.close_default_cache()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
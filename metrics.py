@@ -0,0 +1,253 @@
+# metrics.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Настройки сбора метрик; переопределяются переменными окружения
+METRICS_SETTINGS: Dict[str, Any] = {
+    "enabled": os.environ.get("WODS_METRICS") == "1",
+    "path": os.environ.get("WODS_METRICS_PATH", os.path.join("logs", "metrics.jsonl")),
+    "max_bytes": 5 * 1024 * 1024,  # Размер файла до ротации
+    "backups": 3,                  # Сколько старых файлов хранить
+    "window": 2048,                # Последних замеров на этап для p50/p95
+}
+
+
+class _NullSpan:
+    """Пустой замер, когда сбор выключен: один общий объект без состояния"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Замер длительности этапа с произвольными атрибутами (размер, строки и т.п.)"""
+
+    __slots__ = ("stage", "attrs", "started")
+
+    def __init__(self, stage: str, attrs: Dict[str, Any]) -> None:
+        self.stage = stage
+        self.attrs = attrs
+        self.started = 0.0
+
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _registry.record(self.stage, duration, self.attrs)
+
+    def set(self, **attrs: Any) -> None:
+        """Атрибуты, известные только по ходу этапа"""
+        self.attrs.update(attrs)
+
+
+class MetricsRegistry:
+    """Окна длительностей по этапам, счетчики и запись в ротируемый JSONL"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Deque[float]] = {}
+        self._totals: Dict[str, Tuple[int, float]] = defaultdict(lambda: (0, 0.0))
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._logger: Optional[Any] = None
+
+    def open_log(self, path: str) -> None:
+        """Файл метрик; у дочерних процессов (пакетный импорт) - свой файл с pid"""
+        # Импорт здесь: при выключенном сборе модуль не замедляет запуск
+        import logging
+        import logging.handlers
+        import multiprocessing
+
+        if multiprocessing.parent_process() is not None:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}.{os.getpid()}{ext}"
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=METRICS_SETTINGS["max_bytes"],
+            backupCount=METRICS_SETTINGS["backups"], encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"wods.metrics.{id(self)}")
+        logger.handlers[:] = [handler]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        self._logger = logger
+
+    def close_log(self) -> None:
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.close()
+            self._logger.handlers.clear()
+            self._logger = None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._logger is not None:
+            self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def record(self, stage: str, duration: float, attrs: Dict[str, Any]) -> None:
+        with self._lock:
+            window = self._durations.get(stage)
+            if window is None:
+                window = self._durations[stage] = deque(maxlen=METRICS_SETTINGS["window"])
+            window.append(duration)
+            count, total = self._totals[stage]
+            self._totals[stage] = (count + 1, total + duration)
+        self._write({"ts": round(time.time(), 3), "stage": stage,
+                     "ms": round(duration * 1000, 3), "pid": os.getpid(), **attrs})
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """По этапам: число замеров, p50/p95 по окну и суммарное время, мс"""
+        with self._lock:
+            stages = {stage: sorted(window) for stage, window in self._durations.items()}
+            totals = dict(self._totals)
+        result = []
+        for stage, values in sorted(stages.items()):
+            count, total = totals[stage]
+            result.append({
+                "stage": stage,
+                "count": count,
+                "p50_ms": _percentile(values, 0.50) * 1000,
+                "p95_ms": _percentile(values, 0.95) * 1000,
+                "total_ms": total * 1000,
+            })
+        return result
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def flush(self) -> None:
+        """Запись текущих значений счетчиков в файл"""
+        counters = self.counters()
+        if counters:
+            self._write({"ts": round(time.time(), 3), "counters": counters, "pid": os.getpid()})
+
+    def reset(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+_registry = MetricsRegistry()
+_enabled = False
+# Слабые ссылки: соединение, закрытое без unregister_connection, не удерживается в памяти
+_connections: "weakref.WeakSet[TracedConnection]" = weakref.WeakSet()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Соединение SQLite, на которое можно держать слабую ссылку (у sqlite3.Connection
+    ее нет); передается в sqlite3.connect(factory=...)"""
+
+
+def span(stage: str, **attrs: Any) -> Any:
+    """Контекстный менеджер замера этапа; при выключенном сборе - общий пустой объект"""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(stage, attrs)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Увеличение счетчика"""
+    if _enabled:
+        _registry.count(name, n)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _on_sql(statement: str) -> None:
+    _registry.count("db.statements")
+    if statement.startswith("COMMIT"):
+        _registry.count("db.commits")
+
+
+def register_connection(connection: TracedConnection) -> None:
+    """Подсчет SQL-запросов и фиксаций соединения, пока сбор включен.
+    Выключенный сбор не ставит обработчик трассировки вовсе."""
+    _connections.add(connection)
+    if _enabled:
+        connection.set_trace_callback(_on_sql)
+
+
+def unregister_connection(connection: TracedConnection) -> None:
+    """Вызывается перед закрытием соединения"""
+    _connections.discard(connection)
+
+
+def _set_tracing(callback: Any) -> None:
+    for connection in list(_connections):
+        try:
+            connection.set_trace_callback(callback)
+        except sqlite3.Error:
+            _connections.discard(connection)  # Соединение уже закрыто
+
+
+def enable(path: Optional[str] = None) -> None:
+    """Включение сбора и записи в файл"""
+    global _enabled
+    if _enabled:
+        return
+    _registry.open_log(path or METRICS_SETTINGS["path"])
+    _enabled = True
+    _set_tracing(_on_sql)
+
+
+def disable() -> None:
+    """Выключение сбора; накопленная статистика сессии сохраняется"""
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    _set_tracing(None)
+    _registry.flush()
+    _registry.close_log()
+
+
+def summary() -> List[Dict[str, Any]]:
+    return _registry.summary()
+
+
+def counters() -> Dict[str, int]:
+    return _registry.counters()
+
+
+def reset() -> None:
+    _registry.reset()
+
+
+if METRICS_SETTINGS["enabled"]:
+    enable()
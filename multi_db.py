@@ -0,0 +1,238 @@
+# multi_db.py
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from database import DatabaseHandler
+
+# Встроенный предел SQLite на число присоединенных баз (SQLITE_MAX_ATTACHED)
+DEFAULT_ATTACH_LIMIT = 10
+
+# Порядок рейтинга: ключ -> ORDER BY по временной таблице
+LEADERBOARD_ORDER = {
+    "kills": "kills DESC, kd DESC",
+    "kd": "kd DESC, kills DESC",
+    "deaths": "deaths DESC, kills DESC",
+}
+
+
+class MultiDatabaseQuery:
+    """Запросы сразу к нескольким базам data/*.db через ATTACH одного соединения.
+    Базы присоединяются только для чтения группами в пределах лимита SQLite;
+    итоги копятся во временной таблице, откуда читаются страницами."""
+
+    CREATE_LEADERBOARD_SQL = """
+        CREATE TEMP TABLE IF NOT EXISTS Leaderboard (
+            username TEXT PRIMARY KEY,
+            kills INTEGER NOT NULL,
+            deaths INTEGER NOT NULL,
+            databases INTEGER NOT NULL
+        )
+    """
+
+    CREATE_FOUND_SQL = """
+        CREATE TEMP TABLE IF NOT EXISTS Found (
+            source TEXT NOT NULL,
+            username TEXT,
+            urank TEXT,
+            kills INTEGER,
+            deads INTEGER,
+            kd REAL
+        )
+    """
+
+    def __init__(self, paths: Sequence[str], batch_size: Optional[int] = None) -> None:
+        self.paths = list(paths)
+        # URI в ATTACH работают, только если основное соединение открыто с uri=True
+        # Автофиксация: ATTACH/DETACH невозможны внутри открытой транзакции
+        self.connection = sqlite3.connect("file::memory:", uri=True, check_same_thread=False,
+                                          isolation_level=None)
+        limit = DEFAULT_ATTACH_LIMIT
+        if hasattr(self.connection, "getlimit"):  # Python 3.11+
+            limit = self.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        self.batch_size = max(1, min(batch_size or limit, limit))
+        self.skipped: List[Tuple[str, str]] = []  # (путь, причина)
+
+    def _batches(self, required: Sequence[str]) -> Iterator[List[Tuple[str, str]]]:
+        """Группы присоединенных баз [(псевдоним, путь)] с нужными таблицами.
+        Группа отсоединяется, когда вызывающий код переходит к следующей."""
+        for start in range(0, len(self.paths), self.batch_size):
+            attached = []
+            for index, path in enumerate(self.paths[start:start + self.batch_size]):
+                alias = f"src{index}"
+                uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+                try:
+                    self.connection.execute("ATTACH DATABASE ? AS " + alias, (uri,))
+                except sqlite3.Error as e:
+                    self.skipped.append((path, str(e)))
+                    continue
+                attached.append((alias, path))
+            try:
+                usable = []
+                for alias, path in attached:
+                    try:
+                        tables = {row[0] for row in self.connection.execute(
+                            f"SELECT name FROM {alias}.sqlite_master WHERE type = 'table'")}
+                    except sqlite3.Error as e:
+                        self.skipped.append((path, str(e)))
+                        continue
+                    missing = [table for table in required if table not in tables]
+                    if missing:
+                        self.skipped.append((path, f"нет таблиц: {', '.join(missing)}"))
+                    else:
+                        usable.append((alias, path))
+                if usable:
+                    yield usable
+            finally:
+                for alias, _ in attached:
+                    self.connection.execute(f"DETACH DATABASE {alias}")
+
+    def _has_column(self, alias: str, table: str, column: str) -> bool:
+        return any(row[1] == column for row in
+                   self.connection.execute(f"PRAGMA {alias}.table_info({table})"))
+
+    def build_leaderboard(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """Сводный рейтинг по нику во временной таблице; возвращает число игроков.
+        Без периода суммируются текущие значения Users, с периодом [start, end) -
+        результаты неоткаченных импортов за этот период."""
+        self.skipped.clear()
+        self.connection.execute(self.CREATE_LEADERBOARD_SQL)
+        self.connection.execute("DELETE FROM temp.Leaderboard")
+        period = start is not None or end is not None
+        required = ("Users", "MatchResults", "Imports") if period else ("Users",)
+
+        for batch in self._batches(required):
+            if period:
+                # Загрузки состава - не результаты матчей; в базах старой схемы их нет в журнале
+                parts = [f'''
+                    SELECT '{alias}' AS db, u.username AS username,
+                           SUM(m.kills) AS kills, SUM(m.deaths) AS deaths
+                    FROM {alias}.MatchResults m
+                    JOIN {alias}.Imports i ON i.id = m.import_id
+                    JOIN {alias}.Users u ON u.id = m.user_id
+                    WHERE i.rolled_back = 0 AND i.created_at >= ? AND i.created_at < ?
+                      {"AND i.kind = 'match'" if self._has_column(alias, "Imports", "kind") else ""}
+                    GROUP BY u.username
+                ''' for alias, _ in batch]
+                params = [start or "", end or "9999"] * len(batch)
+            else:
+                parts = [f"SELECT '{alias}' AS db, username, kills, deads AS deaths FROM {alias}.Users"
+                         for alias, _ in batch]
+                params = []
+            # Один запрос на группу баз; повторы ника внутри группы сворачиваются GROUP BY,
+            # а в числе баз повторы ника внутри одной базы не учитываются
+            self.connection.execute(f'''
+                INSERT INTO temp.Leaderboard (username, kills, deaths, databases)
+                SELECT username, SUM(kills), SUM(deaths), COUNT(DISTINCT db)
+                FROM ({" UNION ALL ".join(parts)})
+                GROUP BY username
+                ON CONFLICT(username) DO UPDATE SET
+                    kills = kills + excluded.kills,
+                    deaths = deaths + excluded.deaths,
+                    databases = databases + excluded.databases
+            ''', params)
+        return self.connection.execute("SELECT COUNT(*) FROM temp.Leaderboard").fetchone()[0]
+
+    def iter_leaderboard(self, page_size: int = 2000, order: str = "kills",
+                         limit: Optional[int] = None) -> Iterator[List[Tuple]]:
+        """Страницы рейтинга (место, ник, убийства, смерти, K/D, баз) после build_leaderboard"""
+        if order not in LEADERBOARD_ORDER:
+            raise ValueError(f"Неизвестный порядок рейтинга: {order}")
+        cursor = self.connection.execute(f'''
+            SELECT ROW_NUMBER() OVER (ORDER BY {LEADERBOARD_ORDER[order]}),
+                   username, kills, deaths, ROUND(kd, 2), databases
+            FROM (SELECT *, {DatabaseHandler._kd_sql("kills", "deaths")} AS kd FROM temp.Leaderboard)
+            ORDER BY {LEADERBOARD_ORDER[order]}
+            LIMIT ?
+        ''', (-1 if limit is None else limit,))
+        try:
+            while True:
+                page = cursor.fetchmany(page_size)
+                if not page:
+                    break
+                yield page
+        finally:
+            cursor.close()
+
+    def find_players(self, pattern: str) -> Iterator[Tuple]:
+        """Поиск ника во всех базах: (файл, ник, звание, убийства, смерти, K/D),
+        по убыванию убийств среди всех баз. Подстрока без учета регистра (для латиницы);
+        % и _ в шаблоне экранируются."""
+        escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        like = f"%{escaped}%"
+        self.skipped.clear()
+        self.connection.execute(self.CREATE_FOUND_SQL)
+        self.connection.execute("DELETE FROM temp.Found")
+        for batch in self._batches(("Users",)):
+            parts = [f'''
+                SELECT ? AS source, username, urank, kills, deads, ROUND(kills_deads, 2)
+                FROM {alias}.Users WHERE username LIKE ? ESCAPE '\\'
+            ''' for alias, _ in batch]
+            params = []
+            for _, path in batch:
+                params += [os.path.basename(path), like]
+            # Найденное копится во временной таблице до отсоединения баз группы:
+            # общий порядок возможен только после обхода всех групп
+            self.connection.execute("INSERT INTO temp.Found " + " UNION ALL ".join(parts), params)
+        cursor = self.connection.execute(
+            "SELECT source, username, urank, kills, deads, kd FROM temp.Found ORDER BY kills DESC, rowid"
+        )
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Сводный рейтинг или поиск игрока по нескольким базам из командной строки"""
+    from exporter import export_leaderboard
+
+    parser = argparse.ArgumentParser(description="Рейтинг и поиск игроков по нескольким базам")
+    parser.add_argument("databases", nargs="*", help="Файлы баз (по умолчанию все data/*.db)")
+    parser.add_argument("--top", type=int, default=20, help="Сколько строк рейтинга вывести")
+    parser.add_argument("--order", choices=sorted(LEADERBOARD_ORDER), default="kills")
+    parser.add_argument("--since", default=None, help="Начало периода (YYYY-MM-DD) по истории импортов")
+    parser.add_argument("--until", default=None, help="Конец периода, не включая")
+    parser.add_argument("--find", default=None, help="Найти игрока по части ника")
+    parser.add_argument("-o", "--output", default=None, help="Выгрузить весь рейтинг в .xlsx или .csv")
+    args = parser.parse_args(argv)
+
+    paths = args.databases or sorted(glob.glob(os.path.join("data", "*.db")))
+    if not paths:
+        print("Базы не найдены")
+        return 1
+    query = MultiDatabaseQuery(paths)
+    started = time.perf_counter()
+    try:
+        if args.find:
+            for row in query.find_players(args.find):
+                print("\t".join(str(value) for value in row))
+        else:
+            players = query.build_leaderboard(args.since, args.until)
+            print(f"Баз: {len(paths)}, игроков: {players}, за {time.perf_counter() - started:.2f} с")
+            for page in query.iter_leaderboard(order=args.order, limit=args.top):
+                for row in page:
+                    print("\t".join(str(value) for value in row))
+            if args.output:
+                rows = export_leaderboard(query, args.output, args.order)
+                print(f"Выгружено строк: {rows} в {args.output}")
+        for path, reason in query.skipped:
+            print(f"Пропущена {path}: {reason}")
+    except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+        print(f"Ошибка: {e}")
+        return 1
+    finally:
+        query.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
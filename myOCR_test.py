@@ -1,47 +1,169 @@
 # myOCR_test.py
 import cv2
-import pytesseract
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, simpledialog
 import numpy as np
-from PIL import Image, ImageTk
+from PIL import Image
 import re
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 import tkinter.ttk as ttk
-
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+import os
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ocr_cache import OCRCache, get_default_cache
+from ocr_worker import OCRJob, get_default_worker
+import ocr_backends
+import metrics
+from segmentation import RowSegmenter
+from table_layout import TableLayoutParser
+from image_pyramid import ImagePyramid, TiledImageCanvas
 
 class ImageProcessor:
     """Обработка и преобразование изображений"""
     
+    PREPROCESS_PARAMS: Dict[str, Any] = {
+        "scale": "auto",            # Число или "auto" - по измеренной высоте текста
+        "target_text_height": 40,   # Желаемая высота строки текста после увеличения, px
+        "min_scale": 1.0,
+        "max_scale": 4.0,
+        "threshold": 100,
+        "blur_kernel": 9,           # Ядро размытия при увеличении в 4 раза
+        "debug": os.environ.get("WODS_OCR_DEBUG") == "1",
+        "debug_dir": "debug",
+    }
+    # Параметры, не влияющие на результат (исключаются из ключа кэша)
+    DEBUG_PARAMS = ("debug", "debug_dir")
+
+    _buffers = threading.local()
+    _debug_counter = itertools.count()
+
     @staticmethod
     def load_image(image_path: str) -> np.ndarray:
         """Загрузка и конвертация изображения"""
-        img = cv2.imread(image_path, cv2.IMREAD_ANYCOLOR)
-        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        with metrics.span("image.load") as span:
+            img = cv2.imread(image_path, cv2.IMREAD_ANYCOLOR)
+            span.set(width=img.shape[1], height=img.shape[0])
+            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
     @staticmethod
-    def preprocess_image(image: np.ndarray) -> np.ndarray:
+    def image_size(image_path: str) -> tuple:
+        """Разрешение (ширина, высота) по заголовку файла, без декодирования"""
+        with Image.open(image_path) as img:
+            return img.size
+
+    @classmethod
+    def cache_params(cls) -> Dict[str, Any]:
+        """Параметры предобработки, определяющие результат"""
+        return {k: v for k, v in cls.PREPROCESS_PARAMS.items() if k not in cls.DEBUG_PARAMS}
+
+    @classmethod
+    def _buffer(cls, name: str, shape: tuple) -> np.ndarray:
+        """Переиспользуемый буфер потока; пересоздается только при смене размера"""
+        buf = getattr(cls._buffers, name, None)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            setattr(cls._buffers, name, buf)
+        return buf
+
+    @classmethod
+    def estimate_text_height(cls, gray: np.ndarray) -> Optional[float]:
+        """Медианная высота строки текста на исходном изображении"""
+        # Текст светлее порога (после инверсии он станет темным)
+        filled = np.count_nonzero(gray > 254 - cls.PREPROCESS_PARAMS["threshold"], axis=1) > 0
+        heights = [bottom - top for top, bottom in RowSegmenter.row_runs(filled) if bottom - top >= 2]
+        return float(np.median(heights)) if heights else None
+
+    @classmethod
+    def choose_scale(cls, gray: np.ndarray) -> float:
+        """Коэффициент увеличения по высоте текста"""
+        params = cls.PREPROCESS_PARAMS
+        if params["scale"] != "auto":
+            return float(params["scale"])
+        height = cls.estimate_text_height(gray)
+        if not height:
+            return float(params["max_scale"])
+        return float(np.clip(params["target_text_height"] / height, params["min_scale"], params["max_scale"]))
+
+    @classmethod
+    def preprocess_image(cls, image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
         """Предобработка изображения для OCR"""
-        resized = cv2.resize(image, None, fx=4, fy=4)
-        gray = cv2.cvtColor(resized, cv2.COLOR_RGB2GRAY)
-        inverted = cv2.bitwise_not(gray)
-        _, thresh = cv2.threshold(inverted, 100, 255, 0)
-        blured = cv2.GaussianBlur(thresh, (9, 9), 0)
-        cv2.imwrite("./prerprocessed_image.png", blured)
-        return blured
+        with metrics.span("ocr.preprocess", width=image.shape[1], height=image.shape[0]) as span:
+            out = cls._preprocess(image, out)
+            span.set(scaled_width=out.shape[1], scaled_height=out.shape[0])
+            return out
+
+    @classmethod
+    def _preprocess(cls, image: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+        params = cls.PREPROCESS_PARAMS
+
+        # Сначала в оттенки серого: увеличивается один канал вместо трех
+        if image.ndim == 2:
+            gray = image
+        else:
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY,
+                                dst=cls._buffer("gray", image.shape[:2]))
+
+        scale = cls.choose_scale(gray)
+        height, width = gray.shape
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        resized = cv2.resize(gray, size, dst=cls._buffer("resized", (size[1], size[0])),
+                             interpolation=cv2.INTER_LINEAR)
+
+        # Инверсия и порог одним шагом, на месте: inverted > t  <=>  gray <= 254 - t
+        cv2.threshold(resized, 254 - params["threshold"], 255, cv2.THRESH_BINARY_INV, dst=resized)
+
+        # Ядро размытия пропорционально увеличению (нечетное)
+        kernel = max(3, int(round(params["blur_kernel"] * scale / 4)) | 1)
+        if out is None or out.shape != resized.shape:
+            out = np.empty_like(resized)
+        cv2.GaussianBlur(resized, (kernel, kernel), 0, dst=out)
+
+        if params["debug"]:
+            cls._save_debug(gray, resized, out)
+        return out
+
+    @classmethod
+    def _save_debug(cls, *stages: np.ndarray) -> None:
+        """Сохранение промежуточных изображений с уникальными именами"""
+        os.makedirs(cls.PREPROCESS_PARAMS["debug_dir"], exist_ok=True)
+        prefix = f"{os.getpid()}_{threading.get_ident()}_{next(cls._debug_counter)}"
+        for idx, stage in enumerate(stages):
+            path = os.path.join(cls.PREPROCESS_PARAMS["debug_dir"], f"{prefix}_{idx}.png")
+            cv2.imwrite(path, stage)
     
 
 class OCRProcessor:
     """Обработка текста с использованием Tesseract OCR"""
     
     TESSERACT_CONFIG = '--oem 3 --psm 6 -l rus+eng'
+    LINE_CONFIG = '--oem 3 --psm 7 -l rus+eng'
     
     @classmethod
     def extract_text(cls, image: np.ndarray) -> str:
         """Извлечение текста из изображения"""
-        return pytesseract.image_to_string(image, config=cls.TESSERACT_CONFIG)
+        with metrics.span("ocr.text", width=image.shape[1], height=image.shape[0]):
+            return ocr_backends.recognize(image, cls.TESSERACT_CONFIG)
+
+    @classmethod
+    def extract_line(cls, image: np.ndarray) -> str:
+        """Распознавание полосы как одной строки текста"""
+        with metrics.span("ocr.line", width=image.shape[1], height=image.shape[0]):
+            return ocr_backends.recognize(image, cls.LINE_CONFIG).strip()
+
+    @classmethod
+    def extract_words(cls, image: np.ndarray) -> List[tuple]:
+        """Слова с рамками и уверенностью (аналог image_to_data)"""
+        with metrics.span("ocr.words", width=image.shape[1], height=image.shape[0]) as span:
+            words = ocr_backends.recognize_words(image, cls.TESSERACT_CONFIG)
+            span.set(words=len(words))
+            return words
+
+    @classmethod
+    def warm_up(cls) -> None:
+        """Фоновая инициализация OCR-движка, чтобы первый запрос не ждал загрузки"""
+        ocr_backends.warm_up_async(cls.TESSERACT_CONFIG)
 
     @staticmethod
     def preprocess_text(text: str) -> str:
@@ -50,21 +172,146 @@ class OCRProcessor:
         text = re.sub(r'\s+', ' ', text)
         return re.sub(r'[^a-zа-яё0-9\s]', '', text)
 
+class OCRPipeline:
+    """Полный цикл распознавания области с кэшированием результата"""
+
+    LAYOUT_PARSING = True               # Разбор по рамкам слов одним вызовом OCR
+    SEGMENT_ROWS = True                 # Построчное распознавание, если разбор по рамкам не удался
+    ROW_WORKERS: Optional[int] = None   # Потоков на строки; None - по числу ядер
+    _row_executor: Optional[ThreadPoolExecutor] = None
+    _row_executor_lock = threading.Lock()
+
+    @classmethod
+    def cache_key(cls, source_hash: str, rect: Optional[tuple]) -> str:
+        """Ключ кэша для области исходного изображения"""
+        config = OCRProcessor.TESSERACT_CONFIG
+        if cls.SEGMENT_ROWS:
+            config = f"rows:{OCRProcessor.LINE_CONFIG}|{config}"
+        if cls.LAYOUT_PARSING:
+            config = f"layout|{config}"
+        return OCRCache.make_key(
+            source_hash, rect,
+            ImageProcessor.cache_params(),
+            config
+        )
+
+    @classmethod
+    def row_workers(cls) -> int:
+        """Потоков на строки: не больше, чем движок выполняет вызовов одновременно"""
+        workers = cls.ROW_WORKERS or os.cpu_count() or 2
+        limit = ocr_backends.get_backend().max_parallel
+        return min(workers, limit) if limit else workers
+
+    @classmethod
+    def _get_row_executor(cls) -> ThreadPoolExecutor:
+        # Tesseract отпускает GIL, поэтому потоков достаточно для загрузки всех ядер
+        with cls._row_executor_lock:
+            if cls._row_executor is None:
+                cls._row_executor = ThreadPoolExecutor(
+                    max_workers=cls.row_workers(),
+                    thread_name_prefix="ocr-row"
+                )
+            return cls._row_executor
+
+    @classmethod
+    def recognize_rows(cls, processed_img: np.ndarray) -> List[tuple]:
+        """Параллельное распознавание полос; возвращает [(текст, полоса)] в порядке сверху вниз"""
+        strips = RowSegmenter.split(processed_img)
+        if len(strips) < 2 or cls.row_workers() == 1:
+            texts = [OCRProcessor.extract_line(strip.image) for strip in strips]
+        else:
+            texts = list(cls._get_row_executor().map(
+                OCRProcessor.extract_line, [strip.image for strip in strips]
+            ))
+        return list(zip(texts, strips))
+
+    @classmethod
+    def recognize(cls, image: np.ndarray, source_hash: Optional[str] = None,
+                  rect: Optional[tuple] = None,
+                  cache: Optional[OCRCache] = None) -> tuple:
+        """Предобработка + OCR + разбор; возвращает (текст, данные)"""
+        key = None
+        if source_hash is not None:
+            cache = cache or get_default_cache()
+            key = cls.cache_key(source_hash, rect)
+            cached = cache.get(key)
+            if cached is not None:
+                metrics.count("ocr.cache_hits")
+                return cached
+            metrics.count("ocr.cache_misses")
+
+        processed_img = ImageProcessor.preprocess_image(image)
+        # Границы строк переводятся в координаты обрезанного изображения
+        scale = processed_img.shape[0] / max(1, image.shape[0])
+        ocr_text, data = "", []
+        if cls.LAYOUT_PARSING:
+            # Один вызов OCR на всю таблицу; колонки определяются по рамкам слов
+            ocr_text, data = TableLayoutParser.parse(OCRProcessor.extract_words(processed_img))
+            for player in data:
+                player['bounds'] = [int(edge / scale) for edge in player['bounds']]
+        if not data:
+            rows = cls.recognize_rows(processed_img) if cls.SEGMENT_ROWS else []
+            if rows:
+                ocr_text = "\n".join(text for text, _ in rows)
+                data = OCRDataHandler.parse_rows([
+                    (text, (int(strip.top / scale), int(strip.bottom / scale)))
+                    for text, strip in rows
+                ])
+            else:
+                ocr_text = OCRProcessor.extract_text(processed_img)
+                data = OCRDataHandler.parse_ocr_data(ocr_text)
+
+        if key is not None:
+            cache.put(key, ocr_text, data)
+        return ocr_text, data
+
+    @classmethod
+    def recognize_regions(cls, image: np.ndarray, source_hash: Optional[str],
+                          rects: List[tuple]) -> tuple:
+        """Распознавание нескольких областей одного изображения; данные объединяются"""
+        return cls.recognize_crops(
+            [image[top:bottom, left:right] for left, top, right, bottom in rects], source_hash, rects
+        )
+
+    @classmethod
+    def recognize_crops(cls, crops: List[np.ndarray], source_hash: Optional[str],
+                        rects: List[tuple]) -> tuple:
+        """Распознавание уже вырезанных областей; rects - их положение для ключа кэша"""
+        texts: List[str] = []
+        data: List[Dict[str, Any]] = []
+        for crop, rect in zip(crops, rects):
+            text, region_data = cls.recognize(crop, source_hash, tuple(rect))
+            texts.append(text)
+            data.extend(region_data)
+        return "\n".join(texts), data
+
 class CropWindow(tk.Toplevel):
     """Окно для обрезки изображения"""
     
-    def __init__(self, parent: tk.Tk, image_path: str):
+    def __init__(self, parent: tk.Tk, image_path: str,
+                 on_confirm: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 regions: Optional[List[tuple]] = None,
+                 on_save_template: Optional[Callable[[str, int, int, tuple], None]] = None):
         super().__init__(parent)
         self.parent = parent
         self.image_path = image_path
+        self.on_confirm = on_confirm
+        self.on_save_template = on_save_template
         self.points: List[tuple] = []
         self.cropped_img: Optional[np.ndarray] = None
+        self.crop_rect: Optional[tuple] = None
+        # Области из шаблона: окно только подтверждает результат
+        self.regions: List[tuple] = list(regions or [])
+        self.from_template = bool(self.regions)
+        self.source_hash: str = OCRCache.hash_file(image_path)
         self.ocr_data: List[Dict[str, Any]] = []  # Добавлено хранилище данных
+        self._job: Optional[OCRJob] = None
         
         self._setup_window()
         self._load_image()
         self._bind_events()
-        self.ocr_data: List[Dict[str, Any]] = []
+        if self.regions:
+            self._apply_regions()
 
     def _setup_window(self) -> None:
         """Настройка параметров окна"""
@@ -72,24 +319,19 @@ class CropWindow(tk.Toplevel):
         self.geometry(f"{self.winfo_screenwidth()//2}x{self.winfo_screenheight()//2}")
 
     def _load_image(self) -> None:
-        """Загрузка и отображение изображения"""
-        self.img = ImageProcessor.load_image(self.image_path)
-        self.original_height, self.original_width = self.img.shape[:2]
-        self.scale_factor = self._calculate_scale_factor()
-        
-        resized_img = cv2.resize(self.img, None, 
-                               fx=self.scale_factor, 
-                               fy=self.scale_factor)
-        self.tk_image = ImageTk.PhotoImage(Image.fromarray(resized_img))
-        
-        self.canvas = tk.Canvas(self, width=resized_img.shape[1], height=resized_img.shape[0])
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_image)
-        self.canvas.pack()
+        """Загрузка уменьшенной копии и холст с масштабированием.
+        Полное разрешение декодируется только для выбранных областей."""
+        self.pyramid = ImagePyramid(self.image_path)
+        self.original_width, self.original_height = self.pyramid.size
 
-    def _calculate_scale_factor(self) -> float:
-        """Вычисление коэффициента масштабирования"""
-        max_size = 800
-        return min(max_size/self.original_width, max_size/self.original_height)
+        self.view = TiledImageCanvas(
+            self, self.pyramid, self.winfo_screenwidth() // 2, self.winfo_screenheight() // 2 - 40
+        )
+        self.view.pack(fill="both", expand=True)
+        self.canvas = self.view.canvas
+        tk.Label(
+            self, text="ЛКМ - углы области, колесо - масштаб, ПКМ - перемещение"
+        ).pack(fill="x")
 
     def _bind_events(self) -> None:
         """Привязка обработчиков событий"""
@@ -99,64 +341,110 @@ class CropWindow(tk.Toplevel):
     def _on_click(self, event: tk.Event) -> None:
         """Обработка клика мыши"""
         if len(self.points) < 2:
-            x = int(event.x / self.scale_factor)
-            y = int(event.y / self.scale_factor)
+            x, y = self.view.to_source(event)
             self.points.append((x, y))
-            self._draw_marker(event.x, event.y)
+            self._draw_marker(x, y)
             
         if len(self.points) == 2:
             self._crop_image()
 
     def _draw_marker(self, x: int, y: int) -> None:
-        """Отрисовка маркера выбора"""
-        radius = 5
-        self.canvas.create_oval(
-            x - radius, y - radius,
-            x + radius, y + radius,
-            fill='red', tags="marker"
-        )
+        """Отрисовка маркера выбора (координаты исходного изображения)"""
+        self.view.add_point(x, y)
 
     def _crop_image(self) -> None:
         """Обрезка изображения по выбранным точкам"""
         x1, y1 = self.points[0]
         x2, y2 = self.points[1]
-        self.cropped_img = self.img[
-            min(y1, y2):max(y1, y2),
-            min(x1, x2):max(x1, x2)
-        ]
-        
-        # Непосредственная обработка OCR
-        processed_img = ImageProcessor.preprocess_image(self.cropped_img)
-        ocr_text = OCRProcessor.extract_text(processed_img)
-        self.ocr_data = OCRDataHandler.parse_ocr_data(ocr_text)  # Сохраняем данные
+        self.crop_rect = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        self.regions = [self.crop_rect]
+        self._show_ocr_preview()
+
+    def _apply_regions(self) -> None:
+        """Отрисовка областей шаблона и запуск распознавания без кликов"""
+        for rect in self.regions:
+            self.view.add_rect(rect)
+        self.crop_rect = self.regions[0]
         self._show_ocr_preview()
         
 
     def _on_close(self) -> None:
         """Обработка закрытия окна"""
+        self._cancel_job()
         self.cropped_img = None
+        self.ocr_data = []
+        self.view.release()
         self.destroy()
+
+    def _cancel_job(self) -> None:
+        """Отмена незавершенного распознавания"""
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+
+    def _reset_selection(self) -> None:
+        """Сброс точек для повторного выбора области"""
+        self.points.clear()
+        self.regions.clear()
+        self.from_template = False
+        self.view.clear_overlays()
         
     def _show_ocr_preview(self) -> None:
-        """Окно проверки распознанных данных"""
+        """Окно проверки распознанных данных; OCR выполняется в фоне"""
         preview_win = tk.Toplevel(self)
         preview_win.title("Проверка данных")
-        preview_win.grab_set()
 
-        # Обработка OCR с проверкой ошибок
-        try:
-            processed_img = ImageProcessor.preprocess_image(self.cropped_img)
-            ocr_text = OCRProcessor.extract_text(processed_img)
-            self.ocr_data = OCRDataHandler.parse_ocr_data(ocr_text)
-            
-            # Проверка наличия данных
-            if not self.ocr_data:
-                raise ValueError("Не удалось распознать данные")
-                
-        except Exception as e:
-            messagebox.showerror("Ошибка", str(e), parent=preview_win)
+        # Индикатор выполнения вместо блокировки главного цикла
+        progress_frame = tk.Frame(preview_win)
+        progress_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        tk.Label(progress_frame, text="Идет распознавание...").pack(pady=5)
+        progress = ttk.Progressbar(progress_frame, mode="indeterminate", length=240)
+        progress.pack(pady=5)
+        progress.start(10)
+
+        def cancel() -> None:
+            self._cancel_job()
             preview_win.destroy()
-            return
+            self._reset_selection()
+
+        tk.Button(progress_frame, text="Отмена", command=cancel).pack(pady=5)
+        preview_win.protocol("WM_DELETE_WINDOW", cancel)
+
+        def on_done(result: tuple) -> None:
+            self._job = None
+            if not preview_win.winfo_exists():
+                return
+            progress.stop()
+            progress_frame.destroy()
+            _, data = result
+            if not data:
+                on_error(ValueError("Не удалось распознать данные"))
+                return
+            self.ocr_data = data
+            self._show_preview_results(preview_win)
+
+        def on_error(error: Exception) -> None:
+            self._job = None
+            if preview_win.winfo_exists():
+                messagebox.showerror("Ошибка", str(error), parent=preview_win)
+                preview_win.destroy()
+            self._reset_selection()
+
+        # Повторные запросы той же области берутся из кэша
+        self._job = get_default_worker().submit(
+            self, self._recognize, list(self.regions),
+            on_done=on_done, on_error=on_error
+        )
+
+    def _recognize(self, rects: List[tuple]) -> tuple:
+        """Фоновая задача: декодирование только выбранных областей и OCR"""
+        crops = self.pyramid.regions(rects)
+        self.cropped_img = crops[0]
+        return OCRPipeline.recognize_crops(crops, self.source_hash, rects)
+
+    def _show_preview_results(self, preview_win: tk.Toplevel) -> None:
+        """Таблица результатов и кнопки подтверждения"""
+        preview_win.protocol("WM_DELETE_WINDOW", lambda: self._discard_and_close(preview_win))
 
         # Создаем таблицу с данными
         self._create_preview_table(preview_win)
@@ -165,19 +453,30 @@ class CropWindow(tk.Toplevel):
         btn_frame = tk.Frame(preview_win)
         btn_frame.pack(pady=10)
 
-        def save_and_close():
-            preview_win.destroy()
-            self.destroy()
-
         tk.Button(btn_frame, 
                 text="Сохранить", 
-                command=save_and_close
+                command=lambda: self._save_and_close(preview_win)
         ).pack(side="left", padx=5)
         
         tk.Button(btn_frame, 
                 text="Отмена", 
-                command=lambda: [preview_win.destroy(), self.destroy()]
+                command=lambda: self._discard_and_close(preview_win)
         ).pack(side="right", padx=5)
+
+        if self.on_save_template and not self.from_template:
+            tk.Button(btn_frame,
+                    text="Запомнить область",
+                    command=lambda: self._save_template(preview_win)
+            ).pack(side="right", padx=5)
+
+    def _save_template(self, preview_win: tk.Toplevel) -> None:
+        """Сохранение выбранной области как шаблона для этого разрешения"""
+        name = simpledialog.askstring(
+            "Шаблон области", "Название шаблона:", parent=preview_win
+        )
+        if not name:
+            return
+        self.on_save_template(name.strip(), self.original_width, self.original_height, self.crop_rect)
         
         
     def _create_preview_table(self, parent: tk.Toplevel) -> None:
@@ -217,6 +516,15 @@ class CropWindow(tk.Toplevel):
         """Финализация сохранения"""
         preview_win.destroy()
         self.destroy()
+        if self.on_confirm and self.ocr_data:
+            self.on_confirm(self.ocr_data)
+
+    def _discard_and_close(self, preview_win: tk.Toplevel) -> None:
+        """Закрытие без сохранения распознанных данных"""
+        self.ocr_data = []
+        self.cropped_img = None
+        preview_win.destroy()
+        self.destroy()
 
 class OCRDataHandler:
     
@@ -233,28 +541,50 @@ class OCRDataHandler:
         re.VERBOSE | re.UNICODE
     )
 
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
+        """Разбор одной строки таблицы; None, если строка не распознана"""
+        line = line.strip()
+        if not line:
+            return None
+
+        # Замена тире и других проблемных символов
+        #line = line.replace('—', '-').replace('№', '')
+        match = cls.DATA_PATTERN.search(line)
+        
+        if match:
+            try:
+                return cls._process_match(match)
+            except Exception as e:
+                print(f"Ошибка обработки строки: {line}\n{str(e)}")
+        else:
+            print(f"Не распознано: {line}")
+        metrics.count("parse.unmatched")
+        return None
+
     @classmethod
     def parse_ocr_data(cls, ocr_text: str) -> List[Dict[str, Any]]:
-        data = []
-        for line in ocr_text.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-
-            # Замена тире и других проблемных символов
-            #line = line.replace('—', '-').replace('№', '')
-            match = cls.DATA_PATTERN.search(line)
-            
-            if match:
-                try:
-                    parsed_data = cls._process_match(match)
+        with metrics.span("parse.text") as span:
+            data = []
+            for line in ocr_text.split('\n'):
+                parsed_data = cls.parse_line(line)
+                if parsed_data is not None:
                     data.append(parsed_data)
-                except Exception as e:
-                    print(f"Ошибка обработки строки: {line}\n{str(e)}")
-            else:
-                print(f"Не распознано: {line}")
-        print(data)
-        return data
+            span.set(rows=len(data))
+            return data
+
+    @classmethod
+    def parse_rows(cls, rows: List[tuple]) -> List[Dict[str, Any]]:
+        """Разбор построчного OCR: [(текст, (top, bottom))] с сохранением границ строки"""
+        with metrics.span("parse.rows", lines=len(rows)) as span:
+            data = []
+            for text, bounds in rows:
+                parsed_data = cls.parse_line(text)
+                if parsed_data is not None:
+                    parsed_data['bounds'] = list(bounds)
+                    data.append(parsed_data)
+            span.set(rows=len(data))
+            return data
 
 
     @classmethod
@@ -263,7 +593,8 @@ class OCRDataHandler:
         return {
             'name': match.group(1).strip(),
             'kills': int(match.group(2)),
-            'deaths': int(match.group(3))
+            'deaths': int(match.group(3)),
+            'treasury': 0  # Построчный разбор казну не читает
         }
 
     @staticmethod
@@ -276,7 +607,7 @@ class OCRDataHandler:
             max_lens[0] = max(max_lens[0], len(row['name']))
             max_lens[1] = max(max_lens[1], len(str(row['kills'])))
             max_lens[2] = max(max_lens[2], len(str(row['deaths'])))
-            max_lens[3] = max(max_lens[3], len(str(row['treasury'])))
+            max_lens[3] = max(max_lens[3], len(str(row.get('treasury', 0))))
 
         table = [
             " | ".join([h.ljust(l) for h, l in zip(headers, max_lens)]),
@@ -288,7 +619,7 @@ class OCRDataHandler:
                 f"{row['name'].ljust(max_lens[0])} | "
                 f"{str(row['kills']).ljust(max_lens[1])} | "
                 f"{str(row['deaths']).ljust(max_lens[2])} | "
-                f"{str(row['treasury']).ljust(max_lens[3])}"
+                f"{str(row.get('treasury', 0)).ljust(max_lens[3])}"
             )
             
         with open(filename, 'w', encoding='utf-8') as f:
@@ -322,10 +653,13 @@ class OCRApp:
             if crop_win.cropped_img is None or not isinstance(crop_win.cropped_img, np.ndarray):
                 return
             
-            # Обработка изображения
-            processed_img = ImageProcessor.preprocess_image(crop_win.cropped_img)
-            ocr_text = OCRProcessor.extract_text(processed_img)
-            self.processed_data = OCRDataHandler.parse_ocr_data(ocr_text)
+            # Результат уже получен окном обрезки; иначе берется из кэша
+            if crop_win.ocr_data:
+                self.processed_data = crop_win.ocr_data
+            else:
+                _, self.processed_data = OCRPipeline.recognize(
+                    crop_win.cropped_img, crop_win.source_hash, crop_win.crop_rect
+                )
         except Exception as e:
             messagebox.showerror("Ошибка OCR", str(e))
 
@@ -0,0 +1,198 @@
+# nickname_index.py
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+import metrics
+
+# Символы, которые OCR путает между собой, приводятся к одному представителю
+# (в том числе похожие кириллические и латинские буквы)
+OCR_CONFUSIONS = str.maketrans({
+    "0": "o", "о": "o", "ο": "o",
+    "1": "i", "l": "i", "|": "i", "!": "i", "і": "i",
+    "5": "s", "$": "s",
+    "8": "b", "в": "b",
+    "а": "a", "@": "a",
+    "е": "e", "ё": "e",
+    "к": "k", "м": "m", "н": "h", "р": "p", "с": "c", "т": "t", "у": "y", "х": "x",
+})
+
+
+def normalize_nickname(name: str) -> str:
+    """Ключ сравнения ников: регистр, путаемые символы и разделители не учитываются"""
+    folded = name.casefold().translate(OCR_CONFUSIONS)
+    return "".join(ch for ch in folded if ch.isalnum())
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Левенштейна; при превышении limit возвращается limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+@dataclass
+class NicknameMatch:
+    """Результат поиска ника: игрок, совпавшее имя и уверенность 0..1"""
+    user_id: int
+    name: str
+    score: float
+
+
+class NicknameIndex:
+    """Триграммный индекс ников для приближенного поиска.
+
+    Кандидаты отбираются по общим триграммам из инвертированного списка,
+    точная оценка (расстояние Левенштейна) считается только для лучших из них."""
+
+    MAX_CANDIDATES = 20      # Сколько кандидатов проверяется расстоянием редактирования
+    STOP_GRAM_RATIO = 0.2    # Триграммы, встречающиеся чаще, не используются для отбора
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, int] = {}                 # Имя как есть -> игрок
+        self._keys: Dict[str, Set[int]] = defaultdict(set)  # Нормализованный ключ -> игроки
+        self._postings: Dict[str, Set[str]] = defaultdict(set)  # Триграмма -> ключи
+        self._user_names: Dict[int, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def trigrams(key: str) -> Set[str]:
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, user_id: int, name: str) -> None:
+        key = normalize_nickname(name)
+        if not key:
+            return
+        self._exact.setdefault(name, user_id)
+        self._user_names[user_id].add(name)
+        if not self._keys[key]:
+            for gram in self.trigrams(key):
+                self._postings[gram].add(key)
+        self._keys[key].add(user_id)
+
+    def remove_user(self, user_id: int) -> None:
+        for name in self._user_names.pop(user_id, ()):
+            if self._exact.get(name) == user_id:
+                del self._exact[name]
+            key = normalize_nickname(name)
+            users = self._keys.get(key)
+            if users is None:
+                continue
+            users.discard(user_id)
+            if not users:
+                del self._keys[key]
+                for gram in self.trigrams(key):
+                    postings = self._postings.get(gram)
+                    if postings is not None:
+                        postings.discard(key)
+                        if not postings:
+                            del self._postings[gram]
+
+    def exact(self, name: str) -> Optional[int]:
+        """Игрок с точно таким именем (как в базе)"""
+        return self._exact.get(name)
+
+    def _candidates(self, key: str) -> List[str]:
+        """Ключи с наибольшим числом общих триграмм"""
+        grams = self.trigrams(key)
+        stop_size = max(self.MAX_CANDIDATES, int(len(self._keys) * self.STOP_GRAM_RATIO))
+        counts: Dict[str, int] = defaultdict(int)
+        rare = [self._postings[g] for g in grams if 0 < len(self._postings.get(g, ())) <= stop_size]
+        # Если все триграммы частые, отбор идет по самой редкой из них
+        if not rare:
+            common = [self._postings[g] for g in grams if g in self._postings]
+            rare = [min(common, key=len)] if common else []
+        for postings in rare:
+            for candidate in postings:
+                counts[candidate] += 1
+        return sorted(counts, key=counts.get, reverse=True)[:self.MAX_CANDIDATES]
+
+    def lookup(self, name: str, min_score: float = 0.0) -> Optional[NicknameMatch]:
+        """Наиболее похожий игрок; None, если похожих нет или лучший вариант неоднозначен"""
+        key = normalize_nickname(name)
+        if not key:
+            return None
+        best: List[tuple] = []
+        for candidate in self._candidates(key):
+            limit = int(max(len(key), len(candidate)) * (1 - min_score))
+            distance = edit_distance(key, candidate, limit)
+            if distance > limit:
+                continue
+            score = 1 - distance / max(len(key), len(candidate))
+            best.append((score, candidate))
+        if not best:
+            return None
+        best.sort(reverse=True)
+        score, candidate = best[0]
+        users = self._keys[candidate]
+        # Разные игроки с одинаково похожими никами - сопоставлять нельзя
+        if len(users) > 1 or (len(best) > 1 and best[1][0] == score):
+            return None
+        user_id = next(iter(users))
+        name_match = next((n for n in self._user_names[user_id] if normalize_nickname(n) == candidate), candidate)
+        return NicknameMatch(user_id, name_match, score)
+
+
+class NicknameResolver:
+    """Индекс ников базы, обновляемый по версии данных"""
+
+    ACCEPT_THRESHOLD = 0.75  # Минимальная уверенность для автоматического сопоставления
+
+    def __init__(self, db: Any) -> None:
+        self.db = weakref.proxy(db)  # Кэш резолверов не должен удерживать базу
+        self.index = NicknameIndex()
+        self._rev = 0
+        self._alias_id = 0
+
+    def refresh(self) -> None:
+        """Переиндексация только измененных с прошлого раза игроков"""
+        names, stale, self._rev, self._alias_id = self.db.fetch_nicknames(self._rev, self._alias_id)
+        for user_id in stale:
+            self.index.remove_user(user_id)
+        for user_id, name in names:
+            self.index.add(user_id, name)
+
+    def resolve(self, name: str, threshold: Optional[float] = None) -> Optional[NicknameMatch]:
+        """Сопоставление ника игроку, если уверенность не ниже порога"""
+        return self.index.lookup(name, self.ACCEPT_THRESHOLD if threshold is None else threshold)
+
+    def resolve_players(self, players: List[Dict[str, Any]], threshold: Optional[float] = None
+                        ) -> List[Dict[str, Any]]:
+        """Копии записей импорта с user_id для ников, найденных только приближенно"""
+        with metrics.span("nickname.resolve", rows=len(players)) as span:
+            self.refresh()
+            resolved, fuzzy = [], 0
+            for player in players:
+                name = player.get('name')
+                if name and self.index.exact(name) is None:
+                    match = self.resolve(name, threshold)
+                    if match is not None:
+                        player = dict(player, user_id=match.user_id)
+                        fuzzy += 1
+                resolved.append(player)
+            span.set(fuzzy=fuzzy)
+            metrics.count("nickname.fuzzy", fuzzy)
+            return resolved
+
+
+_resolvers: "weakref.WeakKeyDictionary[Any, NicknameResolver]" = weakref.WeakKeyDictionary()
+
+
+def get_resolver(db: Any) -> NicknameResolver:
+    """Общий индекс ников для открытой базы"""
+    resolver = _resolvers.get(db)
+    if resolver is None:
+        resolver = _resolvers[db] = NicknameResolver(db)
+    return resolver
@@ -0,0 +1,370 @@
+# ocr_backends.py
+import importlib.util
+import multiprocessing
+import os
+import queue
+import shlex
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Слово с рамкой: (текст, left, top, right, bottom, уверенность 0..100)
+Word = Tuple[str, int, int, int, int, float]
+
+# Настройки движка OCR; переопределяются переменными окружения
+BACKEND_SETTINGS: Dict[str, Any] = {
+    # auto | worker | tesserocr | pytesseract
+    "backend": os.environ.get("WODS_OCR_BACKEND", "auto"),
+    "tesseract_cmd": os.environ.get(
+        "TESSERACT_CMD",
+        r'C:\Program Files\Tesseract-OCR\tesseract.exe' if os.name == "nt" else "tesseract"
+    ),
+    "tessdata_path": os.environ.get("TESSDATA_PREFIX"),
+    # Процессов движка у backend=worker; каждый обрабатывает одно изображение за раз
+    "worker_processes": int(os.environ.get("WODS_OCR_WORKERS", min(4, os.cpu_count() or 1))),
+}
+
+# Ошибки движка, при которых распознавание повторяется через pytesseract:
+# сбой или завершение процесса-движка, отсутствующая библиотека
+ENGINE_ERRORS = (RuntimeError, ImportError, OSError, EOFError)
+
+
+def parse_tesseract_config(config: str) -> Tuple[str, int, int, Dict[str, str]]:
+    """Разбор строки конфига Tesseract в (lang, psm, oem, переменные)"""
+    lang, psm, oem = "eng", 3, 3
+    variables: Dict[str, str] = {}
+    tokens = shlex.split(config)
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        value = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if token == "-l":
+            lang = value
+        elif token == "--psm":
+            psm = int(value)
+        elif token == "--oem":
+            oem = int(value)
+        elif token == "-c" and "=" in value:
+            name, var_value = value.split("=", 1)
+            variables[name] = var_value
+        else:
+            i += 1
+            continue
+        i += 2
+    return lang, psm, oem, variables
+
+
+class OCRBackend:
+    """Интерфейс движка распознавания"""
+
+    name = "base"
+    # Сколько вызовов движок выполняет одновременно; None - без ограничения
+    max_parallel: Optional[int] = None
+
+    def recognize(self, image: Any, config: str) -> str:
+        """Распознавание текста на изображении (numpy-массив)"""
+        raise NotImplementedError
+
+    def recognize_words(self, image: Any, config: str) -> List[Word]:
+        """Распознавание с рамками и уверенностью по словам"""
+        raise NotImplementedError
+
+    def warm_up(self, config: str) -> None:
+        """Предварительная загрузка моделей"""
+        import numpy as np
+        self.recognize(np.full((32, 32), 255, dtype=np.uint8), config)
+
+    def close(self) -> None:
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """Запуск tesseract отдельным процессом на каждый вызов (резервный путь)"""
+
+    name = "pytesseract"
+
+    def __init__(self, tesseract_cmd: Optional[str] = None) -> None:
+        import pytesseract
+        self._pytesseract = pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd or BACKEND_SETTINGS["tesseract_cmd"]
+
+    def recognize(self, image: Any, config: str) -> str:
+        return self._pytesseract.image_to_string(image, config=config)
+
+    def recognize_words(self, image: Any, config: str) -> List[Word]:
+        data = self._pytesseract.image_to_data(
+            image, config=config, output_type=self._pytesseract.Output.DICT
+        )
+        words = []
+        for i, text in enumerate(data["text"]):
+            # Уровень 5 - слово; у строк и блоков уверенность -1
+            if data["level"][i] != 5 or not text.strip():
+                continue
+            left, top = data["left"][i], data["top"][i]
+            words.append((text, left, top, left + data["width"][i], top + data["height"][i],
+                          float(data["conf"][i])))
+        return words
+
+    def warm_up(self, config: str) -> None:
+        # Каждый вызов стартует заново, прогревать нечего
+        pass
+
+
+class TesserocrBackend(OCRBackend):
+    """libtesseract в процессе: модели загружаются один раз на поток"""
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path: Optional[str] = None) -> None:
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._path = tessdata_path or BACKEND_SETTINGS["tessdata_path"]
+        self._local = threading.local()
+        self._apis = []
+        self._apis_lock = threading.Lock()
+
+    def _get_api(self, lang: str, oem: int) -> Any:
+        """API не потокобезопасен, поэтому у каждого потока свой экземпляр"""
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get((lang, oem))
+        if api is None:
+            kwargs = {"lang": lang, "oem": self._tesserocr.OEM(oem)}
+            if self._path:
+                kwargs["path"] = self._path
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            apis[(lang, oem)] = api
+            with self._apis_lock:
+                self._apis.append(api)
+        return api
+
+    def _prepare(self, image: Any, config: str) -> Any:
+        from PIL import Image
+        lang, psm, oem, variables = parse_tesseract_config(config)
+        api = self._get_api(lang, oem)
+        api.SetPageSegMode(self._tesserocr.PSM(psm))
+        for name, value in variables.items():
+            api.SetVariable(name, value)
+        api.SetImage(Image.fromarray(image))
+        return api
+
+    def recognize(self, image: Any, config: str) -> str:
+        return self._prepare(image, config).GetUTF8Text()
+
+    def recognize_words(self, image: Any, config: str) -> List[Word]:
+        api = self._prepare(image, config)
+        api.Recognize()
+        level = self._tesserocr.RIL.WORD
+        words = []
+        for item in self._tesserocr.iterate_level(api.GetIterator(), level):
+            text = item.GetUTF8Text(level)
+            if not text or not text.strip():
+                continue
+            left, top, right, bottom = item.BoundingBox(level)
+            words.append((text, left, top, right, bottom, float(item.Confidence(level))))
+        return words
+
+    def close(self) -> None:
+        with self._apis_lock:
+            for api in self._apis:
+                api.End()
+            self._apis.clear()
+
+
+def _engine_worker_main(conn: Any, settings: Dict[str, Any]) -> None:
+    """Цикл процесса-движка: получает изображения по каналу, отвечает текстом"""
+    try:
+        engine = TesserocrBackend(settings.get("tessdata_path"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        method, image, config = message
+        try:
+            conn.send(("ok", getattr(engine, method)(image, config)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    engine.close()
+
+
+class _EngineProcess:
+    """Один процесс-движок и его канал"""
+
+    def __init__(self, ctx: Any, index: int) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_engine_worker_main,
+            args=(child_conn, dict(BACKEND_SETTINGS)),
+            daemon=True,
+            name=f"ocr-engine-{index}"
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float) -> None:
+        if not self.conn.poll(timeout):
+            raise RuntimeError("Процесс OCR не запустился")
+        status, payload = self.conn.recv()
+        if status != "ready":
+            raise RuntimeError(payload)
+
+    def call(self, method: str, image: Any, config: str) -> Any:
+        if not self.process.is_alive():
+            raise RuntimeError("Процесс OCR завершился")
+        self.conn.send((method, image, config))
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class PersistentWorkerBackend(OCRBackend):
+    """Пул долгоживущих процессов с инициализированным движком, изображения передаются
+    по каналам. Процесс занят одним запросом, поэтому параллельных вызовов не больше
+    числа процессов; сбой библиотеки не роняет приложение."""
+
+    name = "worker"
+    START_TIMEOUT = 30.0
+
+    def __init__(self, processes: Optional[int] = None) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        count = max(1, processes or BACKEND_SETTINGS["worker_processes"])
+        # Процессы стартуют одновременно: модели загружаются параллельно
+        self._engines = [_EngineProcess(ctx, index) for index in range(count)]
+        try:
+            for engine in self._engines:
+                engine.wait_ready(self.START_TIMEOUT)
+        except (RuntimeError, OSError, EOFError):
+            self.close()
+            raise
+        self.max_parallel = count
+        self._idle: "queue.Queue[_EngineProcess]" = queue.Queue()
+        for engine in self._engines:
+            self._idle.put(engine)
+
+    def _call(self, method: str, image: Any, config: str) -> Any:
+        # Запрос занимает свободный процесс; остальные ждут, пока он освободится
+        engine = self._idle.get()
+        try:
+            return engine.call(method, image, config)
+        finally:
+            self._idle.put(engine)
+
+    def recognize(self, image: Any, config: str) -> str:
+        return self._call("recognize", image, config)
+
+    def recognize_words(self, image: Any, config: str) -> List[Word]:
+        return self._call("recognize_words", image, config)
+
+    def close(self) -> None:
+        for engine in self._engines:
+            engine.close()
+
+
+BACKENDS = {
+    "worker": PersistentWorkerBackend,
+    "tesserocr": TesserocrBackend,
+    "pytesseract": PytesseractBackend,
+}
+
+_backend: Optional[OCRBackend] = None
+_fallback: Optional[OCRBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> OCRBackend:
+    """Выбранный движок; при ошибке инициализации используется pytesseract"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            choice = BACKEND_SETTINGS["backend"]
+            if choice != "auto":
+                order = [choice, "pytesseract"]
+            elif importlib.util.find_spec("tesserocr") is not None:
+                # Пул процессов (изоляция сбоев libtesseract), затем движок в процессе
+                order = ["worker", "tesserocr", "pytesseract"]
+            else:
+                # Без tesserocr процессы-движки запускались бы только чтобы упасть при импорте
+                order = ["pytesseract"]
+            for name in order:
+                try:
+                    _backend = BACKENDS[name]()
+                    break
+                except Exception as e:
+                    print(f"OCR-движок {name} недоступен: {e}")
+            if _backend is None:
+                raise RuntimeError("Нет доступного OCR-движка")
+        return _backend
+
+
+def get_fallback_backend() -> OCRBackend:
+    """Резервный движок на pytesseract"""
+    global _fallback
+    with _backend_lock:
+        if _fallback is None:
+            _fallback = PytesseractBackend()
+        return _fallback
+
+
+def recognize(image: Any, config: str) -> str:
+    """Распознавание через текущий движок с откатом на pytesseract"""
+    backend = get_backend()
+    if isinstance(backend, PytesseractBackend):
+        return backend.recognize(image, config)
+    try:
+        return backend.recognize(image, config)
+    except ENGINE_ERRORS as e:
+        print(f"Ошибка движка {backend.name}, используется pytesseract: {e}")
+        return get_fallback_backend().recognize(image, config)
+
+
+def recognize_words(image: Any, config: str) -> List[Word]:
+    """Слова с рамками через текущий движок с откатом на pytesseract"""
+    backend = get_backend()
+    if isinstance(backend, PytesseractBackend):
+        return backend.recognize_words(image, config)
+    try:
+        return backend.recognize_words(image, config)
+    except ENGINE_ERRORS as e:
+        print(f"Ошибка движка {backend.name}, используется pytesseract: {e}")
+        return get_fallback_backend().recognize_words(image, config)
+
+
+def warm_up_async(config: str) -> threading.Thread:
+    """Фоновый прогрев движка при старте приложения"""
+    def run() -> None:
+        try:
+            get_backend().warm_up(config)
+        except Exception as e:
+            print(f"Не удалось прогреть OCR-движок: {e}")
+
+    thread = threading.Thread(target=run, name="ocr-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown() -> None:
+    """Освобождение ресурсов движков"""
+    global _backend, _fallback
+    with _backend_lock:
+        for backend in (_backend, _fallback):
+            if backend is not None:
+                backend.close()
+        _backend = _fallback = None
@@ -0,0 +1,168 @@
+# ocr_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class OCRCache:
+    """Постоянный кэш результатов OCR с LRU-вытеснением на диске"""
+
+    DEFAULT_PATH = os.path.join("cache", "ocr_cache.sqlite")
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    # Время обращения копится в памяти и пишется одной транзакцией при put/close
+    # или когда накопилось столько ключей: чтение из кэша не фиксирует запись на диск
+    ACCESS_FLUSH_SIZE = 256
+
+    CREATE_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS OcrResults (
+            key TEXT PRIMARY KEY,
+            raw_text TEXT NOT NULL,
+            parsed TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}  # Ключ -> время последнего чтения, еще не записанное
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute(self.CREATE_TABLE_SQL)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_last_access ON OcrResults(last_access)"
+        )
+        self.connection.commit()
+
+    #region Keys
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """Хэш содержимого исходного изображения"""
+        return hashlib.sha256(data).hexdigest()
+
+    @classmethod
+    def hash_file(cls, path: str) -> str:
+        """Хэш файла изображения без декодирования"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(source_hash: str, rect: Optional[Tuple[int, int, int, int]],
+                 params: Dict[str, Any], config: str) -> str:
+        """Ключ кэша: исходник + область + параметры предобработки + конфиг Tesseract"""
+        payload = json.dumps(
+            [source_hash, list(rect) if rect else None, params, config],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    #endregion
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Возвращает (текст, распознанные данные) или None"""
+        with self._lock:
+            try:
+                row = self.connection.execute(
+                    "SELECT raw_text, parsed FROM OcrResults WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._accessed[key] = time.time()
+                if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                    self._flush_access()
+                    self.connection.commit()
+                return row[0], json.loads(row[1])
+            except (sqlite3.Error, ValueError) as e:
+                print(f"Ошибка чтения кэша OCR: {e}")
+                return None
+
+    def put(self, key: str, raw_text: str, parsed: List[Dict[str, Any]]) -> None:
+        """Сохраняет результат и вытесняет давно не использованные записи"""
+        parsed_json = json.dumps(parsed, ensure_ascii=False)
+        size = len(raw_text.encode("utf-8")) + len(parsed_json.encode("utf-8"))
+        with self._lock:
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO OcrResults (key, raw_text, parsed, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, raw_text, parsed_json, size, time.time())
+                )
+                # Вытеснение учитывает и еще не записанные обращения
+                self._flush_access()
+                self._evict()
+                self.connection.commit()
+            except sqlite3.Error as e:
+                print(f"Ошибка записи кэша OCR: {e}")
+
+    def _flush_access(self) -> None:
+        """Запись накопленных времен обращения в текущей транзакции"""
+        if not self._accessed:
+            return
+        self.connection.executemany(
+            "UPDATE OcrResults SET last_access = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()]
+        )
+        self._accessed.clear()
+
+    def _evict(self) -> None:
+        """Удаление самых старых записей при превышении лимита размера"""
+        total = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM OcrResults"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM OcrResults ORDER BY last_access"
+        ).fetchall():
+            self.connection.execute("DELETE FROM OcrResults WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        with self._lock:
+            self._accessed.clear()
+            self.connection.execute("DELETE FROM OcrResults")
+            self.connection.commit()
+
+    def close(self) -> None:
+        """Закрытие соединения с кэшем"""
+        try:
+            with self._lock:
+                self._flush_access()
+                self.connection.commit()
+            self.connection.close()
+        except Exception as e:
+            print(f"Ошибка закрытия кэша OCR: {str(e)}")
+
+
+_default_cache: Optional[OCRCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> OCRCache:
+    """Общий экземпляр кэша для процесса"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OCRCache()
+        return _default_cache
+
+
+def close_default_cache() -> None:
+    """Закрытие общего кэша при выходе: записываются накопленные времена обращения"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is not None:
+            _default_cache.close()
+            _default_cache = None
@@ -0,0 +1,125 @@
+# ocr_worker.py
+import os
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class OCRJob:
+    """Задача распознавания, выполняемая в фоне"""
+
+    def __init__(self, func: Callable[..., Any], args: tuple,
+                 on_done: Callable[[Any], None],
+                 on_error: Optional[Callable[[Exception], None]] = None) -> None:
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future: Optional[Future] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Отмена задачи: еще не начатая не запустится, результат начатой будет отброшен"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class OCRWorker:
+    """Пул фоновых потоков OCR с доставкой результатов в главный цикл Tk"""
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or os.cpu_count() or 2,
+            thread_name_prefix="ocr"
+        )
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._outstanding = 0
+        self._root: Optional[tk.Misc] = None
+        self._polling = False
+
+    def submit(self, widget: tk.Misc, func: Callable[..., Any], *args: Any,
+               on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None) -> OCRJob:
+        """Ставит задачу в очередь; колбэки вызываются в потоке Tk"""
+        job = OCRJob(func, args, on_done, on_error)
+        self._root = widget.nametowidget(".")
+        self._outstanding += 1
+        job.future = self._executor.submit(self._run, job)
+        job.future.add_done_callback(self._on_future_done)
+        self._schedule_poll()
+        return job
+
+    def _run(self, job: OCRJob) -> None:
+        """Выполнение в рабочем потоке; Tk здесь не трогаем"""
+        if job.cancelled:
+            self._results.put((job, None, None))
+            return
+        try:
+            self._results.put((job, job.func(*job.args), None))
+        except Exception as e:
+            self._results.put((job, None, e))
+
+    def _on_future_done(self, future: Future) -> None:
+        # Отмененная до запуска задача не попадет в _run
+        if future.cancelled():
+            self._results.put((None, None, None))
+
+    def _schedule_poll(self) -> None:
+        if not self._polling and self._root is not None:
+            self._polling = True
+            self._root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self) -> None:
+        """Разбор готовых результатов в главном цикле Tk"""
+        self._polling = False
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if job is None or job.cancelled:
+                continue
+            try:
+                if error is not None:
+                    if job.on_error:
+                        job.on_error(error)
+                    else:
+                        print(f"Ошибка фоновой задачи OCR: {error}")
+                else:
+                    job.on_done(result)
+            except tk.TclError:
+                pass  # Окно-получатель уже закрыто
+        if self._outstanding > 0:
+            try:
+                self._schedule_poll()
+            except tk.TclError:
+                self._polling = False
+
+    @property
+    def busy(self) -> int:
+        """Число незавершенных задач"""
+        return self._outstanding
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_worker: Optional[OCRWorker] = None
+
+
+def get_default_worker() -> OCRWorker:
+    """Общий фоновый исполнитель OCR приложения"""
+    global _default_worker
+    if _default_worker is None:
+        _default_worker = OCRWorker()
+    return _default_worker
@@ -0,0 +1,199 @@
+# roster_import.py
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from database import DatabaseHandler
+
+ROSTER_FORMATS = (".xlsx", ".xlsm", ".csv")
+HEADER_SCAN_ROWS = 10  # В скольких первых строках искать заголовок
+MAX_REPORTED_ERRORS = 50
+
+# Целое в тексте: цифры подряд (допускается ".0" от выгрузки float) или группы
+# по три цифры через один и тот же разделитель тысяч: пробел, неразрывные пробелы,
+# запятая или апостроф. Точка как разделитель тысяч не принимается: "1.200"
+# неотличимо от дробного 1.2
+COUNT_PLAIN = re.compile(r"(\d+)(?:\.0+)?")
+COUNT_GROUPED = re.compile(r"\d{1,3}([ \u00a0\u202f,'])\d{3}(?:\1\d{3})*")
+
+# Допустимые заголовки колонок (без учета регистра) для каждого поля
+HEADER_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "username": ("username", "name", "nickname", "ник", "никнейм", "игрок", "имя", "имя игрока"),
+    "urank": ("urank", "rank", "ранг", "звание"),
+    "kills": ("kills", "убийства", "киллы", "у"),
+    "deads": ("deads", "deaths", "смерти", "с"),
+}
+REQUIRED_FIELDS = ("username", "kills", "deads")
+
+
+@dataclass
+class RosterReport:
+    """Итог загрузки: сколько строк прочитано, добавлено, обновлено, и ошибки по строкам"""
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    error_count: int = 0
+
+    def add_error(self, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+    def summary(self) -> str:
+        lines = [f"Прочитано строк: {self.read}, добавлено: {self.inserted}, "
+                 f"обновлено: {self.updated}, ошибок: {self.error_count}"]
+        lines += [f"  строка {row}: {message}" for row, message in self.errors]
+        if self.error_count > len(self.errors):
+            lines.append(f"  ... и еще {self.error_count - len(self.errors)}")
+        return "\n".join(lines)
+
+
+def _iter_xlsx(path: str, sheet: Optional[str]) -> Iterator[Sequence[Any]]:
+    """Строки листа в потоковом режиме read-only (ячейки не держатся в памяти)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise RuntimeError("Для чтения Excel нужен пакет openpyxl (pip install openpyxl)") from e
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = workbook[sheet] if sheet else workbook.worksheets[0]
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_csv(path: str) -> Iterator[Sequence[Any]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def iter_sheet_rows(path: str, sheet: Optional[str] = None) -> Iterator[Sequence[Any]]:
+    """Строки таблицы состава (.xlsx или .csv)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ROSTER_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат: {ext or path}")
+    if ext == ".csv":
+        return _iter_csv(path)
+    return _iter_xlsx(path, sheet)
+
+
+def map_header(row: Sequence[Any]) -> Dict[str, int]:
+    """Поле -> номер колонки по строке заголовка"""
+    mapping: Dict[str, int] = {}
+    for index, cell in enumerate(row):
+        title = str(cell).strip().lower() if cell is not None else ""
+        for field_name, aliases in HEADER_ALIASES.items():
+            if title in aliases and field_name not in mapping:
+                mapping[field_name] = index
+    return mapping
+
+
+def parse_count(value: Any) -> int:
+    """Неотрицательное целое из ячейки (число, '1200', '1 200', '1,200' или 12.0).
+    Дробные и неоднозначные значения ('1.5', '1,5', '1.200', '1 20') отклоняются."""
+    if isinstance(value, bool):
+        raise ValueError("логическое значение вместо числа")
+    if isinstance(value, (int, float)):
+        if value != int(value):
+            raise ValueError(f"дробное число {value}")
+        number = int(value)
+    else:
+        text = str(value if value is not None else "").strip()
+        if not text:
+            raise ValueError("пустое значение")
+        plain = COUNT_PLAIN.fullmatch(text)
+        if plain:
+            number = int(plain.group(1))
+        elif COUNT_GROUPED.fullmatch(text):
+            number = int(re.sub(r"\D", "", text))
+        elif text.startswith("-"):
+            raise ValueError(f"отрицательное число {text}")
+        else:
+            raise ValueError(f"не целое число: {value!r}")
+    if number < 0:
+        raise ValueError(f"отрицательное число {number}")
+    return number
+
+
+def read_roster(rows: Iterator[Sequence[Any]], report: RosterReport) -> List[Tuple[str, str, int, int]]:
+    """Проверенные строки (username, urank, kills, deads); ошибочные попадают в отчет"""
+    mapping: Dict[str, int] = {}
+    row_number = 0
+    for row_number, row in enumerate(rows, 1):
+        mapping = map_header(row)
+        if all(name in mapping for name in REQUIRED_FIELDS):
+            break
+        if row_number >= HEADER_SCAN_ROWS:
+            break
+    missing = [name for name in REQUIRED_FIELDS if name not in mapping]
+    if missing:
+        raise ValueError(f"Не найдены колонки: {', '.join(missing)}")
+
+    result: List[Tuple[str, str, int, int]] = []
+    rank_index = mapping.get("urank")
+    for row_number, row in enumerate(rows, row_number + 1):
+        if not any(cell not in (None, "") for cell in row):
+            continue  # Пустые строки между блоками таблицы
+        report.read += 1
+        try:
+            cells = {name: row[index] if index < len(row) else None for name, index in mapping.items()}
+            username = str(cells["username"] or "").strip()
+            if not username:
+                raise ValueError("пустое имя")
+            rank = str(cells["urank"]).strip() if rank_index is not None and cells["urank"] not in (None, "") else "-"
+            result.append((username, rank, parse_count(cells["kills"]), parse_count(cells["deads"])))
+        except ValueError as e:
+            report.add_error(row_number, str(e))
+    return result
+
+
+def import_roster_file(db: DatabaseHandler, path: str, sheet: Optional[str] = None,
+                       update_existing: bool = True) -> RosterReport:
+    """Загрузка файла состава в базу одной транзакцией"""
+    report = RosterReport()
+    rows = read_roster(iter(iter_sheet_rows(path, sheet)), report)
+    report.inserted, report.updated = db.import_roster(
+        rows, update_existing, f"состав: {os.path.basename(path)}"
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Загрузка состава из командной строки"""
+    from batch_import import resolve_db_path
+
+    parser = argparse.ArgumentParser(description="Загрузка состава из Excel или CSV в базу")
+    parser.add_argument("source", help="Файл .xlsx или .csv")
+    parser.add_argument("database", help="Имя базы в data/ (например war.db)")
+    parser.add_argument("--sheet", default=None, help="Имя листа (по умолчанию первый)")
+    parser.add_argument("--no-update", action="store_true", help="Только добавлять новых игроков")
+    args = parser.parse_args(argv)
+
+    db = DatabaseHandler(resolve_db_path(args.database))
+    started = time.perf_counter()
+    try:
+        report = import_roster_file(db, args.source, args.sheet, not args.no_update)
+    except (ValueError, RuntimeError, OSError, KeyError) as e:
+        print(f"Ошибка загрузки: {e}")
+        return 1
+    finally:
+        db.close()
+    print(report.summary())
+    print(f"Время: {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# segmentation.py
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+
+@dataclass
+class RowStrip:
+    """Полоса одной строки таблицы с границами в пикселях обработанного изображения"""
+    top: int
+    bottom: int
+    image: np.ndarray
+
+
+class RowSegmenter:
+    """Разбиение таблицы на строки по горизонтальной проекции"""
+
+    INK_THRESHOLD = 128      # Пиксели темнее считаются текстом (текст темный на светлом фоне)
+    MIN_INK_RATIO = 0.002    # Доля текстовых пикселей, при которой строка изображения не пустая
+    MIN_GAP = 6              # Разрывы меньше этого склеиваются (межбуквенные просветы)
+    MIN_HEIGHT = 12          # Полосы ниже считаются шумом
+    PADDING = 4              # Поля вокруг полосы для Tesseract
+
+    @classmethod
+    def projection(cls, image: np.ndarray) -> np.ndarray:
+        """Количество текстовых пикселей в каждой строке изображения"""
+        return np.count_nonzero(image < cls.INK_THRESHOLD, axis=1)
+
+    @staticmethod
+    def row_runs(filled: np.ndarray) -> List[tuple]:
+        """Непрерывные участки заполненных строк изображения [(top, bottom)]"""
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], filled.view(np.int8), [0]))))
+        return [tuple(run) for run in edges.reshape(-1, 2).tolist()]
+
+    @classmethod
+    def find_rows(cls, image: np.ndarray) -> List[tuple]:
+        """Границы (top, bottom) строк текста"""
+        profile = cls.projection(image)
+        min_ink = max(1, int(image.shape[1] * cls.MIN_INK_RATIO))
+
+        rows: List[list] = []
+        for top, bottom in cls.row_runs(profile >= min_ink):
+            if rows and top - rows[-1][1] < cls.MIN_GAP:
+                rows[-1][1] = bottom
+            else:
+                rows.append([top, bottom])
+
+        height = image.shape[0]
+        return [
+            (max(0, top - cls.PADDING), min(height, bottom + cls.PADDING))
+            for top, bottom in rows
+            if bottom - top >= cls.MIN_HEIGHT
+        ]
+
+    @classmethod
+    def split(cls, image: np.ndarray) -> List[RowStrip]:
+        """Полосы строк; изображения полос являются срезами исходного массива без копирования"""
+        return [RowStrip(top, bottom, image[top:bottom]) for top, bottom in cls.find_rows(image)]
@@ -3,7 +3,9 @@ import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 from database import DatabaseHandler
-from gui import ApplicationGUI
+from db_catalog import CatalogEntry, DatabaseCatalog
+from gui import ApplicationGUI, LeaderboardDialog
+from ocr_worker import get_default_worker
 
 class CreateDatabaseDialog(tk.Toplevel):
     """Диалог создания новой базы данных"""
@@ -65,7 +67,10 @@ class StartWindow(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Менеджер таблиц")
-        self.geometry("600x400")
+        self.geometry("900x400")
+        self.catalog = DatabaseCatalog()
+        self._catalog_job = None
+        self._catalog_pending = False  # Сверка запрошена, пока шла предыдущая
         self._setup_ui()
         self.refresh_table_list()
         self.current_app_window = None
@@ -94,7 +99,15 @@ class StartWindow(tk.Tk):
         list_frame = tk.Frame(self, width=200, background="#383838")
         list_frame.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
         
-        self.table_list = ttk.Treeview(list_frame, show="tree", selectmode="browse", style="Custom.Treeview")
+        columns = ("players", "kills", "last_import", "version")
+        self.table_list = ttk.Treeview(list_frame, columns=columns, show="tree headings",
+                                       selectmode="browse", style="Custom.Treeview")
+        self.table_list.heading("#0", text="База")
+        self.table_list.column("#0", width=200)
+        for col, text, width in zip(columns, ("Игроков", "Убийств", "Последний импорт", "Схема"),
+                                    (70, 80, 140, 50)):
+            self.table_list.heading(col, text=text)
+            self.table_list.column(col, width=width, anchor="e" if col != "last_import" else "w")
         self.table_list.pack(fill=tk.BOTH, expand=True)
         self.table_list.bind("<Double-1>", self._on_table_selected)
         
@@ -113,19 +126,64 @@ class StartWindow(tk.Tk):
         )
         self.create_btn.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
+        self.leaderboard_btn = tk.Button(
+            center_frame,
+            text="Общий рейтинг",
+            command=self.show_leaderboard,
+            font=("Arial", 12),
+            bg="#3e3e3e",
+            fg="#ffffff"
+        )
+        self.leaderboard_btn.place(relx=0.5, rely=0.65, anchor=tk.CENTER)
+
         list_frame.configure(bg="#120f17")
         center_frame.configure(bg="#120f17")
         self.configure(bg="#120f17")
     
     def refresh_table_list(self):
-        """Обновление списка доступных таблиц"""
-        self.table_list.delete(*self.table_list.get_children())
-        if not os.path.exists("data"):
+        """Обновление списка доступных таблиц: сразу из кэша каталога, затем фоновая сверка"""
+        self._show_catalog(self.catalog.cached())
+        self._refresh_catalog()
+
+    def _refresh_catalog(self):
+        if self._catalog_job is not None:
+            self._catalog_pending = True
             return
-        
-        for fname in sorted(os.listdir("data")):
-            if fname.endswith(".db"):
-                self.table_list.insert("", "end", text=fname, values=os.path.join("data/", fname))
+        self._catalog_pending = False
+        self._catalog_job = get_default_worker().submit(
+            self, self.catalog.refresh, on_done=self._on_catalog_refreshed,
+            on_error=self._on_catalog_error
+        )
+
+    def _on_catalog_refreshed(self, entries):
+        self._catalog_job = None
+        self._show_catalog(entries)
+        if self._catalog_pending:
+            self._refresh_catalog()
+
+    def _on_catalog_error(self, error):
+        self._catalog_job = None
+        print(f"Ошибка обновления каталога баз: {error}")
+        if self._catalog_pending:
+            self._refresh_catalog()
+
+    @staticmethod
+    def _catalog_values(entry: CatalogEntry) -> tuple:
+        if entry.error:
+            return ("ошибка", "", entry.error, "")
+        if entry.players is None:
+            return ("…", "…", "", "")
+        return (entry.players, entry.kills, entry.last_import or "-", entry.schema_version)
+
+    def _show_catalog(self, entries):
+        """Строки списка по путям баз; выделение сохраняется"""
+        selected = self.table_list.selection()
+        self.table_list.delete(*self.table_list.get_children())
+        for entry in entries:
+            self.table_list.insert("", "end", iid=entry.path, text=os.path.basename(entry.path),
+                                   values=self._catalog_values(entry))
+        if selected and self.table_list.exists(selected[0]):
+            self.table_list.selection_set(selected[0])
     
     def _on_table_selected(self, event):
         """Обработчик выбора таблицы"""
@@ -133,12 +191,19 @@ class StartWindow(tk.Tk):
         if not selected:
             return
         
-        db_path = self.table_list.item(selected[0], "values")[0]
-        self.open_database(db_path)
+        self.open_database(selected[0])
     
     def show_create_dialog(self):
         """Показать диалог создания базы"""
         CreateDatabaseDialog(self)
+
+    def show_leaderboard(self):
+        """Рейтинг по всем базам data/ без открытия каждой"""
+        paths = self.catalog.list_paths()
+        if not paths:
+            messagebox.showinfo("Рейтинг", "В папке data нет баз")
+            return
+        LeaderboardDialog(self, paths)
     
     def open_database(self, db_path: str):
         try:
@@ -169,18 +234,20 @@ class StartWindow(tk.Tk):
 class ApplicationWindow(tk.Toplevel):
     """Окно работы с базой данных"""
     def __init__(self, parent, db_path):
+        # База открывается до создания окна: при ошибке миграции пустое окно не остается
+        db = DatabaseHandler(db_path)
         super().__init__(parent)
         self.parent = parent
         self.db_path = db_path
-        self.db = DatabaseHandler(db_path)
+        self.db = db
         self.app_gui = ApplicationGUI(self, self.db)
         self.protocol("WM_DELETE_WINDOW", self.close_database)
 
     def close_database(self):
         """Корректное закрытие базы данных"""
         try:
-            self.db.close()
-            self.destroy()
+            # Закрытие базы, запись метрик сессии и уничтожение окна - в ApplicationGUI.on_close
+            self.app_gui.on_close()
             self.parent.show_self()  # Показываем стартовое окно
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
\ No newline at end of file
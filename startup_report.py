@@ -0,0 +1,109 @@
+# startup_report.py
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+# Модули, которые не должны загружаться до показа стартового окна
+HEAVY_MODULES = ("cv2", "numpy", "PIL", "pytesseract", "tesserocr", "openpyxl")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+@dataclass
+class ImportTiming:
+    """Строка вывода -X importtime: собственное и накопленное время модуля, мкс"""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Разбор stderr интерпретатора, запущенного с -X importtime"""
+    timings = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            # Вложенность обозначается отступом в два пробела после разделителя
+            depth = max(0, (len(match.group(3)) - 1) // 2)
+            timings.append(ImportTiming(match.group(4), int(match.group(1)), int(match.group(2)), depth))
+    return timings
+
+
+def measure_imports(module: str) -> List[ImportTiming]:
+    """Импорт модуля в отдельном процессе (холодный кэш модулей, но не диска)"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=root
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился с ошибкой:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def heavy_modules(timings: List[ImportTiming]) -> List[ImportTiming]:
+    """Загруженные тяжелые пакеты верхнего уровня"""
+    return [t for t in timings if t.module in HEAVY_MODULES]
+
+
+def total_us(module: str, timings: List[ImportTiming]) -> int:
+    """Накопленное время импорта самого модуля"""
+    return next((t.cumulative_us for t in timings if t.module == module and t.depth == 0), 0)
+
+
+def format_report(module: str, timings: List[ImportTiming], top: int) -> List[str]:
+    total = total_us(module, timings)
+    lines = [f"== import {module}: {total / 1000:.1f} мс, модулей {len(timings)}"]
+    heavy = heavy_modules(timings)
+    if heavy:
+        lines.append("   тяжелые пакеты: " + ", ".join(
+            f"{t.module} {t.cumulative_us / 1000:.0f} мс" for t in heavy))
+    lines.append(f"   {'накоп., мс':>11} {'собств., мс':>12}  модуль")
+    for t in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        lines.append(f"   {t.cumulative_us / 1000:11.1f} {t.self_us / 1000:12.1f}  {'  ' * t.depth}{t.module}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Разбор времени импорта модулей при запуске")
+    parser.add_argument("modules", nargs="*", default=["start_window", "gui", "myOCR_test"],
+                        help="Модули для замера (по умолчанию цепочка запуска и OCR)")
+    parser.add_argument("--top", type=int, default=15, help="Сколько самых долгих импортов показать")
+    parser.add_argument("--repeat", type=int, default=3, help="Замеров на модуль; берется лучший")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Код возврата 1, если импорт start_window дольше или тянет тяжелые пакеты")
+    parser.add_argument("--json", default=None, help="Сохранить замеры в JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for module in args.modules:
+        runs = [measure_imports(module) for _ in range(max(1, args.repeat))]
+        # Лучший прогон меньше всего зависит от фоновой нагрузки
+        timings = min(runs, key=lambda run: sum(t.self_us for t in run))
+        results[module] = timings
+        print("\n".join(format_report(module, timings, args.top)))
+
+        if args.budget_ms is not None and module == "start_window":
+            total_ms = total_us(module, timings) / 1000
+            heavy = heavy_modules(timings)
+            if total_ms > args.budget_ms or heavy:
+                print(f"Запуск превышает бюджет {args.budget_ms:.0f} мс "
+                      f"({total_ms:.1f} мс, тяжелые пакеты: {len(heavy)})")
+                failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({module: [asdict(t) for t in timings] for module, timings in results.items()},
+                      f, ensure_ascii=False, indent=1)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
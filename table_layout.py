@@ -0,0 +1,158 @@
+# table_layout.py
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+
+
+class TableLayoutParser:
+    """Разбор таблицы результатов по рамкам слов Tesseract.
+
+    Строки и колонки определяются по геометрии один раз на таблицу: строки - по
+    вертикальным центрам слов, колонки - по просветам в горизонтальной проекции
+    всех слов. Затем ячейки сопоставляются полям по их порядку."""
+
+    MIN_CONFIDENCE = 0.0     # Слова с меньшей уверенностью отбрасываются (-1 - не слово)
+    ROW_GAP_RATIO = 0.6      # Новая строка, если центр ниже предыдущего на долю высоты слова
+    COLUMN_GAP_RATIO = 1.0   # Минимальный просвет между колонками в высотах слова
+    NUMERIC_RATIO = 0.6      # Доля числовых ячеек, при которой колонка считается числовой
+    NUMERIC_FIELDS = ("kills", "deaths", "treasury")  # Числовые колонки справа от имени
+
+    DIGITS = re.compile(r"\d+")
+
+    @classmethod
+    def _to_arrays(cls, words: Sequence[tuple]) -> Tuple[List[str], np.ndarray]:
+        """Тексты и матрица рамок [left, top, right, bottom, conf] уверенно распознанных слов"""
+        kept = [w for w in words if w[5] >= cls.MIN_CONFIDENCE and w[0].strip()]
+        texts = [w[0].strip() for w in kept]
+        boxes = np.array([w[1:6] for w in kept], dtype=np.float64).reshape(-1, 5)
+        return texts, boxes
+
+    @classmethod
+    def assign_rows(cls, boxes: np.ndarray, word_height: float) -> np.ndarray:
+        """Номер строки для каждого слова"""
+        centers = (boxes[:, 1] + boxes[:, 3]) / 2
+        order = np.argsort(centers, kind="stable")
+        breaks = np.diff(centers[order]) > word_height * cls.ROW_GAP_RATIO
+        rows = np.empty(len(boxes), dtype=np.int64)
+        rows[order] = np.concatenate(([0], np.cumsum(breaks)))
+        return rows
+
+    @classmethod
+    def find_columns(cls, boxes: np.ndarray, word_height: float) -> np.ndarray:
+        """Левые границы колонок по просветам в проекции слов на ось X"""
+        left = boxes[:, 0].astype(np.int64)
+        right = boxes[:, 2].astype(np.int64)
+        width = int(right.max()) + 2
+        coverage = np.zeros(width, dtype=np.int64)
+        np.add.at(coverage, left, 1)
+        np.add.at(coverage, right, -1)
+        filled = np.cumsum(coverage) > 0
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], filled.view(np.int8), [0]))))
+        runs = edges.reshape(-1, 2)
+        min_gap = word_height * cls.COLUMN_GAP_RATIO
+        starts = [runs[0, 0]]
+        for (_, prev_end), (start, _) in zip(runs[:-1], runs[1:]):
+            if start - prev_end >= min_gap:
+                starts.append(start)
+        return np.array(starts, dtype=np.int64)
+
+    @classmethod
+    def build_cells(cls, texts: List[str], boxes: np.ndarray
+                    ) -> Tuple[List[List[Optional[str]]], List[Tuple[int, int]], List[float]]:
+        """Сетка ячеек [строка][колонка], вертикальные границы и уверенность строк"""
+        word_height = float(np.median(boxes[:, 3] - boxes[:, 1]))
+        rows = cls.assign_rows(boxes, word_height)
+        column_starts = cls.find_columns(boxes, word_height)
+        columns = np.searchsorted(column_starts, boxes[:, 0], side="right") - 1
+
+        n_rows, n_cols = int(rows.max()) + 1, len(column_starts)
+        grid: List[List[Optional[str]]] = [[None] * n_cols for _ in range(n_rows)]
+        # Одна сортировка: строка, колонка, затем слева направо внутри ячейки
+        for i in np.lexsort((boxes[:, 0], columns, rows)).tolist():
+            row, col = rows[i], columns[i]
+            cell = grid[row][col]
+            grid[row][col] = texts[i] if cell is None else f"{cell} {texts[i]}"
+
+        tops = np.full(n_rows, np.inf)
+        bottoms = np.zeros(n_rows)
+        conf_sum = np.zeros(n_rows)
+        np.minimum.at(tops, rows, boxes[:, 1])
+        np.maximum.at(bottoms, rows, boxes[:, 3])
+        np.add.at(conf_sum, rows, boxes[:, 4])
+        confidence = conf_sum / np.bincount(rows, minlength=n_rows)
+        bounds = list(zip(tops.astype(int).tolist(), bottoms.astype(int).tolist()))
+        return grid, bounds, confidence.tolist()
+
+    @classmethod
+    def parse_number(cls, cell: Optional[str]) -> Optional[int]:
+        """Число из ячейки; разделители разрядов (пробел, точка, запятая) игнорируются"""
+        if not cell:
+            return None
+        digits = "".join(cls.DIGITS.findall(cell))
+        return int(digits) if digits else None
+
+    @classmethod
+    def column_roles(cls, grid: List[List[Optional[str]]]) -> Dict[str, int]:
+        """Назначение колонок: имя - самая текстовая, числовые справа от нее - по порядку"""
+        n_cols = len(grid[0]) if grid else 0
+        numeric = np.zeros(n_cols)
+        textual = np.zeros(n_cols)
+        for row in grid:
+            for col, cell in enumerate(row):
+                if cell is None:
+                    continue
+                stripped = cell.replace(" ", "").replace(",", "").replace(".", "")
+                if stripped.isdigit():
+                    numeric[col] += 1
+                else:
+                    textual[col] += 1
+        total = numeric + textual
+        is_numeric = numeric >= np.maximum(total, 1) * cls.NUMERIC_RATIO
+        if is_numeric.all():
+            return {}
+        name_col = int(np.argmax(np.where(is_numeric, -1, textual)))
+        roles = {"name": name_col}
+        numeric_cols = [c for c in range(name_col + 1, n_cols) if is_numeric[c]]
+        roles.update(zip(cls.NUMERIC_FIELDS, numeric_cols))
+        return roles
+
+    @classmethod
+    def parse(cls, words: Sequence[tuple]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Разбор слов (текст, left, top, right, bottom, conf); возвращает (текст по строкам, игроки).
+        Границы строк bounds - в пикселях изображения, на котором найдены слова."""
+        with metrics.span("parse.layout", words=len(words)) as span:
+            text, data = cls._parse(words)
+            span.set(rows=len(data))
+            return text, data
+
+    @classmethod
+    def _parse(cls, words: Sequence[tuple]) -> Tuple[str, List[Dict[str, Any]]]:
+        texts, boxes = cls._to_arrays(words)
+        if not texts:
+            return "", []
+        grid, bounds, confidence = cls.build_cells(texts, boxes)
+        text = "\n".join(" ".join(cell for cell in row if cell) for row in grid)
+        roles = cls.column_roles(grid)
+        if "name" not in roles or "kills" not in roles or "deaths" not in roles:
+            return text, []
+
+        data = []
+        for row, row_bounds, row_conf in zip(grid, bounds, confidence):
+            name = row[roles["name"]]
+            kills = cls.parse_number(row[roles["kills"]])
+            deaths = cls.parse_number(row[roles["deaths"]])
+            if not name or kills is None or deaths is None:
+                continue  # Заголовок или строка без обязательных ячеек
+            treasury = cls.parse_number(row[roles["treasury"]]) if "treasury" in roles else None
+            data.append({
+                'name': name,
+                'kills': kills,
+                'deaths': deaths,
+                'treasury': treasury or 0,
+                'confidence': round(row_conf, 1),
+                'bounds': list(row_bounds),
+            })
+        return text, data
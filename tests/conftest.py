@@ -0,0 +1,23 @@
+# conftest.py
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseHandler  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Пустая база с примененными миграциями"""
+    handler = DatabaseHandler(str(tmp_path / "test.db"))
+    yield handler
+    handler.close()
+
+
+def user_totals(db: DatabaseHandler) -> dict:
+    """Итоги игроков {ник: (убийства, смерти)}"""
+    return {name: (kills, deads) for _, name, _, kills, deads, _, _ in db.fetch_all_users()}
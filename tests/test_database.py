@@ -0,0 +1,135 @@
+# test_database.py
+import sqlite3
+
+from conftest import user_totals
+from database import DatabaseHandler
+
+
+def make_baseline_db(path: str) -> None:
+    """База в исходной схеме: одна таблица Users без user_version"""
+    connection = sqlite3.connect(path)
+    connection.execute(DatabaseHandler.CREATE_TABLE_SQL)
+    connection.executemany(
+        "INSERT INTO Users (username, urank, kills, deads, kills_deads, to_main, ocr_nickname) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            ("alpha", "General", 10, 5, 2.0, True, "alpha"),
+            ("beta", "-", 3, 6, 0.5, False, "alpha"),  # Повтор OCR-ника допустим
+            ("gamma", "Major", 0, 0, 0.0, False, None),
+        ]
+    )
+    connection.commit()
+    connection.close()
+
+
+# region Миграции
+def test_baseline_migrates_to_latest_with_data(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    make_baseline_db(path)
+
+    db = DatabaseHandler(path)
+    try:
+        assert db.schema_version() == DatabaseHandler.latest_schema_version()
+        assert db.fetch_all_users() == [
+            (1, "alpha", "General", 10, 5, 2.0, 1),
+            (2, "beta", "-", 3, 6, 0.5, 0),
+            (3, "gamma", "Major", 0, 0, 0.0, 0),
+        ]
+        nicknames = db.connection.execute("SELECT ocr_nickname FROM Users ORDER BY id").fetchall()
+        assert nicknames == [("alpha",), ("alpha",), (None,)]
+        columns = {row[1] for row in db.connection.execute("PRAGMA table_info(Imports)")}
+        assert {"kind", "source_hash"} <= columns
+    finally:
+        db.close()
+
+
+def test_reopen_does_not_reapply_migrations(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    make_baseline_db(path)
+    DatabaseHandler(path).close()
+
+    db = DatabaseHandler(path)
+    try:
+        assert db.schema_version() == DatabaseHandler.latest_schema_version()
+        assert len(db.fetch_all_users()) == 3
+    finally:
+        db.close()
+# endregion
+
+
+# region Слияние импортов
+def test_merge_players_sums_repeats_and_matches_existing(db):
+    db.import_roster([("alpha", "General", 10, 5)])
+
+    inserted, updated = db.merge_players([
+        {"name": "alpha", "kills": 2, "deaths": 1},
+        {"name": "alpha", "kills": 3, "deaths": 0},
+        {"name": "newbie", "kills": 1, "deaths": 1},
+    ], "shot.png")
+
+    assert (inserted, updated) == (1, 1)
+    assert user_totals(db) == {"alpha": (15, 6), "newbie": (1, 1)}
+    history = db.connection.execute(
+        "SELECT ocr_name, kills, deaths, created FROM MatchResults WHERE import_id = ? ORDER BY ocr_name",
+        (db.last_import_id,)
+    ).fetchall()
+    assert history == [("alpha", 5, 1, 0), ("newbie", 1, 1, 1)]
+
+
+def test_merge_players_skips_already_imported_hash(db):
+    players = [{"name": "alpha", "kills": 4, "deaths": 2}]
+    assert db.merge_players(players, "shot.png", "hash-1") == (1, 0)
+    assert db.merge_players(players, "shot-copy.png", "hash-1") == (0, 0)
+
+    assert user_totals(db) == {"alpha": (4, 2)}
+    assert db.imported_hashes() == {"hash-1"}
+    assert len(db.fetch_imports()) == 1
+
+
+def test_merge_players_records_empty_file_hash(db):
+    assert db.merge_players([], "empty.png", "hash-empty") == (0, 0)
+    assert db.imported_hashes() == {"hash-empty"}
+# endregion
+
+
+# region Откат импортов
+def test_rollback_restores_totals_and_removes_created_players(db):
+    db.import_roster([("alpha", "General", 10, 5)])
+    db.merge_players([
+        {"name": "alpha", "kills": 2, "deaths": 1},
+        {"name": "newbie", "kills": 1, "deaths": 1},
+    ], "shot.png", "hash-1")
+    import_id = db.last_import_id
+
+    assert db.rollback_import(import_id) == 2
+    assert user_totals(db) == {"alpha": (10, 5)}
+    # Откаченный файл можно загрузить заново
+    assert db.imported_hashes() == set()
+    assert db.rollback_import(import_id) == 0
+
+
+def test_rollback_blocked_by_later_roster(db):
+    db.merge_players([{"name": "alpha", "kills": 2, "deaths": 1}], "shot.png")
+    match_id = db.last_import_id
+    db.import_roster([("alpha", "General", 100, 50)])
+    roster_id = db.last_import_id
+
+    assert db.later_roster_import(match_id) == roster_id
+    assert db.rollback_import(match_id) == 0
+    assert user_totals(db) == {"alpha": (100, 50)}
+
+    # После отката состава прежний импорт снова откатывается
+    assert db.rollback_import(roster_id) == 1
+    assert user_totals(db) == {"alpha": (2, 1)}
+    assert db.later_roster_import(match_id) is None
+    assert db.rollback_import(match_id) == 1
+    assert user_totals(db) == {}
+
+
+def test_roster_is_excluded_from_period_totals(db):
+    db.merge_players([{"name": "alpha", "kills": 2, "deaths": 1}], "shot.png")
+    db.import_roster([("alpha", "General", 100, 50), ("beta", "-", 7, 7)])
+
+    totals = db.fetch_period_totals("0000", "9999")
+    assert [(name, kills, deaths) for _, name, kills, deaths in totals] == [("alpha", 2, 1)]
+# endregion
@@ -0,0 +1,93 @@
+# test_table_model.py
+import pytest
+
+pytest.importorskip("tkinter")
+
+from gui import TableModel  # noqa: E402
+
+PLAYERS = 1200  # Больше одной страницы iter_user_pages
+
+
+@pytest.fixture
+def filled_db(db):
+    db._write(lambda: db.connection.executemany(
+        "INSERT INTO Users (username, urank, kills, deads, kills_deads, to_main) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"user{i}", "-", i, 1, float(i), i >= 1) for i in range(PLAYERS)]
+    ))
+    return db
+
+
+def edit_name(model: TableModel, user_id: str, name: str) -> None:
+    model.ensure_loaded(PLAYERS)
+    model.set_cell(model.id_index[user_id], 1, name)
+
+
+def test_default_view_keeps_edit_and_marks_conflict(filled_db):
+    model = TableModel()
+    model.load(filled_db)
+    edit_name(model, "5", "edited")
+
+    filled_db.update_users([("from-db", "-", 4, 1, 4.0, True, 5)])
+    model.apply_changes(filled_db)
+
+    assert model.rows[model.id_index["5"]][1] == "edited"
+    assert model.conflicts == {"5"}
+    assert set(model.dirty) == {"5"}
+
+
+def test_sorted_view_reload_keeps_edit(filled_db):
+    model = TableModel()
+    model.set_query({}, "kills", True)
+    model.load(filled_db)
+    edit_name(model, "5", "edited")
+
+    filled_db.create_new_user()
+    model.apply_changes(filled_db)
+    model.ensure_loaded(PLAYERS + 1)
+
+    assert model.rows[model.id_index["5"]][1] == "edited"
+    assert model.conflicts == set()
+    assert len(model) == PLAYERS + 1
+
+
+def test_deleted_row_drops_edit(filled_db):
+    model = TableModel()
+    model.load(filled_db)
+    edit_name(model, "5", "edited")
+
+    filled_db.delete_user(5)
+    model.apply_changes(filled_db)
+
+    assert "5" not in model.dirty
+    assert "5" not in model.id_index
+    assert len(model) == PLAYERS - 1
+
+
+def test_total_counts_only_new_rows(filled_db):
+    model = TableModel()
+    model.load(filled_db)
+    assert not model.fully_loaded
+
+    # Строка из еще не загруженной страницы изменилась - это не новая строка
+    filled_db.update_users([("changed", "-", 1, 1, 1.0, True, PLAYERS - 10)])
+    model.apply_changes(filled_db)
+    assert len(model) == PLAYERS
+
+    filled_db.create_new_user()
+    model.apply_changes(filled_db)
+    assert len(model) == PLAYERS + 1
+
+
+def test_save_writes_edit_and_clears_conflict(filled_db):
+    model = TableModel()
+    model.load(filled_db)
+    edit_name(model, "5", "edited")
+    filled_db.update_users([("from-db", "-", 4, 1, 4.0, True, 5)])
+    model.apply_changes(filled_db)
+
+    saved, errors = model.save(filled_db)
+
+    assert (saved, errors) == (1, [])
+    assert model.dirty == {} and model.conflicts == set()
+    names = {user_id: name for user_id, name, *_ in filled_db.fetch_all_users()}
+    assert names[5] == "edited"